@@ -0,0 +1,443 @@
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import Executor, Future
+from contextlib import ExitStack, contextmanager
+from functools import wraps
+from typing import Callable, Iterator, Optional
+from unittest import mock
+from urllib.parse import urlsplit
+
+from requests.adapters import HTTPAdapter
+
+from bench.server import API_PREFIX, StandInServer, StandInSettings
+from main import TassBeeh
+from tass.cache import CacheStats, ResponseCache
+from tass.endpoints import Endpoints
+from tass.transport import Transport, TransportStats
+from utils import logger
+from utils.clock import Clock
+from utils.file_loader import WebAppDataSource
+from utils.scheduler import Scheduler
+from utils.tuning import Tuning, TuningFile
+
+STAGES = (
+    "check_in",
+    "refill_energy",
+    "ad_boost",
+    "booster_swipe",
+    "swipe_task",
+    "quests_task",
+)
+
+SCENARIOS: dict[str, StandInSettings] = {
+    "baseline": StandInSettings(),
+    "latency": StandInSettings(latency=0.02, latency_jitter=0.03),
+    "faults": StandInSettings(
+        error_rate=0.05, token_ttl=120, rate_limit=20, latency=0.005
+    ),
+    # The server clock runs ahead, so its deadlines come early on ours.
+    "skew": StandInSettings(clock_skew=8.0, latency=0.01),
+    # Short outages that outlast the client's retries, every five minutes.
+    "outages": StandInSettings(outage_every=300.0, outage_seconds=6.0, latency=0.005),
+}
+FAKE_WEB_APP_DATA = "query_id=AAAAAAAAAAAAAAAA&user=%7B%22id%22%3A100000001%7D&auth_date=1700000000&hash=stand-in"
+
+
+def fake_web_app_data(auth_date: float) -> str:
+    return FAKE_WEB_APP_DATA.replace("1700000000", str(int(auth_date)))
+
+
+# Skips sleeps and shifts the clock forward by the time they would have taken.
+# Stages run side by side, so the clock only moves once every thread taking
+# part (the one driving the run and each running stage) is asleep, and then
+# to the earliest wake-up, as if they had slept at the same time. Sleeps on
+# other threads, such as quest workers backing off, skip ahead at once. Time
+# skipped while no stage runs is counted as idle.
+class VirtualTime(Clock):
+    def __init__(self) -> None:
+        self.skipped = 0.0
+        self.idle = 0.0
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._local.taking_part = True
+        self._taking_part = 1
+        self._sleepers: list[tuple[float, Optional[threading.Event]]] = []
+
+    def sleep(self, seconds: float) -> None:
+        self.wait(None, seconds)
+
+    # Sleeps until the event is set or the timeout passes on this clock.
+    def wait(self, event: Optional[threading.Event], timeout: Optional[float]) -> bool:
+        if not getattr(self._local, "taking_part", False):
+            if event is not None:
+                return event.wait(timeout)
+            with self._cond:
+                self.skipped += max(timeout or 0.0, 0.0)
+            return False
+        with self._cond:
+            wake = float("inf") if timeout is None else self.time() + max(timeout, 0.0)
+            entry = (wake, event)
+            self._sleepers.append(entry)
+            try:
+                while True:
+                    if event is not None and event.is_set():
+                        return True
+                    if self.time() >= wake:
+                        return False
+                    self._advance()
+                    if self.time() < wake:
+                        self._cond.wait()
+            finally:
+                self._sleepers.remove(entry)
+
+    def _advance(self) -> None:
+        if len(self._sleepers) < self._taking_part:
+            return
+        if any(event is not None and event.is_set() for _, event in self._sleepers):
+            self._cond.notify_all()
+            return
+        earliest = min(wake for wake, _ in self._sleepers)
+        if earliest != float("inf"):
+            skip = max(earliest - self.time(), 0.0)
+            self.skipped += skip
+            if self._taking_part == 1:
+                self.idle += skip
+        self._cond.notify_all()
+
+    # Counts a stage from the moment it is handed to a worker, so the clock
+    # does not move before the worker picks it up.
+    def enlist(self) -> None:
+        with self._cond:
+            self._taking_part += 1
+
+    @contextmanager
+    def taking_part(self) -> Iterator[None]:
+        self._local.taking_part = True
+        try:
+            yield
+        finally:
+            self._local.taking_part = False
+            with self._cond:
+                self._taking_part -= 1
+                self._advance()
+
+    def time(self) -> float:
+        return _real_time() + self.skipped
+
+    def submit(self, pool: Executor, func: Callable, *args) -> Future:
+        self.enlist()
+
+        def run_stage():
+            with self.taking_part():
+                return func(*args)
+
+        return pool.submit(run_stage)
+
+
+_real_time = time.time
+
+
+class CycleRecorder:
+    def __init__(self, clock: VirtualTime) -> None:
+        self.clock = clock
+        self.requests: list[tuple[float, str, int]] = []
+        self.stage_wall: dict[str, list[float]] = defaultdict(list)
+        self.stage_virtual: dict[str, list[float]] = defaultdict(list)
+        self.stage_late: dict[str, list[float]] = defaultdict(list)
+        self.cache = CacheStats()
+        self.transport = TransportStats()
+
+    def timed(self, name: str, func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            wall_start = time.perf_counter()
+            virtual_start = self.clock.time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.stage_wall[name].append(time.perf_counter() - wall_start)
+                self.stage_virtual[name].append(self.clock.time() - virtual_start)
+
+        return wrapper
+
+    # How long each stage waited past its due time, e.g. behind another stage.
+    def stage_start(self, start: Callable) -> Callable:
+        recorder = self
+
+        @wraps(start)
+        def wrapper(scheduler, pool, job):
+            late = max(recorder.clock.time() - job.due, 0.0)
+            recorder.stage_late[job.name].append(late)
+            return start(scheduler, pool, job)
+
+        return wrapper
+
+    def adapter_send(self, send: Callable) -> Callable:
+        recorder = self
+
+        @wraps(send)
+        def wrapper(adapter, request, *args, **kwargs):
+            response = send(adapter, request, *args, **kwargs)
+            path = urlsplit(request.url).path.removeprefix(API_PREFIX)
+            recorder.requests.append(
+                (
+                    recorder.clock.time(),
+                    f"{request.method} {path}",
+                    response.status_code,
+                )
+            )
+            return response
+
+        return wrapper
+
+    def cache_reset(self, reset: Callable) -> Callable:
+        recorder = self
+
+        @wraps(reset)
+        def wrapper(cache):
+            stats = reset(cache)
+            recorder.cache.hits += stats.hits
+            recorder.cache.misses += stats.misses
+            recorder.cache.invalidations += stats.invalidations
+            return stats
+
+        return wrapper
+
+    def transport_reset(self, reset: Callable) -> Callable:
+        recorder = self
+
+        @wraps(reset)
+        def wrapper(transport):
+            stats = reset(transport)
+            recorder.transport.connections += stats.connections
+            recorder.transport.setup_seconds += stats.setup_seconds
+            recorder.transport.evicted += stats.evicted
+            recorder.transport.dns_lookups += stats.dns_lookups
+            return stats
+
+        return wrapper
+
+    def recovery_times(self) -> list[float]:
+        failed_since: dict[str, float] = {}
+        recoveries = []
+        for moment, route, status in self.requests:
+            if status >= 400:
+                failed_since.setdefault(route, moment)
+            elif route in failed_since:
+                recoveries.append(moment - failed_since.pop(route))
+        return recoveries
+
+
+@contextmanager
+def instrumented(recorder: CycleRecorder, bot: TassBeeh) -> Iterator[None]:
+    clock = recorder.clock
+    with ExitStack() as stack:
+        # The bot runs on the clock it was given; cassette recording and
+        # replay read the time directly.
+        stack.enter_context(mock.patch("time.sleep", clock.sleep))
+        stack.enter_context(mock.patch("time.time", clock.time))
+        stack.enter_context(
+            mock.patch.object(
+                Scheduler, "_start", recorder.stage_start(Scheduler._start)
+            )
+        )
+        stack.callback(bot.credentials.close)
+        stack.enter_context(
+            mock.patch.object(
+                HTTPAdapter, "send", recorder.adapter_send(HTTPAdapter.send)
+            )
+        )
+        stack.enter_context(
+            mock.patch.object(
+                ResponseCache,
+                "reset_stats",
+                recorder.cache_reset(ResponseCache.reset_stats),
+            )
+        )
+        stack.enter_context(
+            mock.patch.object(
+                Transport,
+                "reset_stats",
+                recorder.transport_reset(Transport.reset_stats),
+            )
+        )
+        for name in STAGES:
+            setattr(bot, name, recorder.timed(name, getattr(bot, name)))
+        yield
+
+
+# Keeps the journal, quest ledger, tuning and webAppData of a run out of the
+# working directory.
+def isolate_state(bot: TassBeeh) -> tempfile.TemporaryDirectory:
+    state_dir = tempfile.TemporaryDirectory()
+    bot.journal_path = os.path.join(state_dir.name, "stage_journal.jsonl")
+    bot.quest_ledger_path = os.path.join(state_dir.name, "quest_ledger.json")
+    bot.history_path = os.path.join(state_dir.name, "history.sqlite3")
+    credentials_path = os.path.join(state_dir.name, "webAppData.txt")
+    with open(credentials_path, "w") as file:
+        file.write(fake_web_app_data(time.time()))
+    bot.credentials = WebAppDataSource(credentials_path, clock=bot.clock)
+    # Defaults unless the caller asks for other settings.
+    bot.tuning_file = TuningFile(
+        os.path.join(state_dir.name, "tuning.toml"), clock=bot.clock
+    )
+    return state_dir
+
+
+def run_scenario(
+    name: str,
+    settings: StandInSettings,
+    hours: float,
+    tuning: Optional[Tuning] = None,
+    workers: Optional[int] = None,
+) -> dict:
+    clock = VirtualTime()
+    recorder = CycleRecorder(clock)
+    bot = TassBeeh(clock)
+    if workers is not None:
+        bot.scheduler.max_workers = workers
+    state_dir = isolate_state(bot)
+    if tuning is not None:
+        with open(bot.tuning_file.path, "w") as file:
+            file.write(tuning.to_toml())
+    with state_dir, StandInServer(settings, clock=clock.time) as server:
+        Endpoints.configure(server.base_url)
+        with instrumented(recorder, bot):
+            wall_start = time.perf_counter()
+            bot.run(duration=hours * 3600)
+            wall = time.perf_counter() - wall_start
+            if bot.tass is not None:
+                bot.tass.cache.reset_stats()
+            if bot.transport is not None:
+                bot.transport.reset_stats()
+        taps = server.taps_registered
+        taps_boosted = server.taps_boosted
+
+    statuses = Counter(status for _, _, status in recorder.requests)
+    routes = Counter(route for _, route, _ in recorder.requests)
+    recoveries = recorder.recovery_times()
+    return {
+        "scenario": name,
+        "hours": hours,
+        "requests": len(recorder.requests),
+        "requests_per_hour": len(recorder.requests) / hours,
+        "requests_per_1000_taps": len(recorder.requests) * 1000 / max(taps, 1),
+        "requests_by_route": dict(routes.most_common()),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "taps_registered": taps,
+        "taps_boosted": taps_boosted,
+        "server_clock": {
+            "offset_s": bot.server_clock.offset,
+            "error_s": bot.server_clock.error,
+            "rtt_ms": (bot.server_clock.rtt or 0.0) * 1000,
+        },
+        "wall_seconds": wall,
+        "skipped_sleep_seconds": clock.skipped,
+        "cache": {
+            "hits": recorder.cache.hits,
+            "misses": recorder.cache.misses,
+            "hit_rate": recorder.cache.hit_rate,
+        },
+        "connections": {
+            "opened": recorder.transport.connections,
+            "setup_ms": recorder.transport.setup_seconds * 1000,
+            "evicted_idle": recorder.transport.evicted,
+            "dns_lookups": recorder.transport.dns_lookups,
+        },
+        "stages": {
+            stage: {
+                "calls": len(values),
+                "wall_mean_ms": statistics.fmean(values) * 1000,
+                "virtual_mean_s": statistics.fmean(recorder.stage_virtual[stage]),
+                "late_mean_s": statistics.fmean(recorder.stage_late[stage] or [0.0]),
+            }
+            for stage, values in recorder.stage_wall.items()
+        },
+        "recovery": {
+            "count": len(recoveries),
+            "mean_s": statistics.fmean(recoveries) if recoveries else 0.0,
+            "max_s": max(recoveries, default=0.0),
+        },
+    }
+
+
+def print_report(report: dict) -> None:
+    print(f"\n== {report['scenario']} ({report['hours']:g} simulated hours) ==")
+    print(
+        f"requests/hour: {report['requests_per_hour']:.1f}  "
+        f"requests/1000 taps: {report['requests_per_1000_taps']:.1f}  "
+        f"taps: {report['taps_registered']}  "
+        f"wall: {report['wall_seconds']:.2f}s  "
+        f"skipped sleep: {report['skipped_sleep_seconds']:.0f}s"
+    )
+    print(f"statuses: {report['statuses']}")
+    server_clock = report["server_clock"]
+    print(
+        f"boosted taps: {report['taps_boosted']}  "
+        f"server clock: {server_clock['offset_s']:+.2f}s "
+        f"+/- {server_clock['error_s']:.2f}s, rtt {server_clock['rtt_ms']:.1f} ms"
+    )
+    cache = report["cache"]
+    print(
+        f"read cache: {cache['hits']} hits, {cache['misses']} misses "
+        f"({cache['hit_rate']:.0%})"
+    )
+    connections = report["connections"]
+    print(
+        f"connections: {connections['opened']} opened "
+        f"({connections['setup_ms']:.1f} ms setting up), "
+        f"{connections['evicted_idle']} evicted idle, "
+        f"{connections['dns_lookups']} DNS lookups"
+    )
+    print(f"{'stage':<16}{'calls':>7}{'wall ms':>12}{'virtual s':>12}{'late s':>9}")
+    for stage, data in report["stages"].items():
+        print(
+            f"{stage:<16}{data['calls']:>7}{data['wall_mean_ms']:>12.1f}"
+            f"{data['virtual_mean_s']:>12.1f}{data['late_mean_s']:>9.1f}"
+        )
+    recovery = report["recovery"]
+    print(
+        f"recoveries: {recovery['count']}  "
+        f"mean: {recovery['mean_s']:.1f}s  max: {recovery['max_s']:.1f}s"
+    )
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark TassBeeh scheduling against the stand-in API."
+    )
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument(
+        "--scenario", choices=sorted(SCENARIOS), action="append", default=None
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Stages run side by side (1 runs them one after another).",
+    )
+    parser.add_argument("--json", help="Write the full report to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep bot logging.")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logger.remove()
+
+    reports = [
+        run_scenario(name, SCENARIOS[name], args.hours, workers=args.workers)
+        for name in args.scenario or sorted(SCENARIOS)
+    ]
+    for report in reports:
+        print_report(report)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(reports, file, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,144 @@
+import argparse
+import json
+import time
+from typing import Any, Callable, Optional
+
+from pydantic import BaseModel, HttpUrl
+
+from bench.server import StandInServer, StandInSettings
+from tass.models import (
+    DecodeMemo,
+    PrayerDataModel,
+    PrayerStatusModel,
+    Progress,
+    QuestData,
+    UserModel,
+)
+
+
+# The models as they were decoded before: response.json(), then cls(**data),
+# with URL validation on every quest link.
+class LegacyQuest(BaseModel):
+    id: int
+    name: str
+    questType: str
+    actionLink: Optional[HttpUrl] = None
+    actionLinks: Optional[dict[str, HttpUrl]] = None
+    isHidden: bool
+    finishCondition: str
+    rewardExp: int
+    isUserAchieved: bool
+    isActive: bool
+    progress: Optional[Progress] = None
+    isNew: Optional[bool] = None
+
+
+class LegacyQuestData(BaseModel):
+    regularQuests: list[LegacyQuest]
+    dailyQuests: list[LegacyQuest]
+    partnerQuests: list[LegacyQuest]
+
+
+def legacy_prayer_data(data: dict) -> PrayerDataModel:
+    prayer_statuses = {
+        key: PrayerStatusModel(**value) for key, value in data["prayerStatuses"].items()
+    }
+    return PrayerDataModel(
+        nextPrayer=data["nextPrayer"],
+        streak=data["streak"],
+        prayerStatuses=prayer_statuses,
+    )
+
+
+def payloads(quest_count: int) -> dict[str, bytes]:
+    server = StandInServer(StandInSettings(quest_count=quest_count))
+    now = time.time()
+    return {
+        name: json.dumps(handler(now, {})[2]).encode()
+        for name, handler in (
+            ("profile", server._profile),
+            ("prayer", server._prayer_status),
+            ("quests", server._quests),
+        )
+    }
+
+
+def measure(decode: Callable[[bytes], Any], raw: bytes, rounds: int) -> float:
+    decode(raw)
+    best = float("inf")
+    # Best of five batches keeps scheduler noise out of the comparison.
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            decode(raw)
+        best = min(best, (time.perf_counter() - start) / rounds)
+    return best
+
+
+def run(quest_count: int, rounds: int) -> list[dict]:
+    raw = payloads(quest_count)
+    # An equal body in a fresh buffer, as the next poll would deliver it.
+    raw["quests (unchanged)"] = bytes(bytearray(raw["quests"]))
+    memo = DecodeMemo()
+    previous = memo.decode(QuestData, raw["quests"])
+    cases = (
+        (
+            "profile",
+            lambda body: UserModel(**json.loads(body)),
+            UserModel.from_json,
+        ),
+        (
+            "prayer",
+            lambda body: legacy_prayer_data(json.loads(body)),
+            PrayerDataModel.from_json,
+        ),
+        (
+            "quests",
+            lambda body: LegacyQuestData(**json.loads(body)),
+            QuestData.from_json,
+        ),
+        (
+            "quests (unchanged)",
+            lambda body: LegacyQuestData(**json.loads(body)),
+            lambda body: memo.decode(QuestData, body, previous),
+        ),
+    )
+    rows = []
+    for name, legacy, current in cases:
+        before = measure(legacy, raw[name], rounds)
+        after = measure(current, raw[name], rounds)
+        rows.append(
+            {
+                "payload": name,
+                "bytes": len(raw[name]),
+                "legacy_us": before * 1e6,
+                "current_us": after * 1e6,
+                "speedup": before / after,
+            }
+        )
+    return rows
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare response decoding before and after one-pass validation."
+    )
+    parser.add_argument("--quests", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args(argv)
+
+    rows = run(args.quests, args.rounds)
+    print(f"{'payload':<20}{'bytes':>10}{'legacy us':>14}{'current us':>14}{'x':>8}")
+    for row in rows:
+        print(
+            f"{row['payload']:<20}{row['bytes']:>10}{row['legacy_us']:>14.1f}"
+            f"{row['current_us']:>14.1f}{row['speedup']:>8.1f}"
+        )
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(rows, file, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
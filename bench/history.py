@@ -0,0 +1,108 @@
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from typing import Optional
+
+from tass.models import UserModel
+from utils.history import History
+
+STAGE_SECONDS = {
+    "ad_boost": 0.1,
+    "booster_swipe": 45.0,
+    "quests_task": 2.0,
+    "refill_energy": 0.2,
+    "swipe_task": 240.0,
+}
+
+
+def _profile(experience: int, energy: int, taps: int) -> UserModel:
+    return UserModel.model_validate(
+        {
+            "telegramId": 100000001,
+            "experience": experience,
+            "referrals": {"firstTier": {"count": 3}, "secondTier": {"count": 1}},
+            "totalTaps": taps,
+            "taps": {"firstLevel": 0, "secondLevel": 0},
+            "tapsToday": taps % 5000,
+            "achievementsCount": 4,
+            "energy": energy,
+        }
+    )
+
+
+# Writes what the bot records over the given days, about one stage run and one
+# changed profile every two minutes, with timestamps spread over that span.
+def fill(history: History, days: float, seed: int = 0) -> tuple[int, float]:
+    rng = random.Random(seed)
+    stages = list(STAGE_SECONDS)
+    start = time.time() - days * 86400
+    experience = taps = 0
+    rows = 0
+    write_start = time.perf_counter()
+    for step in range(int(days * 720)):
+        t = start + step * 120
+        gained = rng.randint(20, 60)
+        experience += gained
+        taps += gained
+        history.record_profile(_profile(experience, rng.randint(0, 600), taps), t=t)
+        stage = rng.choice(stages)
+        history.record_stage(stage, STAGE_SECONDS[stage], rng.random() > 0.01, t=t)
+        rows += 2
+    return rows, time.perf_counter() - write_start
+
+
+def _timed(func, runs: int) -> float:
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Time history writes and queries over months of records."
+    )
+    parser.add_argument("--days", type=float, default=180.0)
+    parser.add_argument("--runs", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        path = os.path.join(state_dir, "history.sqlite3")
+        history = History(path)
+        rows, write_seconds = fill(history, args.days)
+        history.close()
+        size = sum(
+            os.path.getsize(os.path.join(state_dir, name))
+            for name in os.listdir(state_dir)
+        )
+        print(
+            f"{args.days:g} days: {rows} rows in {write_seconds:.1f}s "
+            f"({write_seconds / rows * 1e6:.0f} us per row), {size / 1e6:.1f} MB"
+        )
+
+        history = History(path)
+        since = time.time() - args.days * 86400
+        queries = {
+            "open": lambda: History(path).close(),
+            "daily, all": lambda: history.rollups("day", since),
+            "hourly, last 7 days": lambda: history.rollups(
+                "hour", time.time() - 7 * 86400
+            ),
+            "hourly, all": lambda: history.rollups("hour", since),
+            "stages, last 7 days": lambda: history.stage_summary(
+                time.time() - 7 * 86400
+            ),
+        }
+        print(f"{'query':<24}{'median ms':>10}")
+        for name, query in queries.items():
+            print(f"{name:<24}{_timed(query, args.runs):>10.2f}")
+        history.close()
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Callable, Optional
+
+from bench.cycle import SCENARIOS, run_scenario
+from utils import logger
+from utils.loggy import CONSOLE_FORMAT, JsonLinesSink
+
+
+# Runs the bot against the stand-in API and keeps every record it logs.
+def capture(hours: float) -> list[tuple[str, str]]:
+    records: list[tuple[str, str]] = []
+    logger.remove()
+    logger.add(
+        lambda message: records.append(
+            (message.record["level"].name, message.record["message"])
+        ),
+        level="TRACE",
+    )
+    run_scenario("baseline", SCENARIOS["baseline"], hours)
+    logger.remove()
+    return records
+
+
+def _console(level: str, enqueue: bool) -> Callable[[str], None]:
+    def setup(directory: str) -> None:
+        stream = open(os.devnull, "w")
+        logger.add(
+            stream,
+            level=level,
+            colorize=True,
+            format=CONSOLE_FORMAT,
+            enqueue=enqueue,
+        )
+
+    return setup
+
+
+def _json_lines(batch_size: int) -> Callable[[str], None]:
+    def setup(directory: str) -> None:
+        sink = JsonLinesSink(
+            os.path.join(directory, "tass.jsonl"), batch_size=batch_size
+        )
+        logger.add(sink, level="INFO", format="{message}")
+
+    return setup
+
+
+def _loguru_serialized(directory: str) -> None:
+    logger.add(
+        os.path.join(directory, "tass.log"),
+        level="INFO",
+        serialize=True,
+        rotation="10 MB",
+        enqueue=True,
+    )
+
+
+SETUPS: dict[str, Callable[[str], None]] = {
+    "console, enqueued (previous)": _console("INFO", enqueue=True),
+    "console": _console("INFO", enqueue=False),
+    "console at WARNING": _console("WARNING", enqueue=False),
+    "jsonl, batched": _json_lines(64),
+    "jsonl, batch of 1": _json_lines(1),
+    "loguru serialize=True file": _loguru_serialized,
+}
+
+
+def _written(directory: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+    )
+
+
+def replay(records: list[tuple[str, str]], setup: Callable[[str], None]) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        logger.remove()
+        setup(directory)
+        start = time.perf_counter()
+        for level, message in records:
+            logger.log(level, message)
+        emitted = time.perf_counter() - start
+        # Removing the handlers waits for queued records to be written.
+        logger.complete()
+        logger.remove()
+        drained = time.perf_counter() - start
+        written = _written(directory)
+    return {
+        "caller_us_per_record": emitted / len(records) * 1e6,
+        "total_us_per_record": drained / len(records) * 1e6,
+        "bytes_written": written,
+    }
+
+
+# A record below the configured level, formatted eagerly and lazily.
+def filtered_cost(rounds: int) -> dict[str, float]:
+    logger.remove()
+    logger.add(open(os.devnull, "w"), level="INFO")
+    swipes, energy = 25, 4210
+    start = time.perf_counter()
+    for _ in range(rounds):
+        logger.debug(f"Swiped {swipes} times. Remaining energy: {energy}")
+    eager = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(rounds):
+        logger.debug("Swiped {} times. Remaining energy: {}", swipes, energy)
+    lazy = time.perf_counter() - start
+    logger.remove()
+    return {"eager_ns": eager / rounds * 1e9, "lazy_ns": lazy / rounds * 1e9}
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare log sink overhead over a simulated run of the bot."
+    )
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args(argv)
+
+    records = capture(args.hours)
+    results = {name: replay(records, setup) for name, setup in SETUPS.items()}
+    filtered = filtered_cost(100_000)
+
+    print(f"{len(records)} records logged over {args.hours:g} simulated hours")
+    print(f"{'setup':<30}{'caller us':>11}{'total us':>10}{'written KB':>12}")
+    for name, result in results.items():
+        print(
+            f"{name:<30}{result['caller_us_per_record']:>11.1f}"
+            f"{result['total_us_per_record']:>10.1f}"
+            f"{result['bytes_written'] / 1024:>12.1f}"
+        )
+    print(
+        f"filtered DEBUG record: f-string {filtered['eager_ns']:.0f} ns, "
+        f"lazy arguments {filtered['lazy_ns']:.0f} ns"
+    )
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(
+                {"records": len(records), "setups": results, "filtered": filtered},
+                file,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main_cli()
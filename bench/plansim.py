@@ -0,0 +1,236 @@
+import argparse
+import json
+import random
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Optional
+
+from bench.server import StandInSettings
+from tass.planner import SWIPE_SECONDS, Planner
+from utils.tuning import Range, Tuning
+
+
+@dataclass(slots=True)
+class Plan:
+    # Taps per register_taps call, in order; booster batches come first.
+    batches: list[int] = field(default_factory=list)
+    booster_batches: int = 0
+    # Booster batches are posted by this time.
+    stop_at: Optional[float] = None
+    # When spending is done and the refill should be claimed.
+    refill_at: Optional[float] = None
+    finish_at: float = 0.0
+
+    @property
+    def taps(self) -> int:
+        return sum(self.batches)
+
+
+@dataclass
+class Outcome:
+    register_calls: int = 0
+    other_calls: int = 0
+    taps: int = 0
+    boosted_taps: int = 0
+    energy_lost_at_refill: int = 0
+    delay_seconds: float = 0.0
+    claim_delay_seconds: float = 0.0
+    violations: list[str] = field(default_factory=list)
+
+    @property
+    def calls_per_1000_taps(self) -> float:
+        return (self.register_calls + self.other_calls) * 1000 / max(self.taps, 1)
+
+
+# Replays one plan against the game rules: a batch outside a booster must be
+# covered by energy, and booster batches must end before the booster does.
+def check_plan(
+    plan: Plan,
+    now: float,
+    energy: int,
+    booster_until: Optional[float],
+    tuning: Tuning,
+    outcome: Outcome,
+) -> tuple[float, int]:
+    clock = now
+    for index, taps in enumerate(plan.batches):
+        if not tuning.min_swipe <= taps <= tuning.max_swipe:
+            outcome.violations.append(f"batch of {taps} outside the tuning range")
+        boosted = index < plan.booster_batches
+        if boosted:
+            if clock + taps * SWIPE_SECONDS > booster_until:
+                outcome.violations.append("booster batch runs past the booster")
+            outcome.boosted_taps += taps
+            delay = tuning.booster_swipe_delay
+        else:
+            clock = max(clock, booster_until or clock)
+            if taps > energy:
+                outcome.violations.append(f"batch of {taps} with {energy} energy")
+            energy -= taps
+            delay = tuning.swipe_delay
+        outcome.register_calls += 1
+        outcome.taps += taps
+        pause = (delay[0] + delay[1]) / 2
+        outcome.delay_seconds += pause
+        clock += taps * SWIPE_SECONDS + pause
+    return clock, energy
+
+
+# The batch sizing the bot used before the planner: random batches while more
+# than max_swipe energy is left, and a refill below a fixed threshold.
+def legacy_plan(
+    now: float,
+    energy: int,
+    ready_at: float,
+    booster_until: Optional[float],
+    tuning: Tuning,
+    rng: random.Random,
+) -> Plan:
+    plan = Plan()
+    clock = now
+    booster_delay = sum(tuning.booster_swipe_delay) / 2
+    if booster_until is not None:
+        plan.stop_at = booster_until - tuning.booster_end_margin
+        while clock < plan.stop_at:
+            taps = rng.randint(tuning.min_swipe, tuning.max_swipe)
+            if clock + taps * SWIPE_SECONDS > booster_until:
+                break
+            plan.batches.append(taps)
+            clock += taps * SWIPE_SECONDS + booster_delay
+        plan.booster_batches = len(plan.batches)
+        clock = max(clock, booster_until)
+    while energy > tuning.max_swipe:
+        taps = rng.randint(tuning.min_swipe, tuning.max_swipe)
+        plan.batches.append(taps)
+        energy -= taps
+        clock += taps * SWIPE_SECONDS + sum(tuning.swipe_delay) / 2
+    plan.finish_at = clock
+    plan.refill_at = max(ready_at, clock) if energy < 3000 else None
+    return plan
+
+
+def _batch_seconds(taps: int, delay: Range) -> float:
+    return taps * SWIPE_SECONDS + (delay[0] + delay[1]) / 2
+
+
+# What the bot does with the Planner helpers, laid out ahead of time: booster
+# batches of booster_batch until the stop, then split(energy), and the refill
+# once both are done. The bot makes the same calls batch by batch (booster_swipe,
+# swipe_task), so this models those helpers, not a plan the bot follows.
+def planned(
+    now: float,
+    energy: int,
+    ready_at: float,
+    booster_until: Optional[float],
+    tuning: Tuning,
+    rng: random.Random,
+) -> Plan:
+    planner = Planner(tuning)
+    plan = Plan()
+    clock = now
+    if booster_until is not None and booster_until > now:
+        plan.stop_at = planner.booster_stop(booster_until)
+        while taps := planner.booster_batch(clock, plan.stop_at):
+            plan.batches.append(taps)
+            clock += _batch_seconds(taps, tuning.booster_swipe_delay)
+        plan.booster_batches = len(plan.batches)
+        clock = max(clock, booster_until)
+    for taps in planner.split(energy):
+        plan.batches.append(taps)
+        clock += _batch_seconds(taps, tuning.swipe_delay)
+    plan.finish_at = clock
+    plan.refill_at = max(ready_at, clock)
+    return plan
+
+
+PlanFunc = Callable[[float, int, float, Optional[float], Tuning, random.Random], Plan]
+POLICIES: dict[str, PlanFunc] = {"legacy": legacy_plan, "planner": planned}
+
+
+# Runs sessions back to back the way the scheduler does: an ad booster when one
+# is available, the plan, then the refill once the prayer is ready.
+def simulate(
+    policy: PlanFunc, settings: StandInSettings, tuning: Tuning, hours: float
+) -> Outcome:
+    rng = random.Random(settings.seed)
+    outcome = Outcome()
+    horizon = hours * 3600
+    clock = 0.0
+    energy = settings.max_energy
+    ready_at = 0.0
+    ad_ready_at = 0.0
+    while clock < horizon:
+        booster_until = None
+        if ad_ready_at <= clock:
+            # Profile, ad booster and the profile read of booster_swipe.
+            outcome.other_calls += 3
+            booster_until = clock + settings.booster_seconds
+            ad_ready_at = clock + settings.ad_cooldown_seconds
+            clock += tuning.booster_start_delay
+        # The profile read that starts a swipe session.
+        outcome.other_calls += 1
+        plan = policy(clock, energy, ready_at, booster_until, tuning, rng)
+        clock, energy = check_plan(plan, clock, energy, booster_until, tuning, outcome)
+        if plan.refill_at is None:
+            clock = max(clock, ad_ready_at)
+            continue
+        claim_at = max(plan.refill_at, clock)
+        if claim_at > ad_ready_at:
+            # An ad booster comes up first; the refill waits for the next pass.
+            clock = max(clock, ad_ready_at)
+            continue
+        # Profile, prayer status and the refill itself.
+        outcome.other_calls += 3
+        outcome.claim_delay_seconds += claim_at - ready_at
+        outcome.energy_lost_at_refill += energy
+        clock = claim_at
+        energy = settings.max_energy
+        ready_at = clock + settings.prayer_interval
+    return outcome
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare swipe plans offline, without the stand-in server."
+    )
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument("--max-energy", type=int, default=600)
+    parser.add_argument("--prayer-hours", type=float, default=4.0)
+    parser.add_argument("--booster-seconds", type=float, default=60.0)
+    parser.add_argument("--ad-cooldown", type=float, default=600.0)
+    parser.add_argument("--json", help="Write the results to this file.")
+    args = parser.parse_args(argv)
+
+    settings = StandInSettings(
+        max_energy=args.max_energy,
+        prayer_interval=args.prayer_hours * 3600,
+        booster_seconds=args.booster_seconds,
+        ad_cooldown_seconds=args.ad_cooldown,
+    )
+    tuning = Tuning()
+    results = {
+        name: simulate(policy, settings, tuning, args.hours)
+        for name, policy in POLICIES.items()
+    }
+    print(
+        f"{args.hours:g} simulated hours, {args.max_energy} energy per refill, "
+        f"prayer every {args.prayer_hours:g} h"
+    )
+    print(
+        f"{'policy':<10}{'calls/1k taps':>14}{'taps':>8}{'boosted':>9}"
+        f"{'register':>10}{'lost energy':>13}{'delays s':>10}"
+    )
+    for name, outcome in results.items():
+        print(
+            f"{name:<10}{outcome.calls_per_1000_taps:>14.1f}{outcome.taps:>8}"
+            f"{outcome.boosted_taps:>9}{outcome.register_calls:>10}"
+            f"{outcome.energy_lost_at_refill:>13}{outcome.delay_seconds:>10.0f}"
+        )
+        for violation in sorted(set(outcome.violations)):
+            print(f"  {name}: {violation}")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({name: asdict(o) for name, o in results.items()}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
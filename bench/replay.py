@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from typing import Optional
+from unittest import mock
+
+from bench.cycle import (
+    SCENARIOS,
+    CycleRecorder,
+    VirtualTime,
+    _real_time,
+    instrumented,
+    isolate_state,
+    run_scenario,
+)
+from main import TassBeeh
+from tass.cassette import Cassette, ReplayAdapter
+from utils import logger
+
+
+# Records a stand-in scenario, e.g. to try the replay without production data.
+def record(path: str, scenario: str, hours: float) -> None:
+    with mock.patch.dict(os.environ, {"TASS_CASSETTE_RECORD": path}):
+        run_scenario(scenario, SCENARIOS[scenario], hours)
+
+
+def replay(path: str, speed: float) -> dict:
+    cassette = Cassette.load(path)
+    span = cassette.exchanges[-1].t if cassette.exchanges else 0.0
+    clock = VirtualTime()
+    # Start the simulated clock where the recording started, so the dates in
+    # the recorded responses mean the same thing to the bot.
+    clock.skipped = cassette.started_at - _real_time()
+    recorder = CycleRecorder(clock)
+    bot = TassBeeh(clock)
+    adapters: list[ReplayAdapter] = []
+    original_init = ReplayAdapter.__init__
+
+    def tracked_init(adapter, *args, **kwargs):
+        original_init(adapter, *args, **kwargs)
+        adapters.append(adapter)
+
+    with (
+        isolate_state(bot),
+        mock.patch.dict(
+            os.environ,
+            {"TASS_CASSETTE_REPLAY": path, "TASS_CASSETTE_SPEED": str(speed)},
+        ),
+        mock.patch.object(ReplayAdapter, "__init__", tracked_init),
+        mock.patch.object(
+            ReplayAdapter, "send", recorder.adapter_send(ReplayAdapter.send)
+        ),
+        instrumented(recorder, bot),
+    ):
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        bot.run(duration=span)
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+
+    missing = Counter()
+    overrun = Counter()
+    for adapter in adapters:
+        missing.update(adapter.missing)
+        overrun.update(adapter.overrun)
+    routes = Counter(route for _, route, _ in recorder.requests)
+    statuses = Counter(status for _, _, status in recorder.requests)
+    return {
+        "cassette": path,
+        "recorded_requests": len(cassette.exchanges),
+        "recorded_hours": span / 3600,
+        "requests": len(recorder.requests),
+        "requests_by_route": dict(routes.most_common()),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "unrecorded_routes": dict(missing),
+        "served_past_recording": dict(overrun),
+        "cpu_seconds": cpu,
+        "wall_seconds": wall,
+    }
+
+
+def print_report(report: dict, baseline: Optional[dict] = None) -> None:
+    def delta(key: str, value: float) -> str:
+        if baseline is None or key not in baseline:
+            return ""
+        return f" ({value - baseline[key]:+.3g})"
+
+    print(
+        f"replayed {report['recorded_hours']:.2f} h "
+        f"({report['recorded_requests']} recorded requests)"
+    )
+    print(f"requests: {report['requests']}{delta('requests', report['requests'])}")
+    print(
+        f"cpu: {report['cpu_seconds']:.3f}s{delta('cpu_seconds', report['cpu_seconds'])}"
+        f"  wall: {report['wall_seconds']:.3f}s"
+    )
+    print(f"statuses: {report['statuses']}")
+    before = baseline["requests_by_route"] if baseline else {}
+    for route, count in report["requests_by_route"].items():
+        change = f" ({count - before.get(route, 0):+d})" if baseline else ""
+        print(f"  {route:<32}{count:>6}{change}")
+    if report["unrecorded_routes"]:
+        print(f"not in the cassette: {report['unrecorded_routes']}")
+    if report.get("served_past_recording"):
+        print(f"asked more than recorded: {report['served_past_recording']}")
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Record API traffic to a cassette, or replay one through the bot."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="Record a stand-in scenario.")
+    record_parser.add_argument("cassette")
+    record_parser.add_argument(
+        "--scenario", choices=sorted(SCENARIOS), default="baseline"
+    )
+    record_parser.add_argument("--hours", type=float, default=2.0)
+    replay_parser = commands.add_parser("replay", help="Replay a cassette.")
+    replay_parser.add_argument("cassette")
+    replay_parser.add_argument("--speed", type=float, default=1.0)
+    replay_parser.add_argument("--json", help="Write the report to this file.")
+    replay_parser.add_argument("--compare", help="Report from an earlier build.")
+    parser.add_argument("--verbose", action="store_true", help="Keep bot logging.")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logger.remove()
+
+    if args.command == "record":
+        record(args.cassette, args.scenario, args.hours)
+        return
+
+    report = replay(args.cassette, args.speed)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_report(report, baseline)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
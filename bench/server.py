@@ -0,0 +1,493 @@
+import base64
+import json
+import random
+import socket
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep as _real_sleep
+from typing import Callable, Optional
+
+API_PREFIX = "/api/v1"
+PRAYER_NAMES = ["fajr", "dhuhr", "asr", "maghrib", "isha"]
+BLOCKED_QUEST_NAMES = [
+    "connect_haqq_wallet",
+    "islm_join_telegram_channel",
+    "watch_ads_daily",
+]
+
+
+@dataclass
+class StandInSettings:
+    latency: float = 0.0
+    latency_jitter: float = 0.0
+    error_rate: float = 0.0
+    error_status: int = 502
+    token_ttl: float = 3600.0
+    rate_limit: int = 0
+    retry_after: int = 1
+    max_energy: int = 600
+    booster_seconds: float = 60.0
+    ad_cooldown_seconds: float = 600.0
+    prayer_interval: float = 4 * 3600.0
+    quest_count: int = 30
+    # Seconds the stand-in's clock, and so its Date headers, runs ahead of ours.
+    clock_skew: float = 0.0
+    # Every request fails for outage_seconds out of every outage_every, long
+    # enough to outlast the client's retries.
+    outage_every: float = 0.0
+    outage_seconds: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class StandInState:
+    now: Callable[[], float]
+    settings: StandInSettings
+    telegram_id: int = 100000001
+    experience: int = 0
+    total_taps: int = 0
+    taps_today: int = 0
+    energy: int = 0
+    booster_finish: Optional[float] = None
+    ad_cooldown: Optional[float] = None
+    last_check_in: Optional[float] = None
+    check_in_streak: int = 0
+    next_prayer: float = 0.0
+    prayer_index: int = 0
+    prayer_ready: bool = False
+    claimed_prayers: set[str] = field(default_factory=set)
+    quests: dict[str, list[dict]] = field(default_factory=dict)
+    tokens: dict[str, float] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        now = self.now()
+        self.energy = self.settings.max_energy
+        # A finish date in the past makes the ad booster immediately available.
+        self.booster_finish = now - 3600
+        self.next_prayer = now
+        self.quests = _generate_quests(self.settings.quest_count, self.settings.seed)
+
+
+def _generate_quests(count: int, seed: int) -> dict[str, list[dict]]:
+    rng = random.Random(seed)
+    lists: dict[str, list[dict]] = {
+        "regularQuests": [],
+        "dailyQuests": [],
+        "partnerQuests": [],
+    }
+    kinds = list(lists)
+    for quest_id in range(1, count + 1):
+        name = (
+            BLOCKED_QUEST_NAMES[quest_id % len(BLOCKED_QUEST_NAMES)]
+            if quest_id % 10 == 0
+            else f"quest_{quest_id}"
+        )
+        total = rng.randint(1, 5)
+        lists[kinds[quest_id % 3]].append(
+            {
+                "id": quest_id,
+                "name": name,
+                "questType": "link",
+                "actionLink": f"https://t.me/example_{quest_id}",
+                "actionLinks": {
+                    "en": f"https://example.com/en/{quest_id}",
+                    "ar": f"https://example.com/ar/{quest_id}",
+                },
+                "isHidden": quest_id % 17 == 0,
+                "finishCondition": "visit",
+                "rewardExp": rng.choice([100, 250, 500, 1000]),
+                "isUserAchieved": rng.random() < 0.3,
+                "isActive": True,
+                "progress": {
+                    "current": total if rng.random() < 0.7 else total - 1,
+                    "total": total,
+                },
+                "isNew": rng.random() < 0.1,
+            }
+        )
+    return lists
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    if timestamp is None:
+        return None
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return moment.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _b64(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+class StandInServer:
+    def __init__(
+        self,
+        settings: Optional[StandInSettings] = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.settings = settings or StandInSettings()
+        skew = self.settings.clock_skew
+        self.clock = (lambda: clock() + skew) if skew else clock
+        self.rng = random.Random(self.settings.seed)
+        self.lock = threading.Lock()
+        self.state = StandInState(now=self.clock, settings=self.settings)
+        self.requests: Counter[str] = Counter()
+        self.statuses: Counter[tuple[str, int]] = Counter()
+        self.taps_registered = 0
+        self.taps_boosted = 0
+        self._recent: deque[float] = deque()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{API_PREFIX}"
+
+    def start(self) -> "StandInServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def reset_stats(self) -> None:
+        with self.lock:
+            self.requests.clear()
+            self.statuses.clear()
+            self.taps_registered = 0
+            self.taps_boosted = 0
+
+    def expire_tokens(self) -> None:
+        with self.lock:
+            self.state.tokens.clear()
+
+    def handle(
+        self, method: str, path: str, headers: dict, body: Optional[dict]
+    ) -> tuple[int, dict, dict]:
+        route = f"{method} {path.removeprefix(API_PREFIX)}"
+        settings = self.settings
+        if settings.latency or settings.latency_jitter:
+            _real_sleep(settings.latency + self.rng.random() * settings.latency_jitter)
+
+        with self.lock:
+            self.requests[route] += 1
+            status, extra_headers, payload = self._dispatch(route, headers, body)
+            self.statuses[(route, status)] += 1
+        return status, extra_headers, payload
+
+    def _dispatch(
+        self, route: str, headers: dict, body: Optional[dict]
+    ) -> tuple[int, dict, dict]:
+        settings = self.settings
+        now = self.clock()
+
+        if settings.rate_limit:
+            while self._recent and self._recent[0] <= now - 1:
+                self._recent.popleft()
+            if len(self._recent) >= settings.rate_limit:
+                return (
+                    429,
+                    {"Retry-After": str(settings.retry_after)},
+                    {"message": "Too Many Requests"},
+                )
+            self._recent.append(now)
+
+        if (
+            settings.outage_every
+            and now % settings.outage_every < settings.outage_seconds
+        ):
+            return settings.error_status, {}, {"message": "Service Unavailable"}
+
+        if settings.error_rate and self.rng.random() < settings.error_rate:
+            return settings.error_status, {}, {"message": "Bad Gateway"}
+
+        if route == "POST /auth/authenticate":
+            return self._authenticate(now, body or {})
+
+        token = headers.get("authorization", "").removeprefix("Bearer ")
+        expires = self.state.tokens.get(token)
+        if expires is None or expires <= now:
+            return 401, {}, {"message": "Unauthorized"}
+
+        handler = _ROUTES.get(route)
+        if handler is None:
+            return 404, {}, {"message": f"Cannot {route}"}
+        return handler(self, now, body or {})
+
+    def _authenticate(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        if not body.get("webAppData"):
+            return 400, {}, {"message": "webAppData is required"}
+        expires = now + self.settings.token_ttl
+        token = ".".join(
+            [
+                _b64({"alg": "HS256", "typ": "JWT"}),
+                _b64(
+                    {
+                        "sub": self.state.telegram_id,
+                        "iat": int(now),
+                        "exp": int(expires),
+                        "jti": self.rng.getrandbits(32),
+                    }
+                ),
+                "stand-in-signature",
+            ]
+        )
+        # Expired tokens are dropped so long soak runs measure the bot, not us.
+        self.state.tokens = {
+            key: until for key, until in self.state.tokens.items() if until > now
+        }
+        self.state.tokens[token] = expires
+        return 200, {}, {"token": token}
+
+    def _profile(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        state = self.state
+        return (
+            200,
+            {},
+            {
+                "telegramId": state.telegram_id,
+                "experience": state.experience,
+                "referrals": {
+                    "firstTier": {"count": 3, "experience": 1500},
+                    "secondTier": {"count": 1, "experience": 200},
+                },
+                "totalTaps": state.total_taps,
+                "taps": {"firstLevel": state.total_taps, "secondLevel": None},
+                "tapsToday": state.taps_today,
+                "achievementsCount": 4,
+                "haqqAddress": None,
+                "energy": state.energy,
+                "energyBoosterFinishDate": _iso(state.booster_finish),
+            },
+        )
+
+    def _check_in_info(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        state = self.state
+        return (
+            200,
+            {},
+            {
+                "checkInsStreak": state.check_in_streak,
+                "lastCheckInDate": _iso(state.last_check_in),
+                "checkInExperience": 500,
+            },
+        )
+
+    def _check_in(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        state = self.state
+        today = datetime.fromtimestamp(now, timezone.utc).date()
+        if (
+            state.last_check_in is not None
+            and datetime.fromtimestamp(state.last_check_in, timezone.utc).date()
+            == today
+        ):
+            return 400, {}, {"message": "Already checked in"}
+        state.last_check_in = now
+        state.check_in_streak += 1
+        state.experience += 500
+        return 200, {}, {"checkInsStreak": state.check_in_streak}
+
+    def _advance_prayers(self, now: float) -> None:
+        state = self.state
+        if not state.prayer_ready and now >= state.next_prayer:
+            state.prayer_ready = True
+
+    def _prayer_status(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        state = self.state
+        self._advance_prayers(now)
+        current = PRAYER_NAMES[state.prayer_index % len(PRAYER_NAMES)]
+        statuses = {}
+        for offset, name in enumerate(PRAYER_NAMES):
+            if name == current and state.prayer_ready:
+                status = "ready-to-claim"
+            elif name in state.claimed_prayers:
+                status = "claimed"
+            else:
+                status = "not-claimed"
+            statuses[name] = {
+                "name": name,
+                "status": status,
+                "date": _iso(state.next_prayer + offset * 60),
+            }
+        return (
+            200,
+            {},
+            {
+                "nextPrayer": _iso(state.next_prayer),
+                "streak": len(state.claimed_prayers),
+                "prayerStatuses": statuses,
+            },
+        )
+
+    def _refill_energy(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        state = self.state
+        self._advance_prayers(now)
+        if not state.prayer_ready:
+            return 400, {}, {"message": "No prayer ready to claim"}
+        state.claimed_prayers.add(PRAYER_NAMES[state.prayer_index % len(PRAYER_NAMES)])
+        state.prayer_index += 1
+        state.prayer_ready = False
+        state.next_prayer = now + self.settings.prayer_interval
+        state.energy = self.settings.max_energy
+        return 200, {}, {"energy": state.energy}
+
+    def _register_taps(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        state = self.state
+        taps = int(body.get("taps", 0))
+        swipes = body.get("swipes") or []
+        if taps <= 0 or taps != len(swipes):
+            return 400, {}, {"message": "Invalid swipes"}
+        boosted = state.booster_finish is not None and state.booster_finish > now
+        if not boosted:
+            if state.energy < taps:
+                return 400, {}, {"message": "Not enough energy"}
+            state.energy -= taps
+        else:
+            self.taps_boosted += taps
+        state.total_taps += taps
+        state.taps_today += taps
+        state.experience += taps
+        self.taps_registered += taps
+        return 200, {}, {"energy": state.energy}
+
+    def _quests(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        return 200, {}, self.state.quests
+
+    def _verify_quest(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        quest_id = body.get("questId")
+        for quests in self.state.quests.values():
+            for quest in quests:
+                if quest["id"] == quest_id:
+                    progress = quest.get("progress") or {}
+                    if progress.get("current") != progress.get("total"):
+                        return 200, {}, {"isVerified": False}
+                    if not quest["isUserAchieved"]:
+                        quest["isUserAchieved"] = True
+                        self.state.experience += quest["rewardExp"]
+                    return 200, {}, {"isVerified": True}
+        return 404, {}, {"message": "Quest not found"}
+
+    def _ad_booster(self, now: float, body: dict) -> tuple[int, dict, dict]:
+        state = self.state
+        if state.ad_cooldown is not None and state.ad_cooldown > now:
+            return (
+                200,
+                {},
+                {"cooldownDate": _iso(state.ad_cooldown), "status": "inactive"},
+            )
+        state.booster_finish = now + self.settings.booster_seconds
+        state.ad_cooldown = now + self.settings.ad_cooldown_seconds
+        return 200, {}, {"cooldownDate": _iso(state.ad_cooldown), "status": "active"}
+
+
+_ROUTES: dict[str, Callable[[StandInServer, float, dict], tuple[int, dict, dict]]] = {
+    "GET /game/profile": StandInServer._profile,
+    "GET /game/check-in": StandInServer._check_in_info,
+    "POST /game/check-in": StandInServer._check_in,
+    "GET /energy/prayer-status": StandInServer._prayer_status,
+    "POST /energy/refill-energy": StandInServer._refill_energy,
+    "POST /game/register-taps": StandInServer._register_taps,
+    "GET /quests/all": StandInServer._quests,
+    "POST /quests/verify": StandInServer._verify_quest,
+    "POST /marketplace/ad-booster": StandInServer._ad_booster,
+}
+
+
+def _make_handler(server: StandInServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def setup(self) -> None:
+            super().setup()
+            # Headers and body go out in separate writes; avoid Nagle stalls.
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def _serve(self, method: str) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                body = None
+            headers = {key.lower(): value for key, value in self.headers.items()}
+            status, extra_headers, payload = server.handle(
+                method, self.path, headers, body
+            )
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in extra_headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def date_time_string(self, timestamp: Optional[float] = None) -> str:
+            return formatdate(
+                server.clock() if timestamp is None else timestamp, usegmt=True
+            )
+
+        def do_GET(self) -> None:
+            self._serve("GET")
+
+        def do_POST(self) -> None:
+            self._serve("POST")
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the stand-in TassBeeh API.")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--token-ttl", type=float, default=3600.0)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--quests", type=int, default=30)
+    parser.add_argument("--clock-skew", type=float, default=0.0)
+    parser.add_argument("--outage-every", type=float, default=0.0)
+    parser.add_argument("--outage-seconds", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stand_in = StandInServer(
+        StandInSettings(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            token_ttl=args.token_ttl,
+            rate_limit=args.rate_limit,
+            quest_count=args.quests,
+            clock_skew=args.clock_skew,
+            outage_every=args.outage_every,
+            outage_seconds=args.outage_seconds,
+        ),
+        port=args.port,
+    )
+    print(f"Stand-in API listening on {stand_in.base_url}")
+    print(f"Run the bot with TASS_API_BASE_URL={stand_in.base_url}")
+    try:
+        stand_in._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,117 @@
+import argparse
+import json
+import time
+from typing import Optional
+
+from bench.cycle import SCENARIOS, VirtualTime, isolate_state
+from bench.server import StandInServer, StandInSettings
+from main import TassBeeh
+from tass.endpoints import Endpoints
+from utils import logger
+
+
+# Runs TassBeeh.run for whole simulated days against the stand-in API. The bot
+# is handed a virtual clock, so booster windows, prayer refills, check-in
+# rollovers and the waits between cycles all pass in seconds of CPU time,
+# without patching anything.
+def simulate(
+    name: str, settings: StandInSettings, hours: float, workers: Optional[int] = None
+) -> dict:
+    clock = VirtualTime()
+    bot = TassBeeh(clock)
+    if workers is not None:
+        bot.scheduler.max_workers = workers
+    state_dir = isolate_state(bot)
+    with state_dir, StandInServer(settings, clock=clock.time) as server:
+        Endpoints.configure(server.base_url)
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        try:
+            bot.run(duration=hours * 3600)
+        finally:
+            bot.credentials.close()
+        cpu = time.process_time() - cpu_start
+        wall = time.perf_counter() - wall_start
+        stages = bot.history.stage_summary() if bot.history is not None else []
+        if bot.history is not None:
+            bot.history.close()
+        requests = dict(server.requests.most_common())
+        taps = server.taps_registered
+        taps_boosted = server.taps_boosted
+
+    total = sum(requests.values())
+    booster_seconds = sum(
+        runs * mean for stage, runs, _, mean in stages if stage == "booster_swipe"
+    )
+    return {
+        "scenario": name,
+        "hours": hours,
+        "requests": total,
+        "requests_per_hour": total / hours,
+        "requests_per_1000_taps": total * 1000 / max(taps, 1),
+        "requests_by_route": requests,
+        "taps_registered": taps,
+        "taps_boosted": taps_boosted,
+        "booster_taps_per_minute": taps_boosted * 60 / max(booster_seconds, 1e-9),
+        "idle_hours": clock.idle / 3600,
+        "idle_share": clock.idle / (hours * 3600),
+        "cpu_seconds": cpu,
+        "wall_seconds": wall,
+        "stages": {
+            stage: {"runs": runs, "failed": failed, "mean_s": mean}
+            for stage, runs, failed, mean in stages
+        },
+    }
+
+
+def print_report(report: dict) -> None:
+    print(
+        f"\n== {report['scenario']}: {report['hours']:g} simulated hours in "
+        f"{report['cpu_seconds']:.1f}s CPU ({report['wall_seconds']:.1f}s wall) =="
+    )
+    print(
+        f"requests: {report['requests']} ({report['requests_per_hour']:.1f}/hour, "
+        f"{report['requests_per_1000_taps']:.1f} per 1000 taps)  "
+        f"taps: {report['taps_registered']} ({report['taps_boosted']} boosted, "
+        f"{report['booster_taps_per_minute']:.0f}/min while boosted)  "
+        f"idle: {report['idle_hours']:.1f}h ({report['idle_share']:.0%})"
+    )
+    print(f"{'stage':<16}{'runs':>7}{'failed':>8}{'mean s':>9}")
+    for stage, data in report["stages"].items():
+        print(f"{stage:<16}{data['runs']:>7}{data['failed']:>8}{data['mean_s']:>9.1f}")
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Run whole days of the bot on a virtual clock against the "
+        "stand-in API."
+    )
+    parser.add_argument("--hours", type=float, default=24.0)
+    parser.add_argument(
+        "--scenario", choices=sorted(SCENARIOS), action="append", default=None
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Stages run side by side (1 runs them one after another).",
+    )
+    parser.add_argument("--json", help="Write the full report to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep bot logging.")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logger.remove()
+
+    reports = [
+        simulate(name, SCENARIOS[name], args.hours, workers=args.workers)
+        for name in args.scenario or ["baseline"]
+    ]
+    for report in reports:
+        print_report(report)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(reports, file, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
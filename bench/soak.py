@@ -0,0 +1,148 @@
+import argparse
+import gc
+import json
+import resource
+import sys
+import time
+import tracemalloc
+from typing import Optional
+
+from bench.cycle import (
+    SCENARIOS,
+    CycleRecorder,
+    VirtualTime,
+    instrumented,
+    isolate_state,
+)
+from bench.server import StandInServer
+from main import TassBeeh
+from tass.endpoints import Endpoints
+from utils import logger
+
+
+def rss_bytes() -> int:
+    try:
+        with open("/proc/self/status") as file:
+            for line in file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak rather than current size, but it still catches steady growth.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+# Runs the bot against the stand-in API for days of simulated time and samples
+# the resident set size after every chunk. Growth is measured from the end of
+# the warmup, once caches, validators and the connection pool exist.
+def soak(
+    scenario: str, days: float, chunk_hours: float, warmup_chunks: int, trace: bool
+) -> dict:
+    clock = VirtualTime()
+    recorder = CycleRecorder(clock)
+    bot = TassBeeh(clock)
+    chunks = max(int(days * 24 / chunk_hours), warmup_chunks + 1)
+    samples: list[int] = []
+    cycles = 0
+    taps = 0
+    baseline_snapshot = None
+    growth_by_line: list[str] = []
+
+    state_dir = isolate_state(bot)
+    with (
+        state_dir,
+        StandInServer(SCENARIOS[scenario], clock=clock.time) as server,
+    ):
+        Endpoints.configure(server.base_url)
+        with instrumented(recorder, bot):
+            wall_start = time.perf_counter()
+            for chunk in range(chunks):
+                bot.run(duration=chunk_hours * 3600)
+                # The benchmark's own records would otherwise grow with the run.
+                cycles += sum(len(calls) for calls in recorder.stage_wall.values())
+                taps += server.taps_registered
+                recorder.requests.clear()
+                recorder.stage_wall.clear()
+                recorder.stage_virtual.clear()
+                recorder.stage_late.clear()
+                server.reset_stats()
+                gc.collect()
+                samples.append(rss_bytes())
+                if trace and chunk + 1 == warmup_chunks:
+                    tracemalloc.start(10)
+                    baseline_snapshot = tracemalloc.take_snapshot()
+            wall = time.perf_counter() - wall_start
+
+    if baseline_snapshot is not None:
+        growth = tracemalloc.take_snapshot().compare_to(baseline_snapshot, "traceback")
+        growth_by_line = [str(stat) for stat in growth[:10]]
+        tracemalloc.stop()
+
+    settled = samples[warmup_chunks - 1] if warmup_chunks else samples[0]
+    return {
+        "scenario": scenario,
+        "simulated_days": chunks * chunk_hours / 24,
+        "cycles": cycles,
+        "taps_registered": taps,
+        "wall_seconds": wall,
+        "rss_after_warmup": settled,
+        "rss_final": samples[-1],
+        "rss_peak": max(samples),
+        "growth_bytes": max(samples[warmup_chunks:]) - settled,
+        "rss_samples": samples,
+        "growth_by_line": growth_by_line,
+    }
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Check that memory stays bounded over a long simulated run."
+    )
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="faults")
+    parser.add_argument("--days", type=float, default=7.0)
+    parser.add_argument("--chunk-hours", type=float, default=6.0)
+    parser.add_argument("--warmup-chunks", type=int, default=4)
+    parser.add_argument(
+        "--max-growth-mb",
+        type=float,
+        default=16.0,
+        help="Fail if RSS grows by more than this after the warmup.",
+    )
+    parser.add_argument(
+        "--trace", action="store_true", help="Report where memory grew (slow)."
+    )
+    parser.add_argument("--json", help="Write the report to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep bot logging.")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logger.remove()
+
+    report = soak(
+        args.scenario, args.days, args.chunk_hours, args.warmup_chunks, args.trace
+    )
+    mb = 1024 * 1024
+    print(
+        f"{report['scenario']}: {report['simulated_days']:g} simulated days, "
+        f"{report['cycles']} stage runs, {report['taps_registered']} taps, "
+        f"wall {report['wall_seconds']:.1f}s"
+    )
+    print(
+        f"rss after warmup {report['rss_after_warmup'] / mb:.1f} MB, "
+        f"final {report['rss_final'] / mb:.1f} MB, "
+        f"peak {report['rss_peak'] / mb:.1f} MB, "
+        f"growth {report['growth_bytes'] / mb:+.2f} MB"
+    )
+    for line in report["growth_by_line"]:
+        print(f"  {line}")
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+    if report["growth_bytes"] > args.max_growth_mb * mb:
+        print(f"FAIL: memory grew by more than {args.max_growth_mb:g} MB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
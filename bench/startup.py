@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Optional
+
+from bench.cycle import FAKE_WEB_APP_DATA
+from bench.server import StandInServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WATCHED = (
+    "tass.models",
+    "tass.tass",
+    "tass.headers",
+    "pydantic",
+    "requests",
+    "loguru",
+    "fake_useragent",
+    "rich",
+    "http.server",
+)
+FIRST_REQUEST = f"""
+import time
+start = time.perf_counter()
+import main
+from tass.tass import Tass
+imported = time.perf_counter()
+Tass({FAKE_WEB_APP_DATA!r})
+print("first_response", imported - start, time.perf_counter() - start)
+"""
+
+
+def _python(args: list[str], env: Optional[dict] = None) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *args],
+        cwd=ROOT,
+        env={**os.environ, "PYTHONPATH": ROOT, **(env or {})},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+# Parses `python -X importtime` output into cumulative microseconds per module.
+def import_times(module: str) -> dict[str, int]:
+    result = _python(["-X", "importtime", "-c", f"import {module}"])
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def import_report(module: str, runs: int) -> dict:
+    samples = [import_times(module) for _ in range(runs)]
+    # Best of the runs, so disk cache and scheduler noise do not dominate.
+    total = min(sample.get(module, 0) for sample in samples)
+    modules = {name: min(sample.get(name, 0) for sample in samples) for name in WATCHED}
+    return {"module": module, "total_us": total, "modules": modules}
+
+
+def first_response(runs: int) -> dict:
+    interpreter = []
+    imports = []
+    requests = []
+    with StandInServer() as server:
+        env = {"TASS_API_BASE_URL": server.base_url}
+        for _ in range(runs):
+            launched = time.perf_counter()
+            result = _python(["-c", FIRST_REQUEST], env)
+            total = time.perf_counter() - launched
+            line = next(
+                line
+                for line in result.stdout.splitlines()
+                if line.startswith("first_response")
+            )
+            _, imported, responded = line.split()
+            imports.append(float(imported))
+            requests.append(float(responded) - float(imported))
+            interpreter.append(total - float(responded))
+    return {
+        "runs": runs,
+        "imports_ms": statistics.median(imports) * 1000,
+        "auth_request_ms": statistics.median(requests) * 1000,
+        "interpreter_ms": statistics.median(interpreter) * 1000,
+    }
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Report import time and cold start to the first API response."
+    )
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--json", help="Write the report to this file.")
+    args = parser.parse_args(argv)
+
+    imports = import_report(args.module, args.runs)
+    start = first_response(args.runs)
+    print(f"import {imports['module']}: {imports['total_us'] / 1000:.1f} ms")
+    for name, micros in imports["modules"].items():
+        loaded = f"{micros / 1000:8.1f} ms" if micros else "  not imported"
+        print(f"  {name:<16}{loaded}")
+    print(
+        f"cold start to first response: imports {start['imports_ms']:.1f} ms, "
+        f"auth request {start['auth_request_ms']:.1f} ms, "
+        f"interpreter and exit {start['interpreter_ms']:.1f} ms"
+    )
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"imports": imports, "first_response": start}, file, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,116 @@
+import argparse
+import itertools
+import json
+from typing import Any, Optional
+
+from pydantic import ValidationError
+
+from bench.cycle import SCENARIOS, run_scenario
+from utils import logger
+from utils.tuning import Tuning
+
+DEFAULT_GRID = [
+    "max_swipe=30,60",
+    "swipe_delay=2:5,5:10",
+]
+
+
+# "swipe_delay=2:5,5:10" -> ("swipe_delay", [[2.0, 5.0], [5.0, 10.0]])
+def parse_axis(spec: str) -> tuple[str, list[Any]]:
+    name, _, values = spec.partition("=")
+    if name not in Tuning.model_fields or not values:
+        raise argparse.ArgumentTypeError(
+            f"expected <field>=<v1>,<v2>,... with a field from "
+            f"{', '.join(Tuning.model_fields)}; got {spec!r}"
+        )
+    parsed = []
+    for value in values.split(","):
+        if ":" in value:
+            parsed.append([float(part) for part in value.split(":", 1)])
+        else:
+            parsed.append(float(value))
+    return name, parsed
+
+
+def sweep(axes: list[tuple[str, list[Any]]], scenario: str, hours: float) -> list[dict]:
+    names = [name for name, _ in axes]
+    results = []
+    for values in itertools.product(*(values for _, values in axes)):
+        changes = dict(zip(names, values))
+        try:
+            tuning = Tuning.model_validate({**Tuning().model_dump(), **changes})
+        except ValidationError as e:
+            print(f"skipping {changes}: {e.errors()[0]['msg']}")
+            continue
+        report = run_scenario(scenario, SCENARIOS[scenario], hours, tuning)
+        cycles = report["stages"].get("swipe_task", {})
+        results.append(
+            {
+                "settings": {name: getattr(tuning, name) for name in names},
+                "requests_per_1000_taps": report["requests_per_1000_taps"],
+                "taps_per_hour": report["taps_registered"] / hours,
+                "cycle_wall_ms": cycles.get("wall_mean_ms", 0.0),
+                "cycle_virtual_s": cycles.get("virtual_mean_s", 0.0),
+                "wall_seconds": report["wall_seconds"],
+            }
+        )
+    return results
+
+
+def _format(value: Any) -> str:
+    if isinstance(value, tuple):
+        return f"{value[0]:g}:{value[1]:g}"
+    return str(value)
+
+
+def print_results(results: list[dict]) -> None:
+    print(
+        f"{'settings':<48}{'req/1k taps':>12}{'taps/h':>9}"
+        f"{'cycle ms':>10}{'cycle s':>9}"
+    )
+    for result in sorted(results, key=lambda r: r["requests_per_1000_taps"]):
+        settings = " ".join(
+            f"{name}={_format(value)}" for name, value in result["settings"].items()
+        )
+        print(
+            f"{settings:<48}{result['requests_per_1000_taps']:>12.1f}"
+            f"{result['taps_per_hour']:>9.0f}{result['cycle_wall_ms']:>10.1f}"
+            f"{result['cycle_virtual_s']:>9.0f}"
+        )
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Sweep tuning settings against the stand-in API."
+    )
+    parser.add_argument(
+        "--set",
+        dest="axes",
+        type=parse_axis,
+        action="append",
+        help="A field and the values to try, e.g. swipe_delay=2:5,5:10. Repeat "
+        "for more fields; every combination is run.",
+    )
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="baseline")
+    parser.add_argument("--hours", type=float, default=2.0)
+    parser.add_argument("--json", help="Write the results to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep bot logging.")
+    args = parser.parse_args(argv)
+
+    if not args.verbose:
+        logger.remove()
+
+    axes = args.axes or [parse_axis(spec) for spec in DEFAULT_GRID]
+    results = sweep(axes, args.scenario, args.hours)
+    print(
+        f"{args.scenario}, {args.hours:g} simulated hours per setting; "
+        "cycle = one swipe_task run (wall ms, simulated s)"
+    )
+    print_results(results)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
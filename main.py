@@ -1,158 +1,413 @@
-import time
+import argparse
 import traceback
 from tass.models import UserModel
+from tass.pipeline import TapPipeline
+from tass.clocksync import ServerClock
+from tass.planner import Planner, prayer_ready_at
+from tass.quests import QuestEngine, QuestLedger
 from tass.tass import Tass
-from utils.file_loader import load_web_app_data
+from tass.transport import Transport
+from utils.file_loader import WebAppData, WebAppDataSource
 from utils import logger
+from utils.clock import SYSTEM_CLOCK, Clock
+from utils.history import History
+from utils.journal import Journal
+from utils.metrics import metrics
+from utils.profiling import StageProfiler
+from utils.scheduler import Scheduler, Stage
+from utils.tuning import Tuning, TuningFile
 import random
+from typing import Optional
 
 from datetime import datetime, timedelta, timezone
 
 
 class TassBeeh:
-    def __init__(self) -> None:
-        self.last_auth_time: datetime = datetime.now(timezone.utc) - timedelta(days=1)
-        self.auth_refresh_delay: int = 30
+    # Every sleep and clock read goes through `clock`; bench.simulate passes a
+    # virtual one to run days of scheduling in seconds.
+    def __init__(self, clock: Clock = SYSTEM_CLOCK) -> None:
+        self.clock = clock
+        self.last_auth_time: datetime = clock.now() - timedelta(days=1)
+        # Re-read when the file changes, so edits apply without a restart.
+        self.tuning_file = TuningFile("tuning.toml", clock=clock)
+        self.scheduler = Scheduler(retry_delay=60, clock=clock)
+        self.journal_path: str = "stage_journal.jsonl"
+        self.journal: Optional[Journal] = None
+        self.history_path: str = "history.sqlite3"
+        self.history: Optional[History] = None
+        self.quest_concurrency: int = 3
+        # Requests on the wire at once, across all stages running side by side.
+        self.max_in_flight: int = 4
+        self.quest_ledger_path: str = "quest_ledger.json"
+        self.tass: Optional[Tass] = None
+        self.transport: Optional[Transport] = None
+        # Server time for every deadline the API hands out; kept across restarts.
+        self.server_clock = ServerClock(clock=clock)
+        # Watched, so fresh data from the web client is picked up while running.
+        self.credentials = WebAppDataSource("webAppData.txt", clock=clock)
+        self.quest_engine: Optional[QuestEngine] = None
+
+    @property
+    def tuning(self) -> Tuning:
+        return self.tuning_file.current()
 
     def refresh_auth(self, tass: Tass) -> None:
-        gap = (datetime.now(timezone.utc) - self.last_auth_time).total_seconds()
-        if gap >= self.auth_refresh_delay:
-            logger.info(
-                f"Last authentication token refresh time: {self.last_auth_time}"
+        gap = (self.clock.now() - self.last_auth_time).total_seconds()
+        if gap >= self.tuning.auth_refresh_delay:
+            tass.tokens.ensure_fresh()
+            self.last_auth_time = self.clock.now()
+
+    def get_profile(self) -> UserModel:
+        profile = self.tass.get_profile_info()
+        if not profile:
+            logger.warning("Failed to retrieve profile information.")
+            raise Exception("Failed to retrieve profile information.")
+        if self.history is not None:
+            self.history.record_profile(profile, t=self.clock.time())
+        return profile
+
+    def check_in(self) -> Optional[float]:
+        if not self.tass.check_in():
+            raise Exception("Failed to check in.")
+        # The check-in day rolls over at midnight UTC on the server's clock.
+        today = self.server_clock.now_datetime().date()
+        self.journal.note("check_in", date=today.isoformat())
+        rollover = datetime.combine(
+            today + timedelta(days=1), datetime.min.time(), timezone.utc
+        )
+        logger.info("Next check-in at {}", rollover)
+        return self.server_clock.to_local(rollover.timestamp()) + random.randint(5, 60)
+
+    def refill_energy(self) -> Optional[float]:
+        profile = self.get_profile()
+        logger.info("Energy {}", profile.energy)
+        if not Planner(self.tuning).refill_due(profile.energy):
+            # A refill tops energy up to the maximum and would waste what is
+            # left, so that is spent first. swipe_task re-arms this stage.
+            self.scheduler.schedule_now("swipe_task", self.swipe_task)
+            return None
+
+        prayer_data = self.tass.get_prayer_data()
+        if not prayer_data:
+            raise Exception("Failed to retrieve prayer data.")
+        if self.tass.refill_energy(prayer_data):
+            # A refill sets energy to the maximum, so what was left is lost.
+            self.journal.note(
+                "refill_energy",
+                claimed_before=prayer_data.nextPrayer.isoformat(),
+                energy_wasted=profile.energy,
             )
-            logger.info("Refreshing authentication token...")
-            tass.refresh_auth_token()
-            self.last_auth_time = datetime.now(timezone.utc)
+            # swipe_task would find nothing to spend and hand straight back
+            # here, so an accepted refill that left energy low waits for the
+            # next prayer, or at least failed_taps_delay, instead.
+            energy = self.get_profile().energy
+            if Planner(self.tuning).refill_due(energy):
+                retry_at = max(
+                    self.server_clock.reached_at(prayer_data.nextPrayer.timestamp()),
+                    self.clock.time() + self.tuning.failed_taps_delay,
+                )
+                logger.warning(
+                    "Refill accepted but energy is still {}; trying again in {:.0f}s.",
+                    energy,
+                    retry_at - self.clock.time(),
+                )
+                return retry_at
+            self.scheduler.schedule_now("swipe_task", self.swipe_task)
+            return None
+        if not self.server_clock.has_reached(prayer_data.nextPrayer.timestamp()):
+            logger.info("Next refill at {}", prayer_data.nextPrayer)
+            return self.server_clock.reached_at(prayer_data.nextPrayer.timestamp())
+        raise Exception("Failed to refill energy.")
 
-    def booster_swipe(
-        self, user: UserModel, tass: Tass, min_swipe: int, max_swipe: int
-    ) -> None:
-        logger.info("Energy Booster period has started.")
+    def ad_boost(self) -> Optional[float]:
+        logger.info("Task: Ad Booster")
+        profile = self.get_profile()
+        finish_date = profile.energyBoosterFinishDate
+        if finish_date is None:
+            logger.info("User does not have an energy booster.")
+            return None
+
+        available_at = finish_date + timedelta(minutes=10)
+        if not self.server_clock.has_reached(available_at.timestamp()):
+            logger.info("Next ad booster at {}", available_at)
+            return self.server_clock.reached_at(available_at.timestamp())
 
-        if user.energyBoosterFinishDate is None:
-            return
-        finish_date = user.energyBoosterFinishDate
+        adboost = self.tass.ad_booster(profile)
+        if not adboost:
+            logger.warning("Failed to retrieve ad booster information.")
+            raise Exception("Failed to retrieve ad booster information.")
+        if adboost.status == "active":
+            logger.info("Ad Booster is active.")
+            self.scheduler.schedule_now(
+                "booster_swipe",
+                self.booster_swipe,
+                delay=self.tuning.booster_start_delay,
+            )
+        else:
+            logger.info("Ad Booster is inactive.")
+        logger.info("Next ad booster at {}", adboost.cooldownDate)
+        return self.server_clock.reached_at(adboost.cooldownDate.timestamp())
+
+    # Taps are free until the booster ends, so each call carries the largest
+    # batch that still finishes before the end margin. Once the server clock is
+    # known, the margin is its error plus a round trip.
+    def booster_stop(self, finish_date: datetime) -> float:
+        margin = self.server_clock.margin(self.tuning.booster_end_margin)
+        return Planner(self.tuning).booster_stop(finish_date.timestamp(), margin)
+
+    def booster_batch(self, finish_date: datetime) -> int:
+        stop_at = self.booster_stop(finish_date)
+        return Planner(self.tuning).booster_batch(self.server_clock.now(), stop_at)
+
+    def booster_swipe(self) -> Optional[float]:
+        profile = self.get_profile()
+        if profile.energyBoosterFinishDate is None:
+            return None
+        finish_date = profile.energyBoosterFinishDate
         total_energy_gained = 0
 
-        time.sleep(11)
-
-        while datetime.now(timezone.utc) + timedelta(seconds=10) < finish_date:
-            self.refresh_auth(tass)
-            swipes = random.randint(min_swipe, max_swipe)
-            is_registered = tass.register_taps(swipes)
-            if not is_registered:
-                logger.error("Failed to register taps.")
-                logger.info("--- Waiting for 10 seconds ---")
-                time.sleep(10)
-                continue
-            total_energy_gained += swipes
-            logger.info("--- Waiting for 2-5 seconds ---")
-            time.sleep(random.randint(2, 5))
-
-        logger.success(f"Total Energy Gained: {total_energy_gained}")
+        logger.info("Energy Booster period has started.")
+        send_at = self.clock.time()
+        with TapPipeline(self.tass.build_batch, self.clock) as pipeline:
+            pipeline.prepare(self.booster_batch(finish_date))
+            while True:
+                # Batches kept in the outbox go first; a prepared one waits.
+                batch = None
+                if self.server_clock.now() < self.booster_stop(finish_date):
+                    batch = self.tass.outbox.take(self.tuning.max_swipe)
+                batch = batch or pipeline.take()
+                if batch is None:
+                    break
+                # A slow or retried send can leave a prepared batch past the
+                # stop, where it would cost energy; it is dropped instead.
+                stop_at = self.server_clock.to_local(self.booster_stop(finish_date))
+                now = self.clock.time()
+                if now >= stop_at:
+                    logger.warning(
+                        "Booster ends before {} taps can be sent; dropping them.",
+                        batch.taps,
+                    )
+                    break
+                # The next batch is swiped while this one waits out its pause
+                # and is on the wire. booster_batch only sizes one that can
+                # still be swiped before the stop.
+                if not pipeline.pending:
+                    pipeline.prepare(self.booster_batch(finish_date))
+                tuning = self.tuning
+                delay = min(send_at, stop_at) - now
+                if delay > 0:
+                    logger.info("--- Waiting for {:.1f} seconds ---", delay)
+                    self.clock.sleep(delay)
+                self.refresh_auth(self.tass)
+                registered = self.tass.send_batch(batch)
+                if not registered:
+                    logger.error("Failed to register taps.")
+                    # A batch kept in the outbox is resent after a short backoff.
+                    delay = self.tass.outbox.resend_delay(tuning.failed_taps_delay)
+                else:
+                    total_energy_gained += registered
+                    delay = random.uniform(*tuning.booster_swipe_delay)
+                send_at = self.clock.time() + delay
+
+        self.journal.note(
+            "booster_swipe",
+            window_end=finish_date.isoformat(),
+            energy_gained=total_energy_gained,
+        )
+        logger.success("Total Energy Gained: {}", total_energy_gained)
         logger.info("Energy Booster period has ended.")
+        return None
 
-    def swipe_task(self, tass: Tass, profile: UserModel) -> None:
-        try:
-            min_swipe = 20
-            max_swipe = 30
-            self.ad_boost(tass)
-            self.booster_swipe(profile, tass, min_swipe, max_swipe)
-            energy_left = profile.energy
-
-            if energy_left < max_swipe:
-                logger.warning("Not enough energy to perform swipes. Skipping...")
-                logger.info(f"Minimum Energy Required: {max_swipe}")
-                logger.info(f"Energy left: {profile.energy}")
-                return
+    def swipe_task(self) -> Optional[float]:
+        profile = self.get_profile()
+        energy_left = profile.energy
+        batches = Planner(self.tuning).split(energy_left)
 
-            while energy_left > max_swipe:
-                self.refresh_auth(tass)
-                swipes = random.randint(min_swipe, max_swipe)
-                is_registered = tass.register_taps(swipes)
-                if not is_registered:
+        if not batches:
+            logger.warning("Not enough energy to perform swipes. Skipping...")
+            logger.info("Minimum Energy Required: {}", self.tuning.min_swipe)
+            logger.info("Energy left: {}", profile.energy)
+        else:
+            start = self.clock.time()
+            logger.info("Spending {} energy in {} calls.", sum(batches), len(batches))
+            while batches:
+                tuning = self.tuning
+                self.refresh_auth(self.tass)
+                swipes = batches[0]
+                registered = self.tass.register_taps(swipes)
+                if not registered:
                     logger.error("Failed to register taps.")
-                    logger.info("--- Waiting for 10 seconds ---")
-                    time.sleep(10)
+                    # A batch kept in the outbox is resent after a short backoff.
+                    delay = self.tass.outbox.resend_delay(tuning.failed_taps_delay)
+                    logger.info("--- Waiting for {:g} seconds ---", delay)
+                    self.clock.sleep(delay)
+                    # The taps may have counted anyway; go by the server's figure.
+                    energy_left = self.get_profile().energy
+                    batches = Planner(tuning).split(energy_left)
                     continue
-                energy_left -= swipes
+                energy_left -= registered
                 logger.success(
-                    f"Swiped {swipes} times. Remaining energy: {energy_left}"
+                    "Swiped {} times. Remaining energy: {}", registered, energy_left
                 )
-                logger.info("--- Waiting for 5-10 seconds ---")
-                time.sleep(random.randint(5, 10))
-
+                # Re-planned per batch so tuning edits apply to the next one.
+                batches = Planner(self.tuning).split(energy_left)
+                if batches:
+                    delay = random.uniform(*tuning.swipe_delay)
+                    logger.info("--- Waiting for {:.1f} seconds ---", delay)
+                    self.clock.sleep(delay)
             logger.warning("Energy completely exhausted.")
-        except Exception as e:
-            logger.error(f"Error during swipe task: {e}")
-            logger.error("Traceback: " + traceback.format_exc())
+            logger.info(
+                "Swipe task completed in {:.0f} seconds.", self.clock.time() - start
+            )
 
-    def quests_task(self, tass: Tass):
+        # The energy is spent, so the refill is claimed as soon as a prayer is
+        # ready rather than polled for.
+        prayer_data = self.tass.get_prayer_data()
+        if prayer_data is None:
+            self.scheduler.schedule_now("refill_energy", self.refill_energy)
+        else:
+            ready_at = prayer_ready_at(prayer_data, self.server_clock.now_datetime())
+            self.scheduler.schedule(
+                "refill_energy",
+                self.server_clock.reached_at(ready_at),
+                self.refill_energy,
+            )
+        return None
+
+    def quests_task(self) -> Optional[float]:
         logger.info("Task: Quests")
-        quests = tass.get_quests()
+        quests = self.tass.get_quests()
         if not quests:
             logger.warning("Failed to retrieve quest information.")
             raise Exception("Failed to retrieve quest information.")
 
-        tass.claim_quests(quests.regularQuests, "Regular")
-        tass.claim_quests(quests.dailyQuests, "Daily")
-        tass.claim_quests(quests.partnerQuests, "Partner")
+        claimed = self.quest_engine.claim(quests)
+        self.journal.note("quests_task", claimed=claimed)
+        logger.success("Quests completed. {} claimed.", claimed)
+        auth_stats = self.tass.tokens.reset_stats()
+        logger.info(
+            "Auth calls: {} made, {} saved, {} requests retried after 401.",
+            auth_stats.refreshes,
+            auth_stats.saved,
+            auth_stats.retried_401,
+        )
+        cache_stats = self.tass.cache.reset_stats()
+        logger.info(
+            "Read cache: {} hits, {} misses ({:.0%}), {} invalidations.",
+            cache_stats.hits,
+            cache_stats.misses,
+            cache_stats.hit_rate,
+            cache_stats.invalidations,
+        )
+        outbox_stats = self.tass.outbox.reset_stats()
+        logger.info(
+            "Tap outbox: {} batches kept, {} resent, {} dropped.",
+            outbox_stats.kept,
+            outbox_stats.resent,
+            outbox_stats.dropped,
+        )
+        transport_stats = self.transport.reset_stats()
+        logger.info(
+            "Connections: {} opened ({:.0f} ms setting up, {} TLS resumed), "
+            "{} evicted idle, {} DNS lookups, {} requests queued for a slot.",
+            transport_stats.connections,
+            transport_stats.setup_seconds * 1000,
+            transport_stats.tls_resumed,
+            transport_stats.evicted,
+            transport_stats.dns_lookups,
+            transport_stats.queued,
+        )
+        return self.clock.time() + random.uniform(*self.tuning.quest_interval)
 
-        logger.success("Quests completed.")
+    # The stage graph. swipe_task spends the energy that refills and boosters
+    # provide, so it never runs beside them; check-in and quests depend on
+    # nothing and run alongside the swipe loops.
+    def stages(self) -> list[Stage]:
+        return [
+            Stage("check_in", self.check_in),
+            Stage("refill_energy", self.refill_energy),
+            Stage("ad_boost", self.ad_boost),
+            Stage("booster_swipe", self.booster_swipe, after=("ad_boost",)),
+            Stage(
+                "swipe_task",
+                self.swipe_task,
+                after=("refill_energy", "booster_swipe"),
+            ),
+            Stage("quests_task", self.quests_task),
+        ]
 
-    def ad_boost(self, tass: Tass) -> bool:
-        logger.info("Task: Ad Booster")
-        profile = tass.get_profile_info()
+    # New data is used from the next login; the live token and session are kept.
+    def use_web_app_data(self, data: WebAppData) -> None:
+        if self.tass is not None:
+            self.tass.web_app_data = data.raw
 
-        if not profile:
-            logger.warning("Failed to retrieve profile information.")
-            raise Exception("Failed to retrieve profile information.")
-        adboost = tass.ad_booster(profile)
-        if not adboost:
-            logger.warning("Failed to retrieve ad booster information.")
-            return False
-        if adboost.status == "active":
-            logger.info("Ad Booster is active.")
-            return True
-        logger.info("Ad Booster is inactive.")
-        return False
+    def start(self) -> None:
+        self.credentials.watch(self.use_web_app_data)
+        web_app_data = self.credentials.current().raw
+        # Outlives the client, so a restart after an error reuses its connections.
+        if self.transport is None:
+            self.transport = Transport(
+                pool_maxsize=self.max_in_flight,
+                max_in_flight=self.max_in_flight,
+                clock=self.clock,
+            )
+        self.tass = Tass(
+            web_app_data,
+            session=self.transport.session,
+            server_clock=self.server_clock,
+            clock=self.clock,
+        )
+        self.quest_engine = QuestEngine(
+            self.tass,
+            QuestLedger.load(self.quest_ledger_path),
+            concurrency=self.quest_concurrency,
+        )
+        if self.history is None:
+            self.history = History.open(
+                self.history_path, request_count=self.transport.request_count
+            )
+            self.scheduler.history = self.history
+        self.tass.log_profile(self.get_profile())
+
+        # Stages finished before a restart wait for the time they asked for;
+        # the rest, including one that failed, run now.
+        self.journal = self.scheduler.journal = Journal.load(
+            self.journal_path, self.clock
+        )
+        self.scheduler.resume_stages(self.stages())
 
-    def run(self):
-        while True:
+    def run(self, duration: Optional[float] = None):
+        until = None if duration is None else self.clock.time() + duration
+        while self.tass is None:
+            if until is not None and self.clock.time() >= until:
+                return
             try:
-                web_app_data = load_web_app_data()
-                tass = Tass(web_app_data)
-                profile = tass.get_profile_info()
-                if not profile:
-                    logger.warning("Failed to retrieve profile information.")
-                    raise Exception("Failed to retrieve profile information.")
-
-                tass.log_profile(profile)
-                time.sleep(5)
-
-                tass.check_in()
-                time.sleep(5)
-                logger.info(f"Energy {profile.energy}")
-                if profile.energy < 3000:
-                    tass.refill_energy()
-                    time.sleep(5)
-
-                time.sleep(5)
-                start = time.time()
-                self.swipe_task(tass, profile)
-                end = time.time()
-                logger.info(f"Swipe task completed in {(end - start) // 60} seconds.")
-                logger.success("--- Swipe task completed. Waiting for next cycle ---")
-                self.quests_task(tass)
-                delay = random.randint(5 * 60, 10 * 60)
-                logger.info(f"Waiting for {delay // 60} minutes...")
-                time.sleep(delay)
+                self.start()
             except Exception as e:
-                logger.error(f"Error in main loop: {e}")
+                logger.error("Error in main loop: {}", e)
                 logger.error("Traceback: " + traceback.format_exc())
-                logger.info("--- Main loop error. Waiting for 5 minutes ---")
-                time.sleep(60 * 5)
+                logger.info(
+                    "--- Main loop error. Waiting for 5 minutes or new data in {} ---",
+                    self.credentials.path,
+                )
+                self.tass = None
+                self.credentials.wait_for_change(60 * 5)
+        self.scheduler.run(until=until)
 
 
 if __name__ == "__main__":
-    TassBeeh().run()
+    parser = argparse.ArgumentParser(description="Run the TassBeeh bot.")
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="profile",
+        metavar="DIR",
+        help="Profile each stage and write the reports to DIR (default: profile).",
+    )
+    args = parser.parse_args()
+
+    metrics.start_from_env()
+    bot = TassBeeh()
+    if args.profile:
+        bot.scheduler.profiler = StageProfiler(args.profile)
+    bot.run()
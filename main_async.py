@@ -0,0 +1,289 @@
+import asyncio
+import os
+import random
+import time
+import traceback
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+import httpx
+
+from tass.async_tass import AsyncTass, create_client
+from tass.clocksync import ServerClock
+from tass.models import UserModel
+from tass.pipeline import AsyncTapPipeline
+from tass.planner import Planner
+from tass.quests import AsyncQuestEngine, QuestLedger
+from utils import logger
+from utils.file_loader import WebAppData, WebAppDataSource
+from utils.metrics import metrics
+from utils.tuning import Tuning, TuningFile
+
+
+class AsyncTassBeeh:
+    def __init__(self, client: Optional[httpx.AsyncClient] = None) -> None:
+        self.last_auth_time: datetime = datetime.now(timezone.utc) - timedelta(days=1)
+        self.tuning_file = TuningFile("tuning.toml")
+        self.client = client
+        self.server_clock = ServerClock()
+        self.credentials = WebAppDataSource("webAppData.txt")
+        self.tass: Optional[AsyncTass] = None
+        self.quest_concurrency: int = 3
+        self.quest_ledger_path: str = "quest_ledger.json"
+        self.quest_engine: Optional[AsyncQuestEngine] = None
+
+    @property
+    def tuning(self) -> Tuning:
+        return self.tuning_file.current()
+
+    # Called from the watcher thread; a cycle in progress logs in with it next.
+    def use_web_app_data(self, data: WebAppData) -> None:
+        if self.tass is not None:
+            self.tass.web_app_data = data.raw
+
+    async def refresh_auth(self, tass: AsyncTass) -> None:
+        gap = (datetime.now(timezone.utc) - self.last_auth_time).total_seconds()
+        if gap >= self.tuning.auth_refresh_delay:
+            await tass.tokens.ensure_fresh()
+            self.last_auth_time = datetime.now(timezone.utc)
+
+    def booster_stop(self, finish_date: datetime) -> float:
+        margin = self.server_clock.margin(self.tuning.booster_end_margin)
+        return Planner(self.tuning).booster_stop(finish_date.timestamp(), margin)
+
+    def booster_batch(self, finish_date: datetime) -> int:
+        stop_at = self.booster_stop(finish_date)
+        return Planner(self.tuning).booster_batch(self.server_clock.now(), stop_at)
+
+    async def booster_swipe(self, user: UserModel, tass: AsyncTass) -> None:
+        logger.info("Energy Booster period has started.")
+
+        if user.energyBoosterFinishDate is None:
+            return
+        finish_date = user.energyBoosterFinishDate
+        total_energy_gained = 0
+
+        await asyncio.sleep(self.tuning.booster_start_delay)
+
+        send_at = time.time()
+        async with AsyncTapPipeline(tass.build_batch) as pipeline:
+            pipeline.prepare(self.booster_batch(finish_date))
+            while True:
+                # Batches kept in the outbox go first; a prepared one waits.
+                batch = None
+                if self.server_clock.now() < self.booster_stop(finish_date):
+                    batch = tass.outbox.take(self.tuning.max_swipe)
+                batch = batch or await pipeline.take()
+                if batch is None:
+                    break
+                # A slow or retried send can leave a prepared batch past the
+                # stop, where it would cost energy; it is dropped instead.
+                stop_at = self.server_clock.to_local(self.booster_stop(finish_date))
+                now = time.time()
+                if now >= stop_at:
+                    logger.warning(
+                        "Booster ends before {} taps can be sent; dropping them.",
+                        batch.taps,
+                    )
+                    break
+                # The next batch is swiped while this one waits out its pause
+                # and is on the wire. booster_batch only sizes one that can
+                # still be swiped before the stop.
+                if not pipeline.pending:
+                    pipeline.prepare(self.booster_batch(finish_date))
+                tuning = self.tuning
+                delay = min(send_at, stop_at) - now
+                if delay > 0:
+                    logger.info("--- Waiting for {:.1f} seconds ---", delay)
+                    await asyncio.sleep(delay)
+                await self.refresh_auth(tass)
+                registered = await tass.send_batch(batch)
+                if not registered:
+                    logger.error("Failed to register taps.")
+                    # A batch kept in the outbox is resent after a short backoff.
+                    delay = tass.outbox.resend_delay(tuning.failed_taps_delay)
+                else:
+                    total_energy_gained += registered
+                    delay = random.uniform(*tuning.booster_swipe_delay)
+                send_at = time.time() + delay
+
+        logger.success("Total Energy Gained: {}", total_energy_gained)
+        logger.info("Energy Booster period has ended.")
+
+    async def swipe_task(self, tass: AsyncTass, profile: UserModel) -> None:
+        try:
+            await self.ad_boost(tass)
+            await self.booster_swipe(profile, tass)
+            energy_left = profile.energy
+            batches = Planner(self.tuning).split(energy_left)
+
+            if not batches:
+                logger.warning("Not enough energy to perform swipes. Skipping...")
+                logger.info("Minimum Energy Required: {}", self.tuning.min_swipe)
+                logger.info("Energy left: {}", profile.energy)
+                return
+
+            while batches:
+                tuning = self.tuning
+                await self.refresh_auth(tass)
+                swipes = batches[0]
+                registered = await tass.register_taps(swipes)
+                if not registered:
+                    logger.error("Failed to register taps.")
+                    # A batch kept in the outbox is resent after a short backoff.
+                    delay = tass.outbox.resend_delay(tuning.failed_taps_delay)
+                    logger.info("--- Waiting for {:g} seconds ---", delay)
+                    await asyncio.sleep(delay)
+                    continue
+                energy_left -= registered
+                logger.success(
+                    "Swiped {} times. Remaining energy: {}", registered, energy_left
+                )
+                batches = Planner(self.tuning).split(energy_left)
+                if batches:
+                    delay = random.uniform(*tuning.swipe_delay)
+                    logger.info("--- Waiting for {:.1f} seconds ---", delay)
+                    await asyncio.sleep(delay)
+
+            logger.warning("Energy completely exhausted.")
+        except Exception as e:
+            logger.error("Error during swipe task: {}", e)
+            logger.error("Traceback: " + traceback.format_exc())
+
+    async def quests_task(self, tass: AsyncTass):
+        logger.info("Task: Quests")
+        quests = await tass.get_quests()
+        if not quests:
+            logger.warning("Failed to retrieve quest information.")
+            raise Exception("Failed to retrieve quest information.")
+
+        claimed = await self.quest_engine.claim(quests)
+        logger.success("Quests completed. {} claimed.", claimed)
+
+    async def ad_boost(self, tass: AsyncTass) -> bool:
+        logger.info("Task: Ad Booster")
+        profile = await tass.get_profile_info()
+
+        if not profile:
+            logger.warning("Failed to retrieve profile information.")
+            raise Exception("Failed to retrieve profile information.")
+        adboost = await tass.ad_booster(profile)
+        if not adboost:
+            logger.warning("Failed to retrieve ad booster information.")
+            return False
+        if adboost.status == "active":
+            logger.info("Ad Booster is active.")
+            return True
+        logger.info("Ad Booster is inactive.")
+        return False
+
+    async def check_in_stage(self, tass: AsyncTass) -> None:
+        with metrics.stage("check_in"):
+            await tass.check_in()
+
+    async def energy_stages(self, tass: AsyncTass, profile: UserModel) -> None:
+        await asyncio.sleep(self.tuning.stage_pause)
+        logger.info("Energy {}", profile.energy)
+        # A refill tops energy up to the maximum and would waste what is left,
+        # so it is only claimed once that is spent, as in TassBeeh.
+        if Planner(self.tuning).refill_due(profile.energy):
+            with metrics.stage("refill_energy"):
+                refilled = await tass.refill_energy()
+            if refilled:
+                profile = await tass.get_profile_info() or profile
+            await asyncio.sleep(self.tuning.stage_pause)
+
+        await asyncio.sleep(self.tuning.stage_pause)
+        start = time.time()
+        with metrics.stage("swipe_task"):
+            await self.swipe_task(tass, profile)
+        end = time.time()
+        logger.info("Swipe task completed in {:.0f} seconds.", end - start)
+        logger.success("--- Swipe task completed. Waiting for next cycle ---")
+
+    async def quests_stage(self, tass: AsyncTass) -> None:
+        with metrics.stage("quests_task"):
+            await self.quests_task(tass)
+
+    async def run_cycle(self, client: httpx.AsyncClient) -> None:
+        self.credentials.watch(self.use_web_app_data)
+        # One client for the bot's lifetime: its token manager logs in again
+        # only when the token runs out, and the read cache and tap outbox carry
+        # over from one cycle to the next.
+        if self.tass is None:
+            self.tass = await AsyncTass.create(
+                self.credentials.current().raw, client, self.server_clock
+            )
+            self.quest_engine = AsyncQuestEngine(
+                self.tass,
+                QuestLedger.load(self.quest_ledger_path),
+                concurrency=self.quest_concurrency,
+            )
+        tass = self.tass
+        profile = await tass.get_profile_info()
+        if not profile:
+            logger.warning("Failed to retrieve profile information.")
+            raise Exception("Failed to retrieve profile information.")
+
+        tass.log_profile(profile)
+        await asyncio.sleep(self.tuning.stage_pause)
+
+        # Check-in and quests do not touch energy, so they run alongside the
+        # refill and swipe loop instead of waiting for it. Every stage gets to
+        # finish before a failure is raised.
+        results = await asyncio.gather(
+            self.check_in_stage(tass),
+            self.energy_stages(tass, profile),
+            self.quests_stage(tass),
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        auth_stats = tass.tokens.reset_stats()
+        logger.info(
+            "Auth calls: {} made, {} saved, {} requests retried after 401.",
+            auth_stats.refreshes,
+            auth_stats.saved,
+            auth_stats.retried_401,
+        )
+        cache_stats = tass.cache.reset_stats()
+        logger.info(
+            "Read cache: {} hits, {} misses ({:.0%}), {} invalidations.",
+            cache_stats.hits,
+            cache_stats.misses,
+            cache_stats.hit_rate,
+            cache_stats.invalidations,
+        )
+
+    async def run(self, cycles: Optional[int] = None):
+        # Connections are pooled across cycles; only a client created here is closed here.
+        owns_client = self.client is None
+        client = self.client or create_client(http2=os.getenv("TASS_HTTP2") == "1")
+        try:
+            completed = 0
+            while cycles is None or completed < cycles:
+                completed += 1
+                try:
+                    await self.run_cycle(client)
+                    delay = random.uniform(*self.tuning.quest_interval)
+                    logger.info("Waiting for {:.0f} minutes...", delay / 60)
+                    await asyncio.sleep(delay)
+                except Exception as e:
+                    logger.error("Error in main loop: {}", e)
+                    logger.error("Traceback: " + traceback.format_exc())
+                    logger.info(
+                        "--- Main loop error. Waiting for 5 minutes "
+                        "or new data in {} ---",
+                        self.credentials.path,
+                    )
+                    await asyncio.to_thread(self.credentials.wait_for_change, 60 * 5)
+        finally:
+            if owns_client:
+                await client.aclose()
+                self.tass = None
+
+
+if __name__ == "__main__":
+    metrics.start_from_env()
+    asyncio.run(AsyncTassBeeh().run())
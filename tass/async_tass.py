@@ -0,0 +1,241 @@
+import time
+from typing import Optional, Self
+
+import httpx
+
+from tass.auth import AsyncTokenManager
+from tass.clocksync import ServerClock
+from tass.core import TassCore
+from tass.coordinates import Swipe
+from tass.endpoints import Endpoints
+from tass.outbox import TapBatch
+from tass.retry import CircuitOpenError, RetryPolicy
+from tass.models import (
+    AdBooster,
+    CheckInModel,
+    PrayerDataModel,
+    Quest,
+    QuestData,
+    UserModel,
+)
+from utils import logger
+from utils.clock import SYSTEM_CLOCK, Clock
+from utils.metrics import metrics
+
+
+def create_client(
+    http2: bool = False,
+    max_connections: int = 10,
+    max_keepalive_connections: int = 5,
+    keepalive_expiry: float = 60.0,
+    timeout: float = 30.0,
+) -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        ),
+        timeout=timeout,
+    )
+
+
+# Failures while connecting or waiting for a pooled connection: the request
+# never left, so resending it cannot make the server count it twice.
+NEVER_SENT = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class AsyncTass(TassCore):
+    def __init__(
+        self,
+        web_app_data: str,
+        client: httpx.AsyncClient,
+        retry_policy: Optional[RetryPolicy] = None,
+        server_clock: Optional[ServerClock] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        super().__init__(web_app_data, retry_policy, server_clock, clock)
+        self.client = client
+        self.tokens = AsyncTokenManager(self.__get_auth_token, clock=clock)
+
+    @classmethod
+    async def create(
+        cls,
+        web_app_data: str,
+        client: httpx.AsyncClient,
+        server_clock: Optional[ServerClock] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> Self:
+        tass = cls(web_app_data, client, server_clock=server_clock, clock=clock)
+        await tass.tokens.refresh()
+        if not tass.auth_token:
+            logger.error("Error: Failed to retrieve Auth Token.")
+            raise Exception("Could not retrieve Auth Token.")
+        return tass
+
+    async def _send(
+        self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs
+    ) -> httpx.Response:
+        if idempotent is None:
+            idempotent = method == "GET"
+        endpoint = url.removeprefix(Endpoints.BASE_URL)
+        breaker = self._breaker(endpoint)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            sent = self.clock.time()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                resendable = idempotent or isinstance(e, NEVER_SENT)
+                delay = self._error_delay(
+                    breaker, method, endpoint, e, attempt, resendable
+                )
+                if delay is None:
+                    raise
+            else:
+                self._observe(
+                    method,
+                    endpoint,
+                    response,
+                    sent,
+                    time.perf_counter() - start,
+                    len(response.request.content),
+                )
+                delay = self._status_delay(
+                    method, endpoint, response, attempt, idempotent
+                )
+                if delay is None:
+                    break
+            metrics.observe_retry(endpoint)
+            await self.clock.asleep(delay)
+            attempt += 1
+        self._record_outcome(breaker, endpoint, response.status_code)
+        return response
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        token = await self.tokens.get()
+        response = await self._send(
+            method, url, headers=self._auth_headers(token), **kwargs
+        )
+        if response.status_code == 401:
+            self._note_401_retry(url)
+            token = await self.tokens.refresh(stale=token)
+            response = await self._send(
+                method, url, headers=self._auth_headers(token), **kwargs
+            )
+        self.cache.invalidate_for(method, url)
+        return response
+
+    async def __generate_swipes(self, swipes_count: int) -> list[Swipe]:
+        swipes = []
+        for _ in range(swipes_count):
+            swipes.append(self._swipe())
+            await self.clock.asleep(0.2)
+        return swipes
+
+    async def __get_auth_token(self) -> tuple[Optional[str], dict]:
+        response = await self._send(
+            "POST", Endpoints.AUTH_TOKEN_URL, **self._auth_request()
+        )
+        return self._auth_result(response)
+
+    async def refresh_auth_token(self):
+        await self.tokens.refresh()
+
+    async def register_taps(self, swipes_count: int) -> int:
+        batch = self.outbox.take(swipes_count)
+        if batch is None:
+            batch = await self.build_batch(swipes_count)
+        else:
+            logger.info("Resending {} taps from the outbox.", batch.taps)
+        return await self.send_batch(batch)
+
+    async def build_batch(self, swipes_count: int) -> TapBatch:
+        return self._batch(await self.__generate_swipes(swipes_count))
+
+    async def send_batch(self, batch: TapBatch) -> int:
+        try:
+            response = await self._request(
+                "POST", Endpoints.REGISTER_TAPS_URL, content=batch.payload
+            )
+        except CircuitOpenError as e:
+            registered = self._batch_failed(batch, e, never_sent=True)
+        except httpx.TransportError as e:
+            registered = self._batch_failed(batch, e, isinstance(e, NEVER_SENT))
+        else:
+            registered = self._batch_sent(batch, response)
+        if registered is None:
+            return await self.__settle(batch)
+        return registered
+
+    async def __settle(self, batch: TapBatch) -> int:
+        before = self.total_taps
+        self.cache.invalidate(Endpoints.PROFILE_URL)
+        try:
+            profile = await self.get_profile_info()
+        except (httpx.HTTPError, CircuitOpenError, ValueError) as e:
+            logger.warning("Could not re-read the profile: {}", e)
+            profile = None
+        return self._settled(batch, before, profile)
+
+    async def get_profile_info(self) -> Optional[UserModel]:
+        cached = self.cache.get(Endpoints.PROFILE_URL)
+        if cached is not None:
+            return cached
+        return self._profile(await self._request("GET", Endpoints.PROFILE_URL))
+
+    async def get_checkin_info(self) -> Optional[CheckInModel]:
+        cached = self.cache.get(Endpoints.CHECK_IN_URL)
+        if cached is not None:
+            return cached
+        return self._checkin_info(await self._request("GET", Endpoints.CHECK_IN_URL))
+
+    async def check_in(self) -> bool:
+        logger.info("Trying to check in")
+        check_in_info = await self.get_checkin_info()
+        if not check_in_info:
+            logger.warning("Failed to retrieve check-in information.")
+            return False
+        if self._checked_in_today(check_in_info):
+            return True
+        return self._checked_in(await self._request("POST", Endpoints.CHECK_IN_URL))
+
+    async def refill_energy(
+        self, prayer_data: Optional[PrayerDataModel] = None
+    ) -> bool:
+        prayer_data = prayer_data or await self.get_prayer_data()
+        if not prayer_data:
+            logger.warning("Failed to retrieve prayer data.")
+            return False
+        if not self._refill_due(prayer_data):
+            return False
+        return self._refilled(await self._request("POST", Endpoints.REFILL_ENERGY_URL))
+
+    async def get_prayer_data(self) -> Optional[PrayerDataModel]:
+        cached = self.cache.get(Endpoints.PRAYER_STATUS_URL)
+        if cached is not None:
+            return cached
+        return self._prayer_data(
+            await self._request("GET", Endpoints.PRAYER_STATUS_URL)
+        )
+
+    async def get_quests(self) -> Optional[QuestData]:
+        await self.tokens.ensure_fresh()
+        cached = self.cache.get(Endpoints.QUESTS_URL)
+        if cached is not None:
+            return cached
+        return self._quests(await self._request("GET", Endpoints.QUESTS_URL))
+
+    async def verify_quest(self, quest: Quest) -> Optional[bool]:
+        response = await self._request(
+            "POST", Endpoints.VERIFY_QUEST_URL, json={"questId": quest.id}
+        )
+        return self._verified(quest, response)
+
+    async def ad_booster(self, user: UserModel) -> Optional[AdBooster]:
+        if not self._ad_booster_due(user):
+            return None
+        await self.tokens.ensure_fresh()
+        return self._ad_booster(await self._request("POST", Endpoints.AD_BOOSTER_URL))
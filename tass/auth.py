@@ -0,0 +1,137 @@
+import asyncio
+import base64
+import json
+import threading
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from utils import logger
+from utils.clock import SYSTEM_CLOCK, Clock
+
+# Used when neither the token nor the auth response carries an expiry.
+DEFAULT_TOKEN_TTL = 15 * 60
+REFRESH_MARGIN = 60
+_CURRENT = object()
+
+
+def decode_token_expiry(token: str) -> Optional[float]:
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+    payload = parts[1] + "=" * (-len(parts[1]) % 4)
+    try:
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def token_expiry(token: str, response_data: dict, now: float) -> float:
+    expiry = decode_token_expiry(token)
+    if expiry is not None:
+        return expiry
+    if isinstance(response_data.get("expiresIn"), (int, float)):
+        return now + response_data["expiresIn"]
+    return now + DEFAULT_TOKEN_TTL
+
+
+@dataclass
+class AuthStats:
+    refreshes: int = 0
+    saved: int = 0
+    retried_401: int = 0
+
+
+class _TokenState:
+    def __init__(self, refresh_margin: float, clock: Clock) -> None:
+        self.refresh_margin = refresh_margin
+        self.clock = clock
+        self.token: Optional[str] = None
+        self.issued_at = 0.0
+        self.expires_at = 0.0
+        self.stats = AuthStats()
+
+    def needs_refresh(self) -> bool:
+        if self.token is None:
+            return True
+        # Short-lived tokens get a proportional margin instead of the fixed one.
+        margin = min(self.refresh_margin, (self.expires_at - self.issued_at) / 4)
+        return self.clock.time() >= self.expires_at - margin
+
+    def store(self, token: Optional[str], response_data: dict) -> None:
+        now = self.clock.time()
+        self.token = token
+        self.issued_at = now
+        self.expires_at = token_expiry(token, response_data, now) if token else now
+        self.stats.refreshes += 1
+
+    def reset_stats(self) -> AuthStats:
+        stats, self.stats = self.stats, AuthStats()
+        return stats
+
+
+class TokenManager(_TokenState):
+    def __init__(
+        self,
+        fetch: Callable[[], tuple[Optional[str], dict]],
+        refresh_margin: float = REFRESH_MARGIN,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        super().__init__(refresh_margin, clock)
+        self._fetch = fetch
+        self._lock = threading.Lock()
+
+    def get(self) -> Optional[str]:
+        if self.needs_refresh():
+            return self.refresh(stale=self.token)
+        return self.token
+
+    def ensure_fresh(self) -> Optional[str]:
+        if not self.needs_refresh():
+            self.stats.saved += 1
+            return self.token
+        return self.refresh(stale=self.token)
+
+    def refresh(self, stale=_CURRENT) -> Optional[str]:
+        if stale is _CURRENT:
+            stale = self.token
+        with self._lock:
+            # Another caller already replaced the stale token while we waited.
+            if self.token != stale and not self.needs_refresh():
+                return self.token
+            logger.info("Refreshing authentication token...")
+            self.store(*self._fetch())
+            return self.token
+
+
+class AsyncTokenManager(_TokenState):
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[tuple[Optional[str], dict]]],
+        refresh_margin: float = REFRESH_MARGIN,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        super().__init__(refresh_margin, clock)
+        self._fetch = fetch
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> Optional[str]:
+        if self.needs_refresh():
+            return await self.refresh(stale=self.token)
+        return self.token
+
+    async def ensure_fresh(self) -> Optional[str]:
+        if not self.needs_refresh():
+            self.stats.saved += 1
+            return self.token
+        return await self.refresh(stale=self.token)
+
+    async def refresh(self, stale=_CURRENT) -> Optional[str]:
+        if stale is _CURRENT:
+            stale = self.token
+        async with self._lock:
+            if self.token != stale and not self.needs_refresh():
+                return self.token
+            logger.info("Refreshing authentication token...")
+            self.store(*await self._fetch())
+            return self.token
@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+from typing import Any, Optional, TypeVar
+
+from tass.endpoints import Endpoints
+from utils.clock import SYSTEM_CLOCK, Clock
+
+T = TypeVar("T")
+
+
+def default_ttls() -> dict[str, float]:
+    return {
+        Endpoints.PROFILE_URL: 15,
+        Endpoints.CHECK_IN_URL: 60 * 60,
+        Endpoints.PRAYER_STATUS_URL: 60,
+        Endpoints.QUESTS_URL: 5 * 60,
+    }
+
+
+# Mutating endpoint -> cached reads whose data it changes.
+def default_invalidations() -> dict[str, tuple[str, ...]]:
+    return {
+        Endpoints.REGISTER_TAPS_URL: (Endpoints.PROFILE_URL,),
+        Endpoints.CHECK_IN_URL: (Endpoints.CHECK_IN_URL, Endpoints.PROFILE_URL),
+        Endpoints.REFILL_ENERGY_URL: (
+            Endpoints.PRAYER_STATUS_URL,
+            Endpoints.PROFILE_URL,
+        ),
+        Endpoints.VERIFY_QUEST_URL: (Endpoints.QUESTS_URL, Endpoints.PROFILE_URL),
+        Endpoints.AD_BOOSTER_URL: (Endpoints.PROFILE_URL,),
+    }
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    invalidations: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResponseCache:
+    def __init__(
+        self,
+        ttls: Optional[dict[str, float]] = None,
+        invalidations: Optional[dict[str, tuple[str, ...]]] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.clock = clock
+        self.ttls = default_ttls() if ttls is None else ttls
+        self.invalidations = (
+            default_invalidations() if invalidations is None else invalidations
+        )
+        self.stats = CacheStats()
+        self._entries: dict[str, tuple[float, Any]] = {}
+
+    def get(self, url: str) -> Optional[Any]:
+        entry = self._entries.get(url)
+        if entry is None or entry[0] <= self.clock.time():
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        return entry[1]
+
+    # The last value stored, even if expired; not counted as a lookup.
+    def peek(self, url: str) -> Optional[Any]:
+        entry = self._entries.get(url)
+        return None if entry is None else entry[1]
+
+    def put(self, url: str, value: T, expires_at: Optional[float] = None) -> T:
+        ttl = self.ttls.get(url)
+        if ttl and value is not None:
+            # Data that changes at a known deadline must not outlive it.
+            expiry = self.clock.time() + ttl
+            if expires_at is not None:
+                expiry = min(expiry, expires_at)
+            self._entries[url] = (expiry, value)
+        return value
+
+    def invalidate(self, url: str) -> None:
+        if self._entries.pop(url, None) is not None:
+            self.stats.invalidations += 1
+
+    def invalidate_for(self, method: str, url: str) -> None:
+        if method == "GET":
+            return
+        for cached_url in self.invalidations.get(url, ()):
+            self.invalidate(cached_url)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def reset_stats(self) -> CacheStats:
+        stats, self.stats = self.stats, CacheStats()
+        return stats
@@ -0,0 +1,208 @@
+import base64
+import gzip
+import json
+import os
+import threading
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import IO, Optional, Self
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tass.auth import decode_token_expiry
+from tass.endpoints import Endpoints
+from utils import logger
+
+REDACTED = "<redacted>"
+# Response headers the client reads; the rest are not worth keeping.
+KEPT_HEADERS = ("Content-Type", "Retry-After", "Date")
+
+
+@dataclass(slots=True)
+class Exchange:
+    t: float
+    method: str
+    path: str
+    status: int
+    body: str
+    request: Optional[str] = None
+    headers: Optional[dict[str, str]] = None
+    elapsed: float = 0.0
+
+
+def _open(path: str, mode: str) -> IO[str]:
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def _stand_in_token(token: str) -> str:
+    # Keeps the expiry so token refreshes replay the same way.
+    expiry = decode_token_expiry(token)
+    if expiry is None:
+        return REDACTED
+    claims = {"exp": int(expiry)}
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).rstrip(b"=")
+    return f"eyJhbGciOiJub25lIn0.{payload.decode()}.{REDACTED}"
+
+
+def redact(body: Optional[str]) -> Optional[str]:
+    if not body:
+        return body
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return body
+    if not isinstance(data, dict):
+        return body
+    if "webAppData" in data:
+        data["webAppData"] = REDACTED
+    if isinstance(data.get("token"), str):
+        data["token"] = _stand_in_token(data["token"])
+    return json.dumps(data, separators=(",", ":"))
+
+
+def _path(url: str) -> str:
+    return urlsplit(url).path.removeprefix(urlsplit(Endpoints.BASE_URL).path)
+
+
+# Appends each exchange to a JSON-lines cassette (gzipped for a .gz path).
+class RecordingAdapter(HTTPAdapter):
+    def __init__(self, path: str, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+        # A new client (e.g. after a restart) keeps adding to the same run.
+        try:
+            with _open(path, "r") as file:
+                self.started_at = json.loads(file.readline())["started_at"]
+        except (OSError, ValueError, KeyError):
+            self.started_at = time.time()
+            with _open(path, "w") as file:
+                header = {"version": 1, "started_at": self.started_at}
+                file.write(json.dumps(header) + "\n")
+
+    def send(self, request, *args, **kwargs) -> requests.Response:
+        sent_at = time.time()
+        response = super().send(request, *args, **kwargs)
+        body = (
+            request.body.decode() if isinstance(request.body, bytes) else request.body
+        )
+        exchange = Exchange(
+            t=round(sent_at - self.started_at, 3),
+            method=request.method,
+            path=_path(request.url),
+            status=response.status_code,
+            body=redact(response.text),
+            request=redact(body),
+            headers={
+                name: response.headers[name]
+                for name in KEPT_HEADERS
+                if name in response.headers
+            }
+            or None,
+            elapsed=round(response.elapsed.total_seconds(), 4),
+        )
+        line = json.dumps(asdict(exchange), separators=(",", ":")) + "\n"
+        with self._lock, _open(self.path, "a") as file:
+            file.write(line)
+        return response
+
+
+@dataclass
+class Cassette:
+    started_at: float
+    exchanges: list[Exchange]
+
+    @classmethod
+    def load(cls, path: str) -> Self:
+        with _open(path, "r") as file:
+            header = json.loads(file.readline())
+            exchanges = [Exchange(**json.loads(line)) for line in file if line.strip()]
+        return cls(header["started_at"], exchanges)
+
+
+# Serves recorded exchanges back. Each route gets its recorded exchanges in
+# order, each one once, so a response the server sent once (a prayer ready to
+# claim, a refill) is not served again. A route asked more often than it was
+# recorded gets its last exchange again, counted in `overrun` and warned about
+# once, so a replay that drifts from the recording shows it. Speed only scales
+# the recorded latency; 0 (None) serves without delays.
+class ReplayAdapter(HTTPAdapter):
+    def __init__(
+        self,
+        cassette: Cassette,
+        speed: Optional[float] = 1.0,
+        **kwargs,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.cassette = cassette
+        self.speed = speed
+        self.served = 0
+        self.missing: Counter[str] = Counter()
+        self.overrun: Counter[str] = Counter()
+        self._lock = threading.Lock()
+        self._routes: dict[tuple[str, str], list[Exchange]] = {}
+        for exchange in cassette.exchanges:
+            self._routes.setdefault((exchange.method, exchange.path), []).append(
+                exchange
+            )
+        self._next = dict.fromkeys(self._routes, 0)
+
+    def match(self, method: str, path: str) -> Optional[Exchange]:
+        route = (method, path)
+        exchanges = self._routes.get(route)
+        if not exchanges:
+            return None
+        with self._lock:
+            index = self._next[route]
+            if index < len(exchanges):
+                self._next[route] = index + 1
+                return exchanges[index]
+            if not self.overrun[f"{method} {path}"]:
+                logger.warning(
+                    "{} {} asked for more than the {} recorded times; "
+                    "serving the last one again.",
+                    method,
+                    path,
+                    len(exchanges),
+                )
+            self.overrun[f"{method} {path}"] += 1
+        return exchanges[-1]
+
+    def send(self, request, *args, **kwargs) -> requests.Response:
+        path = _path(request.url)
+        exchange = self.match(request.method, path)
+        if exchange is None:
+            self.missing[f"{request.method} {path}"] += 1
+            raise requests.ConnectionError(
+                f"No recorded exchange for {request.method} {path}", request=request
+            )
+        if self.speed:
+            time.sleep(exchange.elapsed / self.speed)
+        self.served += 1
+        response = requests.Response()
+        response.status_code = exchange.status
+        response.headers.update(exchange.headers or {})
+        response._content = exchange.body.encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        return response
+
+
+def mount_from_env(session: requests.Session) -> None:
+    record_path = os.getenv("TASS_CASSETTE_RECORD")
+    replay_path = os.getenv("TASS_CASSETTE_REPLAY")
+    if record_path:
+        session.mount(Endpoints.BASE_URL, RecordingAdapter(record_path))
+        logger.info("Recording API traffic to {}", record_path)
+    elif replay_path:
+        speed = float(os.getenv("TASS_CASSETTE_SPEED", "1"))
+        adapter = ReplayAdapter(Cassette.load(replay_path), speed=speed or None)
+        session.mount(Endpoints.BASE_URL, adapter)
+        logger.info("Replaying API traffic from {}", replay_path)
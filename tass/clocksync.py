@@ -0,0 +1,116 @@
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from utils import logger
+from utils.clock import SYSTEM_CLOCK, Clock
+
+
+# The offset of the server clock from ours, learned from response Date headers.
+# A Date header is in whole seconds and is stamped somewhere between sending
+# the request and reading the response, so each response bounds the offset to
+# [date - received, date + 1 - sent]. The intersection of recent bounds narrows
+# that well below a second. When the bounds stop overlapping, one of the clocks
+# has stepped or drifted, and the older bounds are dropped.
+class ServerClock:
+    def __init__(
+        self,
+        window: int = 64,
+        max_age: float = 600.0,
+        rtt_weight: float = 0.2,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.clock = clock
+        self.max_age = max_age
+        self.rtt_weight = rtt_weight
+        self.rtt: Optional[float] = None
+        self._bounds: deque[tuple[float, float, float]] = deque(maxlen=window)
+        self._low = float("-inf")
+        self._high = float("inf")
+        self._lock = threading.Lock()
+
+    def observe(self, sent: float, received: float, date: Optional[str]) -> None:
+        if not date or received < sent:
+            return
+        try:
+            stamped = parsedate_to_datetime(date).timestamp()
+        except (TypeError, ValueError):
+            return
+        rtt = received - sent
+        with self._lock:
+            self.rtt = (
+                rtt
+                if self.rtt is None
+                else self.rtt + self.rtt_weight * (rtt - self.rtt)
+            )
+            self._bounds.append((received, stamped - received, stamped + 1 - sent))
+            was_synced = self.synced
+            previous = self.offset
+            self._intersect(received)
+        if not was_synced:
+            logger.info(
+                "Server clock is {:+.2f}s from ours (+/- {:.2f}s).",
+                self.offset,
+                self.error,
+            )
+        elif abs(self.offset - previous) > 1:
+            logger.warning(
+                "Server clock moved from {:+.2f}s to {:+.2f}s from ours.",
+                previous,
+                self.offset,
+            )
+
+    # Newest bounds first, stopping at the first one that does not overlap.
+    def _intersect(self, now: float) -> None:
+        low, high = float("-inf"), float("inf")
+        kept = 0
+        for observed_at, sample_low, sample_high in reversed(self._bounds):
+            if now - observed_at > self.max_age:
+                break
+            if max(low, sample_low) > min(high, sample_high):
+                break
+            low, high = max(low, sample_low), min(high, sample_high)
+            kept += 1
+        while len(self._bounds) > kept:
+            self._bounds.popleft()
+        self._low, self._high = low, high
+
+    @property
+    def synced(self) -> bool:
+        return self._high != float("inf")
+
+    @property
+    def offset(self) -> float:
+        return (self._low + self._high) / 2 if self.synced else 0.0
+
+    # How far the offset may be off, given the bounds seen so far.
+    @property
+    def error(self) -> float:
+        return (self._high - self._low) / 2 if self.synced else float("inf")
+
+    def now(self) -> float:
+        return self.clock.time() + self.offset
+
+    def now_datetime(self) -> datetime:
+        return datetime.fromtimestamp(self.now(), timezone.utc)
+
+    # A server timestamp on our clock, e.g. to schedule a stage for it.
+    def to_local(self, server_timestamp: float) -> float:
+        return server_timestamp - self.offset
+
+    # Our time by which the server's clock has surely reached the timestamp,
+    # for requests it rejects when they arrive early (e.g. a refill).
+    def reached_at(self, server_timestamp: float) -> float:
+        return self.to_local(server_timestamp) + (self.error if self.synced else 0.0)
+
+    def has_reached(self, server_timestamp: float) -> bool:
+        return self.clock.time() >= self.reached_at(server_timestamp)
+
+    # The time to allow before a server deadline: the offset error and the
+    # round trip once measured, the given guess until then.
+    def margin(self, fallback: float) -> float:
+        if not self.synced or self.rtt is None:
+            return fallback
+        return self.error + self.rtt
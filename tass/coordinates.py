@@ -2,8 +2,10 @@ import random
 from dataclasses import dataclass
 from typing import Self
 
+SWIPE_JSON = '{"start":{"x":%d,"y":%d},"end":{"x":%d,"y":%d},"dateTime":%d}'
 
-@dataclass
+
+@dataclass(slots=True)
 class Coordinates:
     start_x: int
     end_x: int
@@ -17,3 +19,19 @@ class Coordinates:
         end_x = start_x + random.randint(1, 10)
         end_y = start_y + random.randint(50, 100)
         return cls(start_x=start_x, end_x=end_x, start_y=start_y, end_y=end_y)
+
+
+@dataclass(slots=True)
+class Swipe:
+    coordinates: Coordinates
+    date_time: int
+
+    def to_json(self) -> str:
+        co = self.coordinates
+        return SWIPE_JSON % (co.start_x, co.start_y, co.end_x, co.end_y, self.date_time)
+
+
+# Serialized straight from the swipes, without building nested dicts first.
+def taps_payload(swipes: list[Swipe]) -> bytes:
+    body = ",".join(swipe.to_json() for swipe in swipes)
+    return f'{{"swipes":[{body}],"taps":{len(swipes)}}}'.encode()
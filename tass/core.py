@@ -0,0 +1,396 @@
+from collections.abc import Mapping
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional, Protocol
+
+from tass.auth import _TokenState
+from tass.cache import ResponseCache
+from tass.clocksync import ServerClock
+from tass.coordinates import Coordinates, Swipe, taps_payload
+from tass.endpoints import Endpoints
+from tass.headers import common_headers
+from tass.models import (
+    AdBooster,
+    CheckInModel,
+    DecodeMemo,
+    PrayerDataModel,
+    Quest,
+    QuestData,
+    UserModel,
+    VerifyQuestResult,
+    decode,
+    loads,
+)
+from tass.outbox import TapBatch, TapOutbox
+from tass.retry import (
+    CircuitBreaker,
+    CircuitOpenError,
+    RetryPolicy,
+    parse_retry_after,
+)
+from utils import logger
+from utils.clock import Clock
+from utils.metrics import metrics
+
+
+# What the helpers read from a requests or an httpx response.
+class Response(Protocol):
+    status_code: int
+    content: bytes
+    text: str
+    headers: Mapping[str, str]
+
+
+# Everything Tass and AsyncTass share: state, request building, retry and
+# breaker decisions, response decoding and tap batch settling. None of it does
+# I/O, so the two clients only send requests and sleep, each in its own way.
+class TassCore:
+    tokens: _TokenState
+
+    def __init__(
+        self,
+        web_app_data: str,
+        retry_policy: Optional[RetryPolicy],
+        server_clock: Optional[ServerClock],
+        clock: Clock,
+    ) -> None:
+        self.web_app_data = web_app_data
+        self.clock = clock
+        # Pass a long-lived clock to keep what it learned across clients.
+        self.server_clock = server_clock or ServerClock(clock=clock)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.decoded = DecodeMemo()
+        self._headers_token: Optional[str] = None
+        self._headers: dict = common_headers()
+        self.cache = ResponseCache(clock=clock)
+        self.outbox = TapOutbox(clock=clock)
+        # The account's tap total as last read, plus batches registered since.
+        self.total_taps: Optional[int] = None
+
+    @property
+    def auth_token(self) -> Optional[str]:
+        return self.tokens.token
+
+    def _auth_headers(self, token: Optional[str]) -> dict:
+        # Rebuilt only when the token changes.
+        if token != self._headers_token:
+            self._headers = {
+                **common_headers(),
+                "authorization": f"Bearer {token}",
+            }
+            self._headers_token = token
+        return self._headers
+
+    def _auth_request(self) -> dict:
+        return {
+            "json": {"webAppData": self.web_app_data},
+            "headers": common_headers(),
+            "idempotent": True,
+        }
+
+    def _auth_result(self, response: Response) -> tuple[Optional[str], dict]:
+        try:
+            response_data = loads(response.content)
+        except ValueError:
+            response_data = {}
+        token = response_data.get("token")
+        if not token:
+            logger.error("Error: Failed to retrieve Auth Token.")
+            logger.error(response.text)
+            logger.error(response.status_code)
+            return None, response_data
+        return token, response_data
+
+    def _swipe(self) -> Swipe:
+        return Swipe(Coordinates.new(), int(self.clock.time() * 1000))
+
+    def _batch(self, swipes: list[Swipe]) -> TapBatch:
+        return TapBatch(taps_payload(swipes), len(swipes), self.clock.time())
+
+    # The endpoint's breaker; raises while it is open.
+    def _breaker(self, endpoint: str) -> CircuitBreaker:
+        breaker = self.breakers.setdefault(endpoint, CircuitBreaker(clock=self.clock))
+        if not breaker.allow():
+            raise CircuitOpenError(endpoint, breaker.retry_at)
+        return breaker
+
+    # The pause before resending after a connection error, or None to give up.
+    # Requests other than GETs and logins change game state, so they are only
+    # resent when they surely did not reach it.
+    def _error_delay(
+        self,
+        breaker: CircuitBreaker,
+        method: str,
+        endpoint: str,
+        error: Exception,
+        attempt: int,
+        resendable: bool,
+    ) -> Optional[float]:
+        policy = self.retry_policy
+        if not resendable or attempt + 1 >= policy.max_attempts:
+            self._record_failure(breaker, endpoint)
+            return None
+        delay = policy.delay(attempt)
+        logger.warning(
+            "{} {} failed: {}. Retry in {:.1f}s", method, endpoint, error, delay
+        )
+        return delay
+
+    def _observe(
+        self,
+        method: str,
+        endpoint: str,
+        response: Response,
+        sent: float,
+        elapsed: float,
+        request_size: int,
+    ) -> None:
+        self.server_clock.observe(sent, self.clock.time(), response.headers.get("Date"))
+        metrics.observe_request(
+            endpoint,
+            method,
+            response.status_code,
+            elapsed,
+            request_size,
+            len(response.content),
+        )
+
+    # The pause before resending after this response, or None to return it.
+    def _status_delay(
+        self,
+        method: str,
+        endpoint: str,
+        response: Response,
+        attempt: int,
+        idempotent: bool,
+    ) -> Optional[float]:
+        policy = self.retry_policy
+        status = response.status_code
+        if not policy.should_retry(status, attempt, idempotent):
+            return None
+        retry_after = parse_retry_after(
+            response.headers.get("Retry-After"), self.clock.now()
+        )
+        if retry_after is not None and retry_after > policy.max_delay:
+            return None
+        delay = policy.delay(attempt, retry_after)
+        logger.warning(
+            "{} {} returned {}. Retry in {:.1f}s", method, endpoint, status, delay
+        )
+        return delay
+
+    def _record_outcome(
+        self, breaker: CircuitBreaker, endpoint: str, status: int
+    ) -> None:
+        if status >= 500 or status == 429:
+            self._record_failure(breaker, endpoint)
+        else:
+            breaker.record_success()
+
+    def _record_failure(self, breaker: CircuitBreaker, endpoint: str) -> None:
+        if breaker.record_failure():
+            logger.error(
+                "Too many failures on {}. Pausing it for {:.0f} seconds.",
+                endpoint,
+                breaker.reset_timeout,
+            )
+
+    def _note_401_retry(self, url: str) -> None:
+        logger.warning("Authorization token expired. Retrying once.")
+        self.tokens.stats.retried_401 += 1
+        metrics.observe_retry(url.removeprefix(Endpoints.BASE_URL))
+
+    # Logs a response that is not a 200; True if it is not.
+    def _failed(self, response: Response, action: str) -> bool:
+        if response.status_code == 401:
+            logger.warning("Authorization token expired")
+            return True
+        if response.status_code != 200:
+            logger.error(
+                "Error: Failed to {}. Status Code: {}", action, response.status_code
+            )
+            logger.error(response.text)
+            return True
+        return False
+
+    # An unchanged body gives back the instance cached for the URL, expired or
+    # not, instead of being validated again.
+    def _decode(self, url: str, model: Any, response: Response) -> Any:
+        return self.decoded.decode(model, response.content, self.cache.peek(url))
+
+    # The taps a POST registered, 0 if it failed, or None if it may have counted
+    # and the profile has to tell. A batch refused for its content (e.g. not
+    # enough energy) is dropped; one that failed for a reason that may clear
+    # is kept in the outbox.
+    def _batch_sent(self, batch: TapBatch, response: Response) -> Optional[int]:
+        status = response.status_code
+        if status == 401:
+            logger.warning("Authorization token expired")
+            self.outbox.keep(batch)
+            return 0
+        if status != 200:
+            logger.error("Error: Failed to register taps. Status Code: {}", status)
+            logger.error(response.text)
+            if status in self.retry_policy.unsent_statuses:
+                self.outbox.keep(batch)
+            elif status in self.retry_policy.retry_statuses:
+                return None
+            return 0
+        if self.total_taps is not None:
+            self.total_taps += batch.taps
+        logger.success("Taps {} registered successfully.", batch.taps)
+        return batch.taps
+
+    # After a connection error: kept if it never left, else the profile tells.
+    def _batch_failed(
+        self, batch: TapBatch, error: Exception, never_sent: bool
+    ) -> Optional[int]:
+        logger.error("Error: Failed to register taps: {}", error)
+        if never_sent:
+            self.outbox.keep(batch)
+            return 0
+        return None
+
+    # After a read timeout or a 504 the server may have counted the batch. The
+    # profile's tap total tells: the batch is kept for a resend only if the
+    # total did not move, and dropped when it cannot be told.
+    def _settled(
+        self, batch: TapBatch, before: Optional[int], profile: Optional[UserModel]
+    ) -> int:
+        if before is None or profile is None:
+            logger.warning("Dropping {} taps that may have counted.", batch.taps)
+        elif profile.totalTaps == before:
+            self.outbox.keep(batch)
+        elif profile.totalTaps >= before + batch.taps:
+            logger.success("Taps {} registered after all.", batch.taps)
+            return batch.taps
+        else:
+            logger.warning("Dropping {} taps that may have counted.", batch.taps)
+        return 0
+
+    def _profile(self, response: Response) -> Optional[UserModel]:
+        if self._failed(response, "get profile"):
+            return None
+        profile = self._decode(Endpoints.PROFILE_URL, UserModel, response)
+        self.total_taps = profile.totalTaps
+        return self.cache.put(Endpoints.PROFILE_URL, profile)
+
+    def log_profile(self, profile: UserModel):
+        logger.info("User ID: {}", profile.telegramId)
+        logger.info("Total Experience: {}", profile.experience)
+        logger.info("Referrals: {}", profile.referrals.firstTier)
+        logger.info("Second-Tier Referrals: {}", profile.referrals.secondTier)
+        logger.info("Total Taps: {}", profile.totalTaps)
+        logger.info("Taps First Level: {}", profile.taps.firstLevel)
+        logger.info("Taps Second Level: {}", profile.taps.secondLevel)
+        logger.info("Taps Today: {}", profile.tapsToday)
+        logger.info("Achievements Count: {}", profile.achievementsCount)
+        logger.info("Haqq Address: {}", profile.haqqAddress)
+        logger.info("Energy: {}", profile.energy)
+        logger.info("Energy Booster Finish Date: {}", profile.energyBoosterFinishDate)
+
+    # Cached until the check-in day rolls over at midnight UTC on the server.
+    def _checkin_info(self, response: Response) -> Optional[CheckInModel]:
+        if self._failed(response, "get check-in information"):
+            return None
+        tomorrow = self.server_clock.now_datetime().date() + timedelta(days=1)
+        rollover = datetime.combine(tomorrow, datetime.min.time(), timezone.utc)
+        return self.cache.put(
+            Endpoints.CHECK_IN_URL,
+            self._decode(Endpoints.CHECK_IN_URL, CheckInModel, response),
+            expires_at=self.server_clock.to_local(rollover.timestamp()),
+        )
+
+    def _checked_in_today(self, check_in_info: CheckInModel) -> bool:
+        last_check_in = check_in_info.lastCheckInDate
+        today = self.server_clock.now_datetime().date()
+        if last_check_in is not None and last_check_in.date() == today:
+            logger.warning("Already checked in today.")
+            return True
+        return False
+
+    def _checked_in(self, response: Response) -> bool:
+        if self._failed(response, "check-in"):
+            return False
+        logger.success("Check-in completed successfully.")
+        return True
+
+    def _refill_due(self, prayer_data: PrayerDataModel) -> bool:
+        ready_to_claim_key = next(
+            (
+                key
+                for key, status in prayer_data.prayerStatuses.items()
+                if status.status == "ready-to-claim"
+            ),
+            None,
+        )
+        if not ready_to_claim_key:
+            # Sent too early, the claim is refused, so wait until the server
+            # clock has surely reached the prayer.
+            if not self.server_clock.has_reached(prayer_data.nextPrayer.timestamp()):
+                logger.warning(
+                    "Cannot refill energy. Prayer not yet started: {}",
+                    prayer_data.nextPrayer,
+                )
+                return False
+        logger.info("{} is ready to claim. Refilling energy...", ready_to_claim_key)
+        return True
+
+    def _refilled(self, response: Response) -> bool:
+        if self._failed(response, "refill energy"):
+            return False
+        logger.success("Energy refilled successfully.")
+        return True
+
+    # Cached no longer than until the next prayer.
+    def _prayer_data(self, response: Response) -> Optional[PrayerDataModel]:
+        if self._failed(response, "get prayer status"):
+            return None
+        prayer_data = self._decode(
+            Endpoints.PRAYER_STATUS_URL, PrayerDataModel, response
+        )
+        return self.cache.put(
+            Endpoints.PRAYER_STATUS_URL,
+            prayer_data,
+            expires_at=self.server_clock.to_local(prayer_data.nextPrayer.timestamp()),
+        )
+
+    def _quests(self, response: Response) -> Optional[QuestData]:
+        if self._failed(response, "get quests"):
+            return None
+        return self.cache.put(
+            Endpoints.QUESTS_URL,
+            self._decode(Endpoints.QUESTS_URL, QuestData, response),
+        )
+
+    # True when claimed, False when not (yet), None when the quest is gone.
+    def _verified(self, quest: Quest, response: Response) -> Optional[bool]:
+        if response.status_code == 404:
+            logger.error("Error: Quest not found: {}", quest.id)
+            return None
+        if self._failed(response, "claim quest"):
+            return False
+        is_verified = (
+            decode(VerifyQuestResult, response.content).get("isVerified") is True
+        )
+        if is_verified:
+            logger.success("Quest '{}' claimed successfully.", quest.name)
+        return is_verified
+
+    # An ad booster can be watched 10 minutes after the last one ended.
+    def _ad_booster_due(self, user: UserModel) -> bool:
+        if user.energyBoosterFinishDate is None:
+            logger.info("User does not have an energy booster.")
+            return False
+        available_at = user.energyBoosterFinishDate + timedelta(minutes=10)
+        if not self.server_clock.has_reached(available_at.timestamp()):
+            logger.info(
+                "Advertise has already received an advertisement in the last 10 minutes."
+            )
+            return False
+        return True
+
+    def _ad_booster(self, response: Response) -> Optional[AdBooster]:
+        if self._failed(response, "advertise"):
+            return None
+        return decode(AdBooster, response.content)
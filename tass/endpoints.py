@@ -1,10 +1,33 @@
+import os
+
+DEFAULT_BASE_URL = "https://api.tassbeeh.com/api/v1"
+
+
 class Endpoints:
-    AUTH_TOKEN_URL = "https://api.tassbeeh.com/api/v1/auth/authenticate"
-    REGISTER_TAPS_URL = "https://api.tassbeeh.com/api/v1/game/register-taps"
-    PROFILE_URL = "https://api.tassbeeh.com/api/v1/game/profile"
-    CHECK_IN_URL = "https://api.tassbeeh.com/api/v1/game/check-in"
-    REFILL_ENERGY_URL = "https://api.tassbeeh.com/api/v1/energy/refill-energy"
-    PRAYER_STATUS_URL = "https://api.tassbeeh.com/api/v1/energy/prayer-status"
-    QUESTS_URL = "https://api.tassbeeh.com/api/v1/quests/all"
-    VERIFY_QUEST_URL = "https://api.tassbeeh.com/api/v1/quests/verify"
-    AD_BOOSTER_URL = "https://api.tassbeeh.com/api/v1/marketplace/ad-booster"
+    BASE_URL = DEFAULT_BASE_URL
+    AUTH_TOKEN_URL = f"{DEFAULT_BASE_URL}/auth/authenticate"
+    REGISTER_TAPS_URL = f"{DEFAULT_BASE_URL}/game/register-taps"
+    PROFILE_URL = f"{DEFAULT_BASE_URL}/game/profile"
+    CHECK_IN_URL = f"{DEFAULT_BASE_URL}/game/check-in"
+    REFILL_ENERGY_URL = f"{DEFAULT_BASE_URL}/energy/refill-energy"
+    PRAYER_STATUS_URL = f"{DEFAULT_BASE_URL}/energy/prayer-status"
+    QUESTS_URL = f"{DEFAULT_BASE_URL}/quests/all"
+    VERIFY_QUEST_URL = f"{DEFAULT_BASE_URL}/quests/verify"
+    AD_BOOSTER_URL = f"{DEFAULT_BASE_URL}/marketplace/ad-booster"
+
+    @classmethod
+    def configure(cls, base_url: str) -> None:
+        base_url = base_url.rstrip("/")
+        cls.BASE_URL = base_url
+        cls.AUTH_TOKEN_URL = f"{base_url}/auth/authenticate"
+        cls.REGISTER_TAPS_URL = f"{base_url}/game/register-taps"
+        cls.PROFILE_URL = f"{base_url}/game/profile"
+        cls.CHECK_IN_URL = f"{base_url}/game/check-in"
+        cls.REFILL_ENERGY_URL = f"{base_url}/energy/refill-energy"
+        cls.PRAYER_STATUS_URL = f"{base_url}/energy/prayer-status"
+        cls.QUESTS_URL = f"{base_url}/quests/all"
+        cls.VERIFY_QUEST_URL = f"{base_url}/quests/verify"
+        cls.AD_BOOSTER_URL = f"{base_url}/marketplace/ad-booster"
+
+
+Endpoints.configure(os.getenv("TASS_API_BASE_URL", DEFAULT_BASE_URL))
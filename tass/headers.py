@@ -1,19 +1,21 @@
 import os
-from fake_useragent import UserAgent
 
 
 class __Headers:
     _user_agent_file = "user_agent.txt"
     _user_agent = None
+    _common_headers = None
 
     @classmethod
     def get_common_headers(cls):
-        if cls._user_agent is None:
-            cls._user_agent = cls._load_or_generate_user_agent()
-        return {
-            "Content-Type": "application/json",
-            "User-Agent": cls._user_agent,
-        }
+        if cls._common_headers is None:
+            if cls._user_agent is None:
+                cls._user_agent = cls._load_or_generate_user_agent()
+            cls._common_headers = {
+                "Content-Type": "application/json",
+                "User-Agent": cls._user_agent,
+            }
+        return cls._common_headers
 
     @classmethod
     def _load_or_generate_user_agent(cls):
@@ -23,6 +25,9 @@ class __Headers:
                 if user_agent:
                     return user_agent
 
+        # Only needed the first time, before user_agent.txt exists.
+        from fake_useragent import UserAgent
+
         ua = UserAgent(os="Android")
         user_agent = ua.random
 
@@ -32,4 +37,6 @@ class __Headers:
         return user_agent
 
 
-COMMON_HEADERS = __Headers.get_common_headers()
+# Resolved on the first request rather than on import.
+def common_headers() -> dict:
+    return __Headers.get_common_headers()
@@ -1,61 +1,99 @@
-from typing import Dict, Optional, List
-from pydantic import BaseModel, Field, HttpUrl
+import hashlib
+import json
+from functools import cache
+from typing import Any, Dict, Optional, List, Self, TypedDict
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
 from datetime import datetime
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(raw: bytes | str) -> Any:
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+@cache
+def _adapter(type_: Any) -> TypeAdapter:
+    return TypeAdapter(type_)
+
+
+# Validates raw JSON in one pass, without building an intermediate dict.
+def decode(type_: Any, raw: bytes | str) -> Any:
+    if isinstance(type_, type) and issubclass(type_, BaseModel):
+        return type_.model_validate_json(raw)
+    return _adapter(type_).validate_json(raw)
 
-class CheckInModel(BaseModel):
-    checkInsStreak: int = Field(..., description="Current streak of check-ins")
-    lastCheckInDate: Optional[datetime] = Field(None, description="Date of the last check-in")
-    checkInExperience: int = Field(..., description="Experience earned from check-ins")
+
+# Remembers a digest of the last body decoded per model, so an unchanged
+# response, like the quest list between polls, skips validation and gives back
+# the caller's previous instance. Neither the body nor the model is kept.
+class DecodeMemo:
+    def __init__(self) -> None:
+        self._digests: dict[type, bytes] = {}
+
+    def decode(self, type_: Any, raw: bytes, previous: Optional[Any] = None) -> Any:
+        digest = hashlib.blake2b(raw, digest_size=16).digest()
+        if previous is not None and self._digests.get(type_) == digest:
+            return previous
+        self._digests[type_] = digest
+        return decode(type_, raw)
+
+
+class ApiModel(BaseModel):
+    # Validators are built on first use instead of at import time.
+    model_config = ConfigDict(defer_build=True)
 
     @classmethod
-    def from_dict(cls, data: dict):
-        return cls(**data)
+    def from_dict(cls, data: dict) -> Self:
+        return cls.model_validate(data)
+
+    @classmethod
+    def from_json(cls, raw: bytes | str) -> Self:
+        return cls.model_validate_json(raw)
 
 
-class PrayerStatusModel(BaseModel):
+class CheckInModel(ApiModel):
+    checkInsStreak: int = Field(..., description="Current streak of check-ins")
+    lastCheckInDate: Optional[datetime] = Field(
+        None, description="Date of the last check-in"
+    )
+    checkInExperience: int = Field(..., description="Experience earned from check-ins")
+
+
+class PrayerStatusModel(ApiModel):
     name: str = Field(..., description="Name of the prayer")
     status: str = Field(
         ..., description="Status of the prayer (claimed or not-claimed)"
     )
     date: datetime = Field(..., description="Date and time of the prayer")
 
-    @classmethod
-    def from_dict(cls, data: dict):
-        return cls(**data)
-
 
-class PrayerDataModel(BaseModel):
+class PrayerDataModel(ApiModel):
     nextPrayer: datetime = Field(..., description="Next prayer date and time")
     streak: int = Field(..., description="Current streak of prayers")
     prayerStatuses: Dict[str, PrayerStatusModel] = Field(
         ..., description="Prayer statuses for each prayer"
     )
 
-    @classmethod
-    def from_dict(cls, data: dict):
-        prayer_statuses = {
-            key: PrayerStatusModel.from_dict(value)
-            for key, value in data["prayerStatuses"].items()
-        }
-        return cls(
-            nextPrayer=datetime.fromisoformat(data["nextPrayer"]),
-            streak=data["streak"],
-            prayerStatuses=prayer_statuses,
-        )
-
-
-class Progress(BaseModel):
+
+class Progress(ApiModel):
     current: int
     total: int
 
 
-class Quest(BaseModel):
+class Quest(ApiModel):
     id: int
     name: str
     questType: str
-    actionLink: Optional[HttpUrl] = None
-    actionLinks: Optional[dict[str, HttpUrl]] = None
+    # Plain strings: the bot never follows these links, and URL validation
+    # was most of the cost of decoding a large quest list.
+    actionLink: Optional[str] = None
+    actionLinks: Optional[dict[str, str]] = None
     isHidden: bool
     finishCondition: str
     rewardExp: int
@@ -65,29 +103,29 @@ class Quest(BaseModel):
     isNew: Optional[bool] = None
 
 
-class QuestData(BaseModel):
+class VerifyQuestResult(TypedDict, total=False):
+    isVerified: bool
+
+
+class QuestData(ApiModel):
     regularQuests: List[Quest]
     dailyQuests: List[Quest]
     partnerQuests: List[Quest]
 
-    @classmethod
-    def from_dict(cls, data: dict):
-        return cls(**data)
-
 
-class ReferralsModel(BaseModel):
+class ReferralsModel(ApiModel):
     firstTier: Dict[str, int] = Field(..., description="Data for first-tier referrals")
     secondTier: Dict[str, int] = Field(
         ..., description="Data for second-tier referrals"
     )
 
 
-class TapsModel(BaseModel):
+class TapsModel(ApiModel):
     firstLevel: int = Field(..., description="Taps at the first level")
     secondLevel: Optional[int] = Field(None, description="Taps at the second level")
 
 
-class UserModel(BaseModel):
+class UserModel(ApiModel):
     telegramId: int = Field(..., description="Telegram ID of the user")
     experience: int = Field(..., description="User's total experience points")
     referrals: ReferralsModel = Field(..., description="Referral data for the user")
@@ -101,17 +139,9 @@ class UserModel(BaseModel):
         None, description="Finish date for energy booster"
     )
 
-    @classmethod
-    def from_dict(cls, data: dict):
-        return cls(**data)
 
-
-class AdBooster(BaseModel):
+class AdBooster(ApiModel):
     cooldownDate: datetime = Field(..., description="Date and time of the cooldown")
     status: str = Field(
         ..., description="Status of the ad booster (active or inactive)"
     )
-
-    @classmethod
-    def from_dict(cls, data: dict):
-        return cls(**data)
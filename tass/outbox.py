@@ -0,0 +1,94 @@
+import threading
+from dataclasses import dataclass
+from typing import Optional
+
+from utils.clock import SYSTEM_CLOCK, Clock
+
+
+@dataclass(slots=True)
+class TapBatch:
+    payload: bytes
+    taps: int
+    built_at: float
+    failures: int = 0
+
+
+@dataclass
+class OutboxStats:
+    kept: int = 0
+    resent: int = 0
+    dropped: int = 0
+
+
+# Tap batches whose POST failed for a reason that may clear (a token the
+# refresh could not replace, a 5xx or 429 that outlasted the retry policy, a
+# dropped connection), kept as built so the swipes are resent instead of being
+# generated again at 0.2s each. A batch is kept once however often it fails,
+# and dropped once it is older than max_age (its swipe times would be stale)
+# or has failed max_failures times.
+class TapOutbox:
+    def __init__(
+        self,
+        max_batches: int = 4,
+        max_age: float = 60.0,
+        max_failures: int = 3,
+        base_delay: float = 1.0,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.max_batches = max_batches
+        self.max_age = max_age
+        self.max_failures = max_failures
+        self.base_delay = base_delay
+        self.clock = clock
+        self.stats = OutboxStats()
+        self._batches: dict[bytes, TapBatch] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._batches)
+
+    def keep(self, batch: TapBatch) -> None:
+        with self._lock:
+            batch.failures += 1
+            if batch.failures >= self.max_failures:
+                self.stats.dropped += 1
+                return
+            if batch.payload not in self._batches:
+                self.stats.kept += 1
+            self._batches[batch.payload] = batch
+            while len(self._batches) > self.max_batches:
+                del self._batches[next(iter(self._batches))]
+                self.stats.dropped += 1
+
+    # The oldest kept batch of at most `limit` taps, so a caller that planned
+    # for `limit` (e.g. what fits before a booster ends) is not overrun.
+    def take(self, limit: int) -> Optional[TapBatch]:
+        with self._lock:
+            self._drop_stale()
+            for payload, batch in self._batches.items():
+                if batch.taps <= limit:
+                    del self._batches[payload]
+                    self.stats.resent += 1
+                    return batch
+        return None
+
+    def _drop_stale(self) -> None:
+        cutoff = self.clock.time() - self.max_age
+        for payload in [p for p, b in self._batches.items() if b.built_at < cutoff]:
+            del self._batches[payload]
+            self.stats.dropped += 1
+
+    # Backs off per failure of the kept batch; the fallback applies when nothing
+    # was kept, i.e. the server refused the batch itself.
+    def resend_delay(self, fallback: float) -> float:
+        with self._lock:
+            failures = max((b.failures for b in self._batches.values()), default=0)
+        if not failures:
+            return fallback
+        return min(self.base_delay * 2 ** (failures - 1), fallback)
+
+    def reset_stats(self) -> OutboxStats:
+        with self._lock:
+            stats, self.stats = self.stats, OutboxStats()
+        return stats
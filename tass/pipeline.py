@@ -0,0 +1,101 @@
+import asyncio
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import suppress
+from typing import Awaitable, Callable, Optional, Self
+
+from tass.outbox import TapBatch
+from utils.clock import SYSTEM_CLOCK, Clock
+
+
+# Double-buffered tap submission: while one batch is on the wire, the next is
+# swiped on a worker thread, so its 0.2s-per-swipe build overlaps the request
+# and the pause after it instead of following them. Only one batch is built
+# ahead and the next is started when it is taken, so a slow server holds the
+# build back rather than letting batches pile up and go stale.
+class TapPipeline:
+    def __init__(
+        self, build: Callable[[int], TapBatch], clock: Clock = SYSTEM_CLOCK
+    ) -> None:
+        self.build = build
+        self.clock = clock
+        self._pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="taps")
+        self._future: Optional[Future] = None
+        self._ready = threading.Event()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @property
+    def pending(self) -> bool:
+        return self._future is not None
+
+    # Starts building a batch of `taps`; nothing is built for 0.
+    def prepare(self, taps: int) -> None:
+        if self._future is not None:
+            raise RuntimeError("A tap batch is already being built.")
+        if taps <= 0:
+            return
+        self._ready.clear()
+        self._future = self.clock.submit(self._pool, self._build, taps)
+
+    # The event is set on the worker, before a virtual clock stops counting it.
+    def _build(self, taps: int) -> TapBatch:
+        try:
+            return self.build(taps)
+        finally:
+            self._ready.set()
+
+    # Waits for the prepared batch; None when nothing was prepared.
+    def take(self) -> Optional[TapBatch]:
+        if self._future is None:
+            return None
+        self.clock.wait(self._ready, None)
+        future, self._future = self._future, None
+        return future.result()
+
+    # A batch still being built is waited out on the clock and discarded.
+    def close(self) -> None:
+        if self._future is not None:
+            self.clock.wait(self._ready, None)
+            self._future = None
+        self._pool.shutdown()
+
+
+# TapPipeline for AsyncTass, with the build as a task on the event loop.
+class AsyncTapPipeline:
+    def __init__(self, build: Callable[[int], Awaitable[TapBatch]]) -> None:
+        self.build = build
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> Self:
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    @property
+    def pending(self) -> bool:
+        return self._task is not None
+
+    def prepare(self, taps: int) -> None:
+        if self._task is not None:
+            raise RuntimeError("A tap batch is already being built.")
+        if taps > 0:
+            self._task = asyncio.create_task(self.build(taps))
+
+    async def take(self) -> Optional[TapBatch]:
+        if self._task is None:
+            return None
+        task, self._task = self._task, None
+        return await task
+
+    async def aclose(self) -> None:
+        if self._task is not None:
+            task, self._task = self._task, None
+            task.cancel()
+            with suppress(asyncio.CancelledError):
+                await task
@@ -0,0 +1,59 @@
+import math
+from datetime import datetime, timezone
+from typing import Optional
+
+from tass.models import PrayerDataModel
+from utils.tuning import Tuning
+
+# register_taps paces the generated swipes this far apart.
+SWIPE_SECONDS = 0.2
+
+
+# When the next refill can be claimed: now if a prayer is ready, else the next.
+# Both are on the clock `now` comes from, the server's when it is given.
+def prayer_ready_at(prayer: PrayerDataModel, now: Optional[datetime] = None) -> float:
+    now = now or datetime.now(timezone.utc)
+    ready = any(
+        status.status == "ready-to-claim" for status in prayer.prayerStatuses.values()
+    )
+    if ready or prayer.nextPrayer <= now:
+        return now.timestamp()
+    return prayer.nextPrayer.timestamp()
+
+
+# Taps are free while a booster runs and cost one energy each otherwise, and a
+# refill tops energy back up to the maximum, so anything left over when it is
+# claimed is lost. The planner therefore spends energy in as few calls as the
+# batch limit allows, fills booster windows with free taps, and claims the next
+# prayer once the energy is spent.
+class Planner:
+    def __init__(self, tuning: Tuning) -> None:
+        self.tuning = tuning
+
+    # Even batches between min_swipe and max_swipe, as few as possible. Energy
+    # that cannot make up a batch of min_swipe is left for the refill.
+    def split(self, energy: int) -> list[int]:
+        calls = math.ceil(max(energy, 0) / self.tuning.max_swipe)
+        if energy < calls * self.tuning.min_swipe:
+            calls -= 1
+            energy = calls * self.tuning.max_swipe
+        if calls == 0:
+            return []
+        size, extra = divmod(energy, calls)
+        return [size + 1] * extra + [size] * (calls - extra)
+
+    def refill_due(self, energy: int) -> bool:
+        return energy < self.tuning.min_swipe
+
+    def booster_stop(
+        self, booster_until: float, margin: Optional[float] = None
+    ) -> float:
+        if margin is None:
+            margin = self.tuning.booster_end_margin
+        return booster_until - margin
+
+    # The largest batch that still ends before the stop, or 0 to stop now.
+    def booster_batch(self, now: float, stop_at: float) -> int:
+        fits = math.floor((stop_at - now) / SWIPE_SECONDS)
+        taps = min(self.tuning.max_swipe, fits)
+        return taps if taps >= self.tuning.min_swipe else 0
@@ -0,0 +1,205 @@
+import asyncio
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional, Self
+
+from tass.models import Quest, QuestData
+from utils import logger
+from utils.clock import SYSTEM_CLOCK, Clock
+
+if TYPE_CHECKING:
+    from tass.async_tass import AsyncTass
+    from tass.tass import Tass
+
+BLOCKLIST_QUESTS = frozenset(
+    {
+        "connect_haqq_wallet",
+        "islm_join_telegram_channel",
+        "islm_join_telegram_chat",
+        "watch_ads_daily",
+        "join_the_commuity",
+        "follow_us_on_telegram",
+    }
+)
+
+
+def claim_key(quest: Quest, daily: bool, now: Optional[datetime] = None) -> str:
+    # Daily quests come back every UTC day under the same id.
+    if daily:
+        now = now or datetime.now(timezone.utc)
+        return f"{quest.id}@{now.date().isoformat()}"
+    return str(quest.id)
+
+
+class QuestLedger:
+    def __init__(
+        self,
+        path: str,
+        claimed: Optional[set[str]] = None,
+        ineligible: Optional[set[int]] = None,
+    ) -> None:
+        self.path = path
+        self.claimed = claimed or set()
+        self.ineligible = ineligible or set()
+        self._dirty = False
+
+    @classmethod
+    def load(cls, path: str = "quest_ledger.json") -> Self:
+        try:
+            with open(path, "r") as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            return cls(path)
+        except ValueError:
+            logger.warning("Quest ledger {} is corrupt. Starting empty.", path)
+            return cls(path)
+        return cls(
+            path,
+            claimed=set(data.get("claimed", [])),
+            ineligible=set(data.get("ineligible", [])),
+        )
+
+    def is_settled(self, quest_id: int, key: str) -> bool:
+        return key in self.claimed or quest_id in self.ineligible
+
+    def mark_claimed(self, key: str) -> None:
+        if key not in self.claimed:
+            self.claimed.add(key)
+            self._dirty = True
+
+    def mark_ineligible(self, quest_id: int) -> None:
+        if quest_id not in self.ineligible:
+            self.ineligible.add(quest_id)
+            self._dirty = True
+
+    def prune_daily(self, now: Optional[datetime] = None) -> None:
+        today = (now or datetime.now(timezone.utc)).date().isoformat()
+        stale = {key for key in self.claimed if "@" in key and not key.endswith(today)}
+        if stale:
+            self.claimed -= stale
+            self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        data = {
+            "claimed": sorted(self.claimed),
+            "ineligible": sorted(self.ineligible),
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
+
+
+# Which quests are worth a verify call and what each answer means for the
+# ledger. QuestEngine and AsyncQuestEngine differ only in how the calls go out.
+class QuestSelection:
+    def __init__(
+        self,
+        ledger: QuestLedger,
+        blocklist: frozenset[str] = BLOCKLIST_QUESTS,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.ledger = ledger
+        self.blocklist = blocklist
+        self.clock = clock
+
+    def _all_quests(self, quests: QuestData) -> Iterator[tuple[Quest, str]]:
+        now = self.clock.now()
+        for quest in quests.regularQuests:
+            yield quest, claim_key(quest, daily=False)
+        for quest in quests.dailyQuests:
+            yield quest, claim_key(quest, daily=True, now=now)
+        for quest in quests.partnerQuests:
+            yield quest, claim_key(quest, daily=False)
+
+    def pending(self, quests: QuestData) -> list[tuple[Quest, str]]:
+        ledger = self.ledger
+        pending = []
+        for quest, key in self._all_quests(quests):
+            if ledger.is_settled(quest.id, key):
+                continue
+            if quest.isUserAchieved:
+                ledger.mark_claimed(key)
+            elif quest.name in self.blocklist:
+                ledger.mark_ineligible(quest.id)
+            elif quest.isHidden:
+                continue
+            elif quest.progress and quest.progress.current != quest.progress.total:
+                continue
+            else:
+                pending.append((quest, key))
+        return pending
+
+    def start(self, quests: QuestData) -> list[tuple[Quest, str]]:
+        self.ledger.prune_daily(self.clock.now())
+        pending = self.pending(quests)
+        if pending:
+            logger.info("Verifying {} new or completed quests.", len(pending))
+        return pending
+
+    # Records the verify results in the ledger; returns how many were claimed.
+    def settle(
+        self, pending: list[tuple[Quest, str]], results: Iterable[Optional[bool]]
+    ) -> int:
+        claimed = 0
+        for (quest, key), is_verified in zip(pending, results):
+            if is_verified:
+                self.ledger.mark_claimed(key)
+                claimed += 1
+            elif is_verified is None:
+                self.ledger.mark_ineligible(quest.id)
+        self.ledger.save()
+        return claimed
+
+
+class QuestEngine(QuestSelection):
+    def __init__(
+        self,
+        tass: "Tass",
+        ledger: QuestLedger,
+        concurrency: int = 3,
+        blocklist: frozenset[str] = BLOCKLIST_QUESTS,
+    ) -> None:
+        super().__init__(ledger, blocklist, tass.clock)
+        self.tass = tass
+        self.concurrency = concurrency
+
+    def claim(self, quests: QuestData) -> int:
+        pending = self.start(quests)
+        results: list[Optional[bool]] = []
+        if pending:
+            with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+                results = list(
+                    pool.map(self.tass.verify_quest, [quest for quest, _ in pending])
+                )
+        return self.settle(pending, results)
+
+
+# QuestEngine for AsyncTass: at most `concurrency` verify calls at once.
+class AsyncQuestEngine(QuestSelection):
+    def __init__(
+        self,
+        tass: "AsyncTass",
+        ledger: QuestLedger,
+        concurrency: int = 3,
+        blocklist: frozenset[str] = BLOCKLIST_QUESTS,
+    ) -> None:
+        super().__init__(ledger, blocklist)
+        self.tass = tass
+        self.concurrency = concurrency
+
+    async def claim(self, quests: QuestData) -> int:
+        pending = self.start(quests)
+        slots = asyncio.Semaphore(self.concurrency)
+
+        async def verify(quest: Quest) -> Optional[bool]:
+            async with slots:
+                return await self.tass.verify_quest(quest)
+
+        results = await asyncio.gather(*(verify(quest) for quest, _ in pending))
+        return self.settle(pending, results)
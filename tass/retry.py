@@ -0,0 +1,88 @@
+import random
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from utils.clock import SYSTEM_CLOCK, Clock
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, endpoint: str, retry_at: float) -> None:
+        super().__init__(f"Circuit open for {endpoint}")
+        self.endpoint = endpoint
+        self.retry_at = retry_at
+
+
+@dataclass
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    # Statuses worth retrying a request that is safe to repeat.
+    retry_statuses: frozenset[int] = frozenset({429, 502, 503, 504})
+    # Statuses where the request never reached the game logic. A 504 may come
+    # after it ran, so requests that must not count twice (taps, refills, ad
+    # boosters, quest claims) are only retried on these.
+    unsent_statuses: frozenset[int] = frozenset({429, 502, 503})
+
+    def should_retry(self, status: int, attempt: int, idempotent: bool = True) -> bool:
+        statuses = self.retry_statuses if idempotent else self.unsent_statuses
+        return status in statuses and attempt + 1 < self.max_attempts
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+        if retry_after is not None:
+            return max(retry_after, backoff)
+        return backoff
+
+
+def parse_retry_after(
+    value: Optional[str], now: Optional[datetime] = None
+) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    now = now or datetime.now(timezone.utc)
+    return max((moment - now).total_seconds(), 0.0)
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        reset_timeout: float = 60.0,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        self.clock = clock
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+
+    @property
+    def retry_at(self) -> float:
+        return (self.opened_at or 0.0) + self.reset_timeout
+
+    def allow(self) -> bool:
+        # Once the timeout passes, requests are let through again as a trial.
+        return self.opened_at is None or self.clock.time() >= self.retry_at
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self) -> bool:
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            was_closed = self.opened_at is None
+            self.opened_at = self.clock.time()
+            return was_closed
+        return False
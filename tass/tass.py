@@ -1,10 +1,14 @@
-import random
 import time
 import requests
 from typing import Optional
-from tass.coordinates import Coordinates
+from tass.auth import TokenManager
+from tass.clocksync import ServerClock
+from tass.core import TassCore
+from tass.coordinates import Swipe
 from tass.endpoints import Endpoints
-from tass.headers import COMMON_HEADERS
+from tass.outbox import TapBatch
+from tass.transport import Transport
+from tass.retry import CircuitOpenError, RetryPolicy
 from tass.models import (
     AdBooster,
     CheckInModel,
@@ -13,339 +17,202 @@ from tass.models import (
     QuestData,
     UserModel,
 )
+from urllib3.exceptions import ConnectTimeoutError
 from utils import logger
-from datetime import datetime, timedelta, timezone
+from utils.clock import SYSTEM_CLOCK, Clock
+from utils.metrics import metrics
 
 
-class Tass:
-    def __init__(self, web_app_data: str):
-        self.blocklist_quests = [
-            "connect_haqq_wallet",
-            "islm_join_telegram_channel",
-            "islm_join_telegram_chat",
-            "watch_ads_daily",
-            "join_the_commuity",
-            "follow_us_on_telegram",
-        ]
-        self.web_app_data = web_app_data
-        self.session = requests.Session()
-        self.auth_token = self.__get_auth_token(self.web_app_data)
+# A failure while connecting: the request never left, so resending it cannot
+# make the server count it twice.
+def _never_sent(error: requests.RequestException) -> bool:
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, ConnectTimeoutError)
+
+
+class Tass(TassCore):
+    def __init__(
+        self,
+        web_app_data: str,
+        retry_policy: Optional[RetryPolicy] = None,
+        timeout: float = 30.0,
+        session: Optional[requests.Session] = None,
+        server_clock: Optional[ServerClock] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ):
+        super().__init__(web_app_data, retry_policy, server_clock, clock)
+        # Pass a long-lived session to keep its connections across clients.
+        self.session = session if session is not None else Transport().session
+        self.timeout = timeout
+        self.tokens = TokenManager(self.__get_auth_token, clock=clock)
+        self.tokens.refresh()
         if not self.auth_token:
             logger.error("Error: Failed to retrieve Auth Token.")
             raise Exception("Could not retrieve Auth Token.")
 
-    def __generate_swipes(self, swipes_count: int) -> list:
+    def __generate_swipes(self, swipes_count: int) -> list[Swipe]:
         swipes = []
         for _ in range(swipes_count):
-            co = Coordinates.new()
-            swipes.append(
-                {
-                    "start": {"x": co.start_x, "y": co.start_y},
-                    "end": {"x": co.end_x, "y": co.end_y},
-                    "dateTime": int(time.time() * 1000),
-                }
-            )
-            time.sleep(0.2)
+            swipes.append(self._swipe())
+            self.clock.sleep(0.2)
         return swipes
 
-    def __get_auth_token(self, web_app_data: str) -> Optional[str]:
-        payload = {"webAppData": web_app_data}
-        response = self.session.post(
-            Endpoints.AUTH_TOKEN_URL,
-            json=payload,
-            headers=COMMON_HEADERS,
-        )
-        response_data = response.json()
-        token = response_data.get("token")
-        if not token:
-            logger.error("Error: Failed to retrieve Auth Token.")
-            logger.error(response.text)
-            logger.error(response.status_code)
-            return
-        return token
+    def __get_auth_token(self) -> tuple[Optional[str], dict]:
+        response = self._send("POST", Endpoints.AUTH_TOKEN_URL, **self._auth_request())
+        return self._auth_result(response)
 
     def refresh_auth_token(self):
-        self.auth_token = self.__get_auth_token(self.web_app_data)
-
-    def register_taps(self, swipes_count: int) -> bool:
-        swipes = self.__generate_swipes(swipes_count)
-        payload = {"swipes": swipes, "taps": len(swipes)}
-        headers = {
-            **COMMON_HEADERS,
-            "authorization": f"Bearer {self.auth_token}",
-        }
-        response = self.session.post(
-            Endpoints.REGISTER_TAPS_URL, json=payload, headers=headers
-        )
+        self.tokens.refresh()
+
+    def _send(
+        self, method: str, url: str, idempotent: Optional[bool] = None, **kwargs
+    ) -> requests.Response:
+        if idempotent is None:
+            idempotent = method == "GET"
+        endpoint = url.removeprefix(Endpoints.BASE_URL)
+        breaker = self._breaker(endpoint)
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            sent = self.clock.time()
+            try:
+                response = self.session.request(
+                    method, url, timeout=self.timeout, **kwargs
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                resendable = idempotent or _never_sent(e)
+                delay = self._error_delay(
+                    breaker, method, endpoint, e, attempt, resendable
+                )
+                if delay is None:
+                    raise
+            else:
+                self._observe(
+                    method,
+                    endpoint,
+                    response,
+                    sent,
+                    time.perf_counter() - start,
+                    len(response.request.body or b""),
+                )
+                delay = self._status_delay(
+                    method, endpoint, response, attempt, idempotent
+                )
+                if delay is None:
+                    break
+            metrics.observe_retry(endpoint)
+            self.clock.sleep(delay)
+            attempt += 1
+        self._record_outcome(breaker, endpoint, response.status_code)
+        return response
+
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        token = self.tokens.get()
+        response = self._send(method, url, headers=self._auth_headers(token), **kwargs)
         if response.status_code == 401:
-            logger.warning("Authorization token expired")
-            self.refresh_auth_token()
-            return False
-        if response.status_code != 200:
-            logger.error(
-                f"Error: Failed to register taps. Status Code: {response.status_code}"
+            self._note_401_retry(url)
+            token = self.tokens.refresh(stale=token)
+            response = self._send(
+                method, url, headers=self._auth_headers(token), **kwargs
             )
-            logger.error(response.text)
-            logger.error(response.status_code)
-            return False
-        logger.success(f"Taps {swipes_count} registered successfully.")
-        return True
+        self.cache.invalidate_for(method, url)
+        return response
+
+    # Returns the taps registered, 0 on failure. A batch that failed for a
+    # reason that may clear is kept in the outbox and sent, as built, by the
+    # next call asking for at least as many taps.
+    def register_taps(self, swipes_count: int) -> int:
+        batch = self.outbox.take(swipes_count)
+        if batch is None:
+            batch = self.build_batch(swipes_count)
+        else:
+            logger.info("Resending {} taps from the outbox.", batch.taps)
+        return self.send_batch(batch)
+
+    # Swipes in real time, 0.2s apart; needs no token, so a TapPipeline runs it
+    # while the previous batch is on the wire.
+    def build_batch(self, swipes_count: int) -> TapBatch:
+        return self._batch(self.__generate_swipes(swipes_count))
+
+    def send_batch(self, batch: TapBatch) -> int:
+        try:
+            response = self._request(
+                "POST", Endpoints.REGISTER_TAPS_URL, data=batch.payload
+            )
+        except CircuitOpenError as e:
+            registered = self._batch_failed(batch, e, never_sent=True)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            registered = self._batch_failed(batch, e, _never_sent(e))
+        else:
+            registered = self._batch_sent(batch, response)
+        if registered is None:
+            return self.__settle(batch)
+        return registered
+
+    def __settle(self, batch: TapBatch) -> int:
+        before = self.total_taps
+        self.cache.invalidate(Endpoints.PROFILE_URL)
+        try:
+            profile = self.get_profile_info()
+        except (requests.RequestException, CircuitOpenError, ValueError) as e:
+            logger.warning("Could not re-read the profile: {}", e)
+            profile = None
+        return self._settled(batch, before, profile)
 
     def get_profile_info(self) -> Optional[UserModel]:
-        headers = {
-            **COMMON_HEADERS,
-            "authorization": f"Bearer {self.auth_token}",
-        }
-        response = self.session.get(Endpoints.PROFILE_URL, headers=headers)
-        if response.status_code == 401:
-            logger.warning("Authorization token expired")
-            self.refresh_auth_token()
-            return
-        return UserModel.from_dict(response.json())
-
-    def log_profile(self, profile: UserModel):
-        logger.info(f"User ID: {profile.telegramId}")
-        logger.info(f"Total Experience: {profile.experience}")
-        logger.info(f"Referrals: {profile.referrals.firstTier}")
-        logger.info(f"Second-Tier Referrals: {profile.referrals.secondTier}")
-        logger.info(f"Total Taps: {profile.totalTaps}")
-        logger.info(f"Taps First Level: {profile.taps.firstLevel}")
-        logger.info(f"Taps Second Level: {profile.taps.secondLevel}")
-        logger.info(f"Taps Today: {profile.tapsToday}")
-        logger.info(f"Achievements Count: {profile.achievementsCount}")
-        logger.info(f"Haqq Address: {profile.haqqAddress}")
-        logger.info(f"Energy: {profile.energy}")
-        logger.info(f"Energy Booster Finish Date: {profile.energyBoosterFinishDate}")
-
-    def get_checkin_info(
-        self,
-    ) -> Optional[CheckInModel]:
-        headers = {
-            **COMMON_HEADERS,
-            "authorization": f"Bearer {self.auth_token}",
-        }
-        response = self.session.get(Endpoints.CHECK_IN_URL, headers=headers)
-        if response.status_code == 401:
-            logger.warning("Authorization token expired")
-            self.refresh_auth_token()
-            return
-        return CheckInModel.from_dict(response.json())
-
-    def check_in(self):
+        cached = self.cache.get(Endpoints.PROFILE_URL)
+        if cached is not None:
+            return cached
+        return self._profile(self._request("GET", Endpoints.PROFILE_URL))
+
+    def get_checkin_info(self) -> Optional[CheckInModel]:
+        cached = self.cache.get(Endpoints.CHECK_IN_URL)
+        if cached is not None:
+            return cached
+        return self._checkin_info(self._request("GET", Endpoints.CHECK_IN_URL))
+
+    def check_in(self) -> bool:
         logger.info("Trying to check in")
         check_in_info = self.get_checkin_info()
         if not check_in_info:
             logger.warning("Failed to retrieve check-in information.")
-            return
-
-        current_date = datetime.now(timezone.utc).date()
-
-        last_check_in_date = None
-        last_check_in_date = check_in_info.lastCheckInDate
-        if last_check_in_date:
-            last_check_in_date = last_check_in_date.date()
-
-        if last_check_in_date == current_date:
-            logger.warning("Already checked in today.")
-            return
-
-        headers = {
-            **COMMON_HEADERS,
-            "authorization": f"Bearer {self.auth_token}",
-        }
-
-        response = self.session.post(Endpoints.CHECK_IN_URL, headers=headers)
-
-        if response.status_code == 401:
-            logger.warning("Authorization token expired")
-            self.refresh_auth_token()
-            return
-
-        if response.status_code != 200:
-            logger.error(
-                f"Error: Failed to check-in. Status Code: {response.status_code}"
-            )
-            logger.error(response.text)
-            return
-
-        logger.success("Check-in completed successfully.")
-
-    def __get_ready_to_claim_key(self, data: PrayerDataModel) -> Optional[str]:
-        return next(
-            (
-                key
-                for key, status in data.prayerStatuses.items()
-                if status.status == "ready-to-claim"
-            ),
-            None,
-        )
+            return False
+        if self._checked_in_today(check_in_info):
+            return True
+        return self._checked_in(self._request("POST", Endpoints.CHECK_IN_URL))
 
-    def refill_energy(self):
-        prayer_data = self.get_prayer_data()
+    def refill_energy(self, prayer_data: Optional[PrayerDataModel] = None) -> bool:
+        prayer_data = prayer_data or self.get_prayer_data()
         if not prayer_data:
             logger.warning("Failed to retrieve prayer data.")
-            return
-
-        now = datetime.now(timezone.utc)
-
-        ready_to_claim_key = self.__get_ready_to_claim_key(prayer_data)
-
-        if not ready_to_claim_key:
-            if now < prayer_data.nextPrayer:
-                logger.warning(
-                    f"Cannot refill energy. Prayer not yet started: {prayer_data.nextPrayer}"
-                )
-                return
-
-        headers = {
-            **COMMON_HEADERS,
-            "authorization": f"Bearer {self.auth_token}",
-        }
-        logger.info(f"{ready_to_claim_key} is ready to claim. Refilling energy...")
-        response = self.session.post(Endpoints.REFILL_ENERGY_URL, headers=headers)
-
-        if response.status_code == 401:
-            logger.warning("Authorization token expired")
-            self.refresh_auth_token()
-            return
-
-        if response.status_code != 200:
-            logger.error(
-                f"Error: Failed to refill energy. Status Code: {response.status_code}"
-            )
-            logger.error(response.text)
-            return
-
-        logger.success("Energy refilled successfully.")
-
-    def get_prayer_data(self):
-        headers = {
-            **COMMON_HEADERS,
-            "authorization": f"Bearer {self.auth_token}",
-        }
-        response = self.session.get(Endpoints.PRAYER_STATUS_URL, headers=headers)
-
-        if response.status_code == 401:
-            logger.warning("Authorization token expired")
-            self.refresh_auth_token()
-            return
-
-        if response.status_code != 200:
-            logger.error(
-                f"Error: Failed to get prayer status. Status Code: {response.status_code}"
-            )
-            logger.error(response.text)
-            return
-
-        return PrayerDataModel.from_dict(response.json())
-
-    def get_quests(self):
-        self.refresh_auth_token()
-        headers = {
-            **COMMON_HEADERS,
-            "authorization": f"Bearer {self.auth_token}",
-        }
-        response = self.session.get(Endpoints.QUESTS_URL, headers=headers)
-
-        if response.status_code == 401:
-            logger.warning("Authorization token expired")
-            self.refresh_auth_token()
-            return
-
-        if response.status_code != 200:
-            logger.error(
-                f"Error: Failed to get quests. Status Code: {response.status_code}"
-            )
-            logger.error(response.text)
-            return
-
-        return QuestData.from_dict(response.json())
-
-    def claim_quest(self, quest: Quest) -> bool:
-        if quest.name in self.blocklist_quests:
-            logger.warning(f"Quest '{quest.name}' is in block list.")
             return False
-
-        if quest.isHidden:
-            logger.warning(f"Quest '{quest.name}' is hidden.")
+        if not self._refill_due(prayer_data):
             return False
-
-        if quest.isUserAchieved:
-            logger.info(f"Quest '{quest.name}' has already been claimed.")
-            return False
-
-        logger.info(f"Claiming daily quest: {quest.name}")
-
-        if quest.progress and quest.progress.current != quest.progress.total:
-            logger.warning(f"Quest '{quest.name}' not completed yet.")
-            return False
-
-        headers = {
-            **COMMON_HEADERS,
-            "authorization": f"Bearer {self.auth_token}",
-        }
-        response = self.session.post(
-            Endpoints.VERIFY_QUEST_URL, json={"questId": quest.id}, headers=headers
+        return self._refilled(self._request("POST", Endpoints.REFILL_ENERGY_URL))
+
+    def get_prayer_data(self) -> Optional[PrayerDataModel]:
+        cached = self.cache.get(Endpoints.PRAYER_STATUS_URL)
+        if cached is not None:
+            return cached
+        return self._prayer_data(self._request("GET", Endpoints.PRAYER_STATUS_URL))
+
+    def get_quests(self) -> Optional[QuestData]:
+        self.tokens.ensure_fresh()
+        cached = self.cache.get(Endpoints.QUESTS_URL)
+        if cached is not None:
+            return cached
+        return self._quests(self._request("GET", Endpoints.QUESTS_URL))
+
+    def verify_quest(self, quest: Quest) -> Optional[bool]:
+        response = self._request(
+            "POST", Endpoints.VERIFY_QUEST_URL, json={"questId": quest.id}
         )
-
-        if response.status_code == 401:
-            logger.warning("Authorization token expired")
-            self.refresh_auth_token()
-            return False
-
-        if response.status_code == 404:
-            logger.error(f"Error: Quest not found: {quest.id}")
-            return False
-
-        if response.status_code != 200:
-            logger.error(
-                f"Error: Failed to claim daily quest. Status Code: {response.status_code}"
-            )
-            logger.error(response.text)
-            return False
-
-        logger.success(f"Daily quest '{quest.name}' claimed successfully.")
-        time.sleep(1)
-        return response.json().get("isVerified") is True
-
-    def claim_quests(self, quests: list[Quest], quest_type: str):
-        logger.info(f"Performing {quest_type} Quests.")
-        logger.info(f"Total Quests: {len(quests)}")
-        for quest in quests:
-            is_claimed = self.claim_quest(quest)
-            if is_claimed:
-                logger.info("Wait a few seconds before claiming another quest.")
-                time.sleep(random.randint(1, 5))
+        return self._verified(quest, response)
 
     def ad_booster(self, user: UserModel) -> Optional[AdBooster]:
-        if user.energyBoosterFinishDate is None:
-            logger.info("User does not have an energy booster.")
-            return
-        if user.energyBoosterFinishDate + timedelta(minutes=10) > datetime.now(
-            timezone.utc
-        ):
-            logger.info(
-                "Advertise has already received an advertisement in the last 10 minutes."
-            )
-            return
-
-        self.refresh_auth_token()
-        headers = {
-            **COMMON_HEADERS,
-            "authorization": f"Bearer {self.auth_token}",
-        }
-        response = self.session.post(Endpoints.AD_BOOSTER_URL, headers=headers)
-
-        if response.status_code == 401:
-            logger.warning("Authorization token expired")
-            self.refresh_auth_token()
-            return
-
-        if response.status_code != 200:
-            logger.error(
-                f"Error: Failed to advertise. Status Code: {response.status_code}"
-            )
-            logger.error(response.text)
-            return
-
-        return AdBooster.from_dict(response.json())
+        if not self._ad_booster_due(user):
+            return None
+        self.tokens.ensure_fresh()
+        return self._ad_booster(self._request("POST", Endpoints.AD_BOOSTER_URL))
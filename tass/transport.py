@@ -0,0 +1,289 @@
+import ipaddress
+import socket
+import ssl
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.utils import DEFAULT_CA_BUNDLE_PATH
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.connection import allowed_gai_family
+
+from tass.cassette import mount_from_env
+from utils import logger
+from utils.clock import SYSTEM_CLOCK, Clock
+from utils.metrics import metrics
+
+
+@dataclass
+class TransportStats:
+    connections: int = 0
+    setup_seconds: float = 0.0
+    tls_resumed: int = 0
+    evicted: int = 0
+    dns_lookups: int = 0
+    dns_cached: int = 0
+    queued: int = 0
+
+
+def _is_address(host: str) -> bool:
+    try:
+        ipaddress.ip_address(host.strip("[]"))
+    except ValueError:
+        return False
+    return True
+
+
+# getaddrinfo results, kept for a fixed time since the system resolver does not
+# say how long an answer is valid. All addresses are kept, in the resolver's
+# order and for the families urllib3 would use, so a connection can fall back
+# from one that does not answer to the next, as urllib3 does by itself.
+class DnsCache:
+    def __init__(self, ttl: float = 300.0, clock: Clock = SYSTEM_CLOCK) -> None:
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: dict[tuple[str, int], tuple[float, list[str]]] = {}
+        self._lock = threading.Lock()
+
+    # Returns the addresses to try in order and whether they came from the cache.
+    def resolve(self, host: str, port: int) -> tuple[list[str], bool]:
+        if _is_address(host):
+            return [host], False
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is not None and entry[0] > self.clock.time():
+                return list(entry[1]), True
+        try:
+            infos = socket.getaddrinfo(
+                host, port, allowed_gai_family(), socket.SOCK_STREAM
+            )
+        except OSError:
+            # Connecting by name lets urllib3 report the failure as usual.
+            return [host], False
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        if not addresses:
+            return [host], False
+        with self._lock:
+            self._entries[(host, port)] = (self.clock.time() + self.ttl, addresses)
+        return list(addresses), False
+
+    # Drops an address that failed to connect; the host is looked up again
+    # once none is left.
+    def evict(self, host: str, port: int, address: str) -> None:
+        with self._lock:
+            entry = self._entries.get((host, port))
+            if entry is None or address not in entry[1]:
+                return
+            entry[1].remove(address)
+            if not entry[1]:
+                del self._entries[(host, port)]
+
+    def forget(self, host: str, port: int) -> None:
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+# Offers the last session of a host back to the server, so a new connection can
+# skip the full TLS handshake.
+class ResumingContext(ssl.SSLContext):
+    sessions: dict[str, ssl.SSLSession]
+
+    def wrap_socket(self, sock, *args, **kwargs) -> ssl.SSLSocket:
+        session = self.sessions.get(kwargs.get("server_hostname"))
+        if session is not None:
+            kwargs.setdefault("session", session)
+        return super().wrap_socket(sock, *args, **kwargs)
+
+
+class _TrackedConnection:
+    transport: "Transport"
+
+    # Tries each address of the host in turn, evicting those that do not
+    # connect, and raises the last failure if none does.
+    def _new_conn(self) -> socket.socket:
+        host = self._dns_host
+        try:
+            for address in self.transport.resolve(host, self.port):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except ConnectTimeoutError as e:
+                    self.transport.dns.evict(host, self.port, address)
+                    error = e
+            raise error
+        finally:
+            self._dns_host = host
+
+    def connect(self) -> None:
+        start = time.perf_counter()
+        super().connect()
+        resumed = bool(getattr(self.sock, "session_reused", False))
+        self.transport.observe_connect(self.host, time.perf_counter() - start, resumed)
+
+
+class TrackedHTTPConnection(_TrackedConnection, HTTPConnection):
+    pass
+
+
+class TrackedHTTPSConnection(_TrackedConnection, HTTPSConnection):
+    pass
+
+
+class _HealthCheckedPool:
+    ConnectionCls: type
+
+    def __init__(self, host: str, port: Optional[int], transport, **kwargs) -> None:
+        super().__init__(host, port, **kwargs)
+        self.transport = transport
+
+    def _new_conn(self):
+        conn = super()._new_conn()
+        conn.transport = self.transport
+        return conn
+
+    # urllib3 already drops connections the server has closed; this also drops
+    # ones idle for longer than the server or a NAT in between keeps them.
+    def _get_conn(self, timeout: Optional[float] = None):
+        conn = super()._get_conn(timeout)
+        last_used = getattr(conn, "last_used", None)
+        if conn.sock is not None and last_used is not None:
+            if self.transport.clock.time() - last_used > self.transport.max_idle:
+                conn.close()
+                self.transport.observe_eviction(self.host)
+        return conn
+
+    def _put_conn(self, conn) -> None:
+        if conn is not None:
+            conn.last_used = self.transport.clock.time()
+            session = getattr(conn.sock, "session", None)
+            if session is not None:
+                self.transport.tls_sessions[conn.host] = session
+        super()._put_conn(conn)
+
+
+class HealthCheckedHTTPPool(_HealthCheckedPool, HTTPConnectionPool):
+    ConnectionCls = TrackedHTTPConnection
+
+
+class HealthCheckedHTTPSPool(_HealthCheckedPool, HTTPSConnectionPool):
+    ConnectionCls = TrackedHTTPSConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    def __init__(self, transport: "Transport", **kwargs) -> None:
+        self.transport = transport
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        super().init_poolmanager(
+            connections,
+            maxsize,
+            block,
+            ssl_context=self.transport.ssl_context,
+            **pool_kwargs,
+        )
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": partial(HealthCheckedHTTPPool, transport=self.transport),
+            "https": partial(HealthCheckedHTTPSPool, transport=self.transport),
+        }
+
+    def send(self, request, *args, **kwargs) -> requests.Response:
+        with self.transport.slot():
+            return super().send(request, *args, **kwargs)
+
+    def cert_verify(self, conn, url, verify, cert) -> None:
+        super().cert_verify(conn, url, verify, cert)
+        # The shared context already holds the default CA bundle, so it is not
+        # loaded again for every handshake.
+        if verify is True:
+            conn.ca_certs = None
+
+
+# The HTTP session, connection pool, TLS sessions and DNS answers, kept for the
+# life of the process so a new client after an error starts with warm
+# connections. At most max_in_flight requests are sent at once; the rest wait
+# for a slot.
+class Transport:
+    def __init__(
+        self,
+        pool_connections: int = 2,
+        pool_maxsize: int = 4,
+        max_idle: float = 60.0,
+        dns_ttl: float = 300.0,
+        max_in_flight: int = 4,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.clock = clock
+        self.max_idle = max_idle
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._requests_sent = 0
+        self.dns = DnsCache(dns_ttl, clock)
+        self.stats = TransportStats()
+        self.tls_sessions: dict[str, ssl.SSLSession] = {}
+        self._lock = threading.Lock()
+        self.ssl_context = ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+        self.ssl_context.sessions = self.tls_sessions
+        self.ssl_context.load_verify_locations(DEFAULT_CA_BUNDLE_PATH)
+        self.ssl_context.set_alpn_protocols(["http/1.1"])
+        self.session = requests.Session()
+        adapter = PooledAdapter(
+            self, pool_connections=pool_connections, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        mount_from_env(self.session)
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.stats.queued += 1
+            self._slots.acquire()
+        with self._lock:
+            self._requests_sent += 1
+        try:
+            yield
+        finally:
+            self._slots.release()
+
+    # Requests sent since the transport was created; stats reset, this does not.
+    def request_count(self) -> int:
+        return self._requests_sent
+
+    def resolve(self, host: str, port: int) -> list[str]:
+        addresses, cached = self.dns.resolve(host, port)
+        if addresses != [host]:
+            with self._lock:
+                if cached:
+                    self.stats.dns_cached += 1
+                else:
+                    self.stats.dns_lookups += 1
+        return addresses
+
+    def observe_connect(self, host: str, seconds: float, resumed: bool) -> None:
+        with self._lock:
+            self.stats.connections += 1
+            self.stats.setup_seconds += seconds
+            self.stats.tls_resumed += resumed
+        metrics.observe_connect(host, seconds, resumed)
+        logger.debug("Connected to {} in {:.0f} ms", host, seconds * 1000)
+
+    def observe_eviction(self, host: str) -> None:
+        with self._lock:
+            self.stats.evicted += 1
+        metrics.observe_connection_event(host, "evicted")
+
+    def reset_stats(self) -> TransportStats:
+        with self._lock:
+            stats, self.stats = self.stats, TransportStats()
+        return stats
+
+    def close(self) -> None:
+        self.session.close()
@@ -0,0 +1,46 @@
+import threading
+from typing import Optional
+
+import pytest
+import requests
+
+from tests.stubs import StubAdapter
+from utils.clock import Clock
+
+
+# A clock that only moves when slept on or advanced.
+class FakeClock(Clock):
+    def __init__(self, start: float = 1_700_000_000.0) -> None:
+        self.now_ = start
+
+    def time(self) -> float:
+        return self.now_
+
+    def sleep(self, seconds: float) -> None:
+        self.now_ += max(seconds, 0.0)
+
+    def wait(self, event: threading.Event, timeout: Optional[float]) -> bool:
+        if not event.is_set() and timeout is not None:
+            self.sleep(timeout)
+        return event.is_set()
+
+    def advance(self, seconds: float) -> None:
+        self.now_ += seconds
+
+
+@pytest.fixture
+def clock() -> FakeClock:
+    return FakeClock()
+
+
+@pytest.fixture
+def stub() -> StubAdapter:
+    return StubAdapter()
+
+
+@pytest.fixture
+def session(stub: StubAdapter) -> requests.Session:
+    session = requests.Session()
+    session.mount("https://", stub)
+    session.mount("http://", stub)
+    return session
@@ -0,0 +1,53 @@
+import json
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tass.endpoints import Endpoints
+
+PROFILE = {
+    "telegramId": 1,
+    "experience": 0,
+    "referrals": {"firstTier": {}, "secondTier": {}},
+    "totalTaps": 100,
+    "taps": {"firstLevel": 0},
+    "tapsToday": 0,
+    "achievementsCount": 0,
+    "energy": 500,
+}
+
+
+# Serves canned responses per route, in order, repeating the last one, and
+# keeps every request it was sent.
+class StubAdapter(HTTPAdapter):
+    def __init__(self) -> None:
+        super().__init__()
+        self.routes: dict[tuple[str, str], list[tuple[int, Any]]] = {}
+        self.sent: list[requests.PreparedRequest] = []
+
+    def add(self, method: str, url: str, *responses: tuple[int, Any]) -> None:
+        self.routes[(method, url)] = list(responses)
+
+    def count(self, method: str, url: str) -> int:
+        return sum(r.method == method and r.url == url for r in self.sent)
+
+    def send(self, request, *args, **kwargs) -> requests.Response:
+        self.sent.append(request)
+        responses = self.routes[(request.method, request.url)]
+        status, body = responses.pop(0) if len(responses) > 1 else responses[0]
+        response = requests.Response()
+        response.status_code = status
+        response._content = json.dumps(body).encode()
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+
+def login(stub, *tokens: str) -> None:
+    stub.add(
+        "POST",
+        Endpoints.AUTH_TOKEN_URL,
+        *((200, {"token": token, "expiresIn": 900}) for token in tokens),
+    )
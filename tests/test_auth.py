@@ -0,0 +1,114 @@
+import asyncio
+import threading
+import time
+
+from tass.auth import AsyncTokenManager, TokenManager
+from tass.endpoints import Endpoints
+from tass.tass import Tass
+from tests.stubs import PROFILE, login
+
+
+def counting_fetch(ttl: float = 900.0, pause: float = 0.0):
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(pause)
+        return f"token-{len(calls)}", {"expiresIn": ttl}
+
+    return fetch, calls
+
+
+def test_token_is_reused_until_the_refresh_margin(clock):
+    fetch, calls = counting_fetch(ttl=900)
+    tokens = TokenManager(fetch, refresh_margin=60, clock=clock)
+
+    assert tokens.get() == "token-1"
+    clock.advance(839)
+    assert tokens.get() == "token-1"
+    clock.advance(1)
+    assert tokens.get() == "token-2"
+    assert len(calls) == 2
+
+
+def test_short_lived_tokens_get_a_proportional_margin(clock):
+    fetch, calls = counting_fetch(ttl=100)
+    tokens = TokenManager(fetch, refresh_margin=60, clock=clock)
+
+    tokens.get()
+    clock.advance(74)
+    assert tokens.get() == "token-1"
+    clock.advance(1)
+    assert tokens.get() == "token-2"
+
+
+def test_ensure_fresh_counts_the_logins_it_saves(clock):
+    fetch, calls = counting_fetch()
+    tokens = TokenManager(fetch, clock=clock)
+    tokens.refresh()
+
+    for _ in range(3):
+        tokens.ensure_fresh()
+    stats = tokens.reset_stats()
+    assert (stats.refreshes, stats.saved) == (1, 3)
+    assert len(calls) == 1
+
+
+def test_callers_racing_on_a_stale_token_share_one_refresh(clock):
+    fetch, calls = counting_fetch(pause=0.05)
+    tokens = TokenManager(fetch, clock=clock)
+    stale = tokens.refresh()
+    barrier = threading.Barrier(8)
+    results = []
+
+    def caller():
+        barrier.wait()
+        results.append(tokens.refresh(stale=stale))
+
+    threads = [threading.Thread(target=caller) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 2
+    assert results == ["token-2"] * 8
+
+
+def test_async_callers_share_one_refresh(clock):
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return f"token-{len(calls)}", {"expiresIn": 900}
+
+    tokens = AsyncTokenManager(fetch, clock=clock)
+
+    async def race():
+        return await asyncio.gather(*(tokens.get() for _ in range(8)))
+
+    assert asyncio.run(race()) == ["token-1"] * 8
+    assert len(calls) == 1
+
+
+def test_a_401_refreshes_the_token_and_retries_once(stub, session, clock):
+    login(stub, "old", "new")
+    stub.add("GET", Endpoints.PROFILE_URL, (401, {}), (200, PROFILE))
+    tass = Tass("data", session=session, clock=clock)
+
+    profile = tass.get_profile_info()
+    assert profile.totalTaps == 100
+    sent = [r.headers["authorization"] for r in stub.sent if r.method == "GET"]
+    assert sent == ["Bearer old", "Bearer new"]
+    assert stub.count("POST", Endpoints.AUTH_TOKEN_URL) == 2
+    assert tass.tokens.stats.retried_401 == 1
+
+
+def test_a_second_401_is_not_retried(stub, session, clock):
+    login(stub, "old", "new", "newer")
+    stub.add("GET", Endpoints.PROFILE_URL, (401, {}))
+    tass = Tass("data", session=session, clock=clock)
+
+    assert tass.get_profile_info() is None
+    assert stub.count("GET", Endpoints.PROFILE_URL) == 2
+    assert stub.count("POST", Endpoints.AUTH_TOKEN_URL) == 2
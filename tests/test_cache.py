@@ -0,0 +1,78 @@
+from tass.cache import ResponseCache
+from tass.endpoints import Endpoints
+from tass.tass import Tass
+from tests.stubs import PROFILE, login
+
+
+def test_values_expire_after_their_ttl(clock):
+    cache = ResponseCache(ttls={"url": 10}, clock=clock)
+    cache.put("url", "value")
+
+    clock.advance(9)
+    assert cache.get("url") == "value"
+    clock.advance(1)
+    assert cache.get("url") is None
+    stats = cache.reset_stats()
+    assert (stats.hits, stats.misses) == (1, 1)
+
+
+def test_a_deadline_shortens_the_ttl(clock):
+    cache = ResponseCache(ttls={"url": 60}, clock=clock)
+    cache.put("url", "value", expires_at=clock.time() + 5)
+
+    clock.advance(5)
+    assert cache.get("url") is None
+
+
+def test_urls_without_a_ttl_are_not_cached(clock):
+    cache = ResponseCache(ttls={}, clock=clock)
+    assert cache.put("url", "value") == "value"
+    assert cache.get("url") is None
+
+
+def test_writes_invalidate_the_reads_they_change(clock):
+    cache = ResponseCache(clock=clock)
+    for url in (Endpoints.PROFILE_URL, Endpoints.QUESTS_URL):
+        cache.put(url, url)
+
+    cache.invalidate_for("POST", Endpoints.REGISTER_TAPS_URL)
+    assert cache.get(Endpoints.PROFILE_URL) is None
+    assert cache.get(Endpoints.QUESTS_URL) == Endpoints.QUESTS_URL
+    cache.invalidate_for("POST", Endpoints.VERIFY_QUEST_URL)
+    assert cache.get(Endpoints.QUESTS_URL) is None
+    assert cache.reset_stats().invalidations == 2
+
+
+def test_reads_invalidate_nothing(clock):
+    cache = ResponseCache(clock=clock)
+    cache.put(Endpoints.CHECK_IN_URL, "checked")
+
+    cache.invalidate_for("GET", Endpoints.CHECK_IN_URL)
+    assert cache.get(Endpoints.CHECK_IN_URL) == "checked"
+    cache.invalidate_for("POST", Endpoints.CHECK_IN_URL)
+    assert cache.get(Endpoints.CHECK_IN_URL) is None
+
+
+def test_peek_sees_expired_values_without_counting(clock):
+    cache = ResponseCache(ttls={"url": 10}, clock=clock)
+    cache.put("url", "value")
+    clock.advance(60)
+
+    assert cache.peek("url") == "value"
+    assert cache.reset_stats().misses == 0
+    cache.invalidate("url")
+    assert cache.peek("url") is None
+
+
+def test_client_rereads_the_profile_after_registering_taps(stub, session, clock):
+    login(stub, "token")
+    stub.add("GET", Endpoints.PROFILE_URL, (200, PROFILE))
+    stub.add("POST", Endpoints.REGISTER_TAPS_URL, (200, {}))
+    tass = Tass("data", session=session, clock=clock)
+
+    tass.get_profile_info()
+    tass.get_profile_info()
+    assert stub.count("GET", Endpoints.PROFILE_URL) == 1
+    tass.send_batch(tass._batch([tass._swipe()]))
+    tass.get_profile_info()
+    assert stub.count("GET", Endpoints.PROFILE_URL) == 2
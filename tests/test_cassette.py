@@ -0,0 +1,63 @@
+import time
+
+import pytest
+import requests
+
+from tass.cassette import Cassette, Exchange, ReplayAdapter
+from tass.endpoints import Endpoints
+
+PRAYER = "/energy/prayer-status"
+REFILL = "/energy/refill-energy"
+
+
+def replay(*exchanges: Exchange, speed=0) -> tuple[ReplayAdapter, requests.Session]:
+    adapter = ReplayAdapter(Cassette(0.0, list(exchanges)), speed=speed)
+    session = requests.Session()
+    session.mount(Endpoints.BASE_URL, adapter)
+    return adapter, session
+
+
+def test_each_recorded_exchange_is_served_once_in_order():
+    adapter, session = replay(
+        Exchange(1.0, "GET", PRAYER, 200, '"ready"'),
+        Exchange(2.0, "POST", REFILL, 200, "{}"),
+        Exchange(3.0, "GET", PRAYER, 200, '"claimed"'),
+    )
+
+    assert session.get(Endpoints.PRAYER_STATUS_URL).json() == "ready"
+    assert session.post(Endpoints.REFILL_ENERGY_URL).status_code == 200
+    assert session.get(Endpoints.PRAYER_STATUS_URL).json() == "claimed"
+    assert adapter.served == 3
+    assert not adapter.overrun
+
+
+def test_a_route_asked_past_its_recording_gets_the_last_exchange():
+    adapter, session = replay(
+        Exchange(1.0, "GET", PRAYER, 200, '"ready"'),
+        Exchange(2.0, "GET", PRAYER, 200, '"claimed"'),
+    )
+
+    answers = [session.get(Endpoints.PRAYER_STATUS_URL).json() for _ in range(4)]
+    assert answers == ["ready", "claimed", "claimed", "claimed"]
+    assert adapter.overrun == {f"GET {PRAYER}": 2}
+
+
+def test_an_unrecorded_route_fails_like_a_dropped_connection():
+    adapter, session = replay(Exchange(1.0, "GET", PRAYER, 200, "{}"))
+
+    with pytest.raises(requests.ConnectionError):
+        session.post(Endpoints.REFILL_ENERGY_URL)
+    assert adapter.missing == {f"POST {REFILL}": 1}
+
+
+def test_speed_scales_the_recorded_latency_only():
+    exchanges = [
+        Exchange(t * 60.0, "GET", PRAYER, 200, "{}", elapsed=0.5) for t in range(4)
+    ]
+    adapter, session = replay(*exchanges, speed=50)
+
+    started = time.monotonic()
+    for _ in exchanges:
+        session.get(Endpoints.PRAYER_STATUS_URL)
+    assert time.monotonic() - started < 1.0
+    assert adapter.served == 4 and not adapter.overrun
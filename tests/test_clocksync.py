@@ -0,0 +1,91 @@
+import math
+from datetime import datetime, timezone
+from email.utils import format_datetime
+
+import pytest
+
+from tass.clocksync import ServerClock
+
+
+# One request to a server whose clock runs `offset` seconds from ours; it
+# stamps the Date header halfway through the round trip.
+def exchange(server: ServerClock, clock, offset: float, rtt: float = 0.2) -> None:
+    sent = clock.time()
+    stamped = math.floor(sent + rtt / 2 + offset)
+    date = format_datetime(datetime.fromtimestamp(stamped, timezone.utc), True)
+    clock.advance(rtt)
+    server.observe(sent, clock.time(), date)
+
+
+def test_an_unsynced_clock_assumes_no_offset(clock):
+    server = ServerClock(clock=clock)
+
+    assert not server.synced
+    assert server.offset == 0.0
+    assert server.to_local(clock.time() + 10) == clock.time() + 10
+    assert server.reached_at(clock.time()) == clock.time()
+    assert server.margin(2.5) == 2.5
+
+
+def test_one_response_bounds_the_offset(clock):
+    server = ServerClock(clock=clock)
+    exchange(server, clock, offset=5.3)
+
+    assert server.synced
+    assert abs(server.offset - 5.3) <= server.error
+    assert server.error == pytest.approx((1 + 0.2) / 2)
+
+
+def test_responses_at_different_phases_narrow_the_bounds(clock):
+    server = ServerClock(clock=clock)
+    for _ in range(40):
+        exchange(server, clock, offset=5.3)
+        clock.advance(0.37)
+
+    assert server.error < 0.15
+    assert server.offset == pytest.approx(5.3, abs=server.error)
+
+
+def test_a_stepped_clock_drops_the_old_bounds(clock):
+    server = ServerClock(clock=clock)
+    for _ in range(10):
+        exchange(server, clock, offset=5.3)
+        clock.advance(0.37)
+
+    exchange(server, clock, offset=65.3)
+    assert server.offset == pytest.approx(65.3, abs=server.error)
+
+
+def test_old_bounds_expire(clock):
+    server = ServerClock(max_age=60, clock=clock)
+    for _ in range(10):
+        exchange(server, clock, offset=5.3)
+        clock.advance(0.37)
+    narrowed = server.error
+
+    clock.advance(120)
+    exchange(server, clock, offset=5.3)
+    assert server.error > narrowed
+
+
+def test_responses_without_a_usable_date_are_ignored(clock):
+    server = ServerClock(clock=clock)
+    server.observe(clock.time(), clock.time() + 0.1, None)
+    server.observe(clock.time(), clock.time() + 0.1, "not a date")
+    server.observe(clock.time(), clock.time() - 0.1, "Sat, 18 Oct 2026 00:00:00 GMT")
+
+    assert not server.synced
+    assert server.rtt is None
+
+
+def test_server_deadlines_on_our_clock(clock):
+    server = ServerClock(clock=clock)
+    exchange(server, clock, offset=5.3)
+    deadline = clock.time() + 5.3 + 60
+
+    assert server.to_local(deadline) == deadline - server.offset
+    assert server.reached_at(deadline) == server.to_local(deadline) + server.error
+    assert not server.has_reached(deadline)
+    clock.advance(60 + 2 * server.error)
+    assert server.has_reached(deadline)
+    assert server.margin(2.5) == pytest.approx(server.error + 0.2)
@@ -0,0 +1,92 @@
+import json
+
+from utils.journal import Journal
+
+
+def entry(stage: str, next_due, finished_at: float = 1.0) -> str:
+    line = {"stage": stage, "finished_at": finished_at, "next_due": next_due}
+    return json.dumps({**line, "data": {}}) + "\n"
+
+
+def test_recorded_stages_resume_after_a_restart(tmp_path, clock):
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal.load(path, clock)
+    journal.note("check_in", date="2026-10-18")
+    journal.record("check_in", clock.time() + 3600)
+    journal.record("quests_task", None)
+
+    reloaded = Journal.load(path, clock)
+    assert reloaded.resume_at("check_in") == clock.time() + 3600
+    assert reloaded.latest["check_in"].data == {"date": "2026-10-18"}
+    # Nothing asked for, or the time already passed: run now.
+    assert reloaded.resume_at("quests_task") is None
+    clock.advance(3600)
+    assert reloaded.resume_at("check_in") is None
+
+
+def test_torn_last_line_is_skipped(tmp_path, clock):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(entry("check_in", clock.time() + 60) + '{"stage": "refill_en')
+
+    journal = Journal.load(str(path), clock)
+    assert list(journal.latest) == ["check_in"]
+    assert journal.resume_at("check_in") == clock.time() + 60
+
+
+def test_entry_after_a_torn_line_survives_a_reload(tmp_path, clock):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(entry("check_in", clock.time() + 60) + '{"stage": "refill_en')
+
+    Journal.load(str(path), clock).record("ad_boost", clock.time() + 600)
+
+    reloaded = Journal.load(str(path), clock)
+    assert set(reloaded.latest) == {"check_in", "ad_boost"}
+
+
+def test_damaged_lines_in_the_middle_are_skipped(tmp_path, clock):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(
+        entry("check_in", 10.0)
+        + "not json\n"
+        + '{"stage": 1}\n'
+        + entry("ad_boost", 20.0)
+    )
+
+    journal = Journal.load(str(path), clock)
+    assert {stage: e.next_due for stage, e in journal.latest.items()} == {
+        "check_in": 10.0,
+        "ad_boost": 20.0,
+    }
+
+
+def test_later_entries_win(tmp_path, clock):
+    path = tmp_path / "journal.jsonl"
+    path.write_text(entry("check_in", 10.0) + entry("check_in", 20.0, finished_at=2.0))
+
+    assert Journal.load(str(path), clock).latest["check_in"].next_due == 20.0
+
+
+def test_compaction_keeps_the_latest_entry_per_stage(tmp_path, clock):
+    path = tmp_path / "journal.jsonl"
+    journal = Journal(str(path), compact_after=5, clock=clock)
+    for minute in range(5):
+        journal.record("swipe_task", clock.time() + minute * 60)
+        journal.record("quests_task", clock.time() + minute)
+
+    lines = path.read_text().splitlines()
+    assert len(lines) < 10
+    reloaded = Journal.load(str(path), clock)
+    assert reloaded.latest["swipe_task"].next_due == clock.time() + 4 * 60
+    assert reloaded.latest["quests_task"].next_due == clock.time() + 4
+
+
+def test_compact_rewrites_the_file_in_place(tmp_path, clock):
+    path = tmp_path / "journal.jsonl"
+    journal = Journal(str(path), clock=clock)
+    for _ in range(3):
+        journal.record("check_in", clock.time() + 60)
+
+    journal.compact()
+    assert len(path.read_text().splitlines()) == 1
+    assert not (tmp_path / "journal.jsonl.tmp").exists()
+    assert Journal.load(str(path), clock).resume_at("check_in") == clock.time() + 60
@@ -0,0 +1,95 @@
+from tass.endpoints import Endpoints
+from tass.outbox import TapBatch, TapOutbox
+from tass.tass import Tass
+from tests.stubs import PROFILE, login
+
+
+def test_a_batch_is_kept_once_however_often_it_fails(clock):
+    outbox = TapOutbox(max_failures=5, clock=clock)
+    failed = TapBatch(b"a", 10, clock.time())
+
+    outbox.keep(failed)
+    outbox.keep(failed)
+    assert len(outbox) == 1
+    assert failed.failures == 2
+    assert outbox.reset_stats().kept == 1
+
+
+def test_take_skips_batches_over_the_limit(clock):
+    outbox = TapOutbox(clock=clock)
+    outbox.keep(TapBatch(b"big", 50, clock.time()))
+    outbox.keep(TapBatch(b"small", 10, clock.time()))
+
+    assert outbox.take(20).payload == b"small"
+    assert outbox.take(20) is None
+    assert outbox.take(50).payload == b"big"
+    assert outbox.reset_stats().resent == 2
+
+
+def test_stale_batches_are_dropped(clock):
+    outbox = TapOutbox(max_age=60, clock=clock)
+    outbox.keep(TapBatch(b"a", 10, clock.time()))
+
+    clock.advance(61)
+    assert outbox.take(10) is None
+    assert len(outbox) == 0
+    assert outbox.reset_stats().dropped == 1
+
+
+def test_a_batch_is_dropped_after_max_failures(clock):
+    outbox = TapOutbox(max_failures=3, clock=clock)
+    failed = TapBatch(b"a", 10, clock.time())
+
+    outbox.keep(failed)
+    outbox.keep(failed)
+    assert len(outbox) == 1
+    outbox.take(10)
+    outbox.keep(failed)
+    assert len(outbox) == 0
+    assert outbox.reset_stats().dropped == 1
+
+
+def test_the_oldest_batch_is_evicted_past_max_batches(clock):
+    outbox = TapOutbox(max_batches=2, clock=clock)
+    for payload in (b"a", b"b", b"c"):
+        outbox.keep(TapBatch(payload, 10, clock.time()))
+
+    assert [outbox.take(10).payload for _ in range(2)] == [b"b", b"c"]
+    assert outbox.reset_stats().dropped == 1
+
+
+def test_resend_delay_backs_off_per_failure(clock):
+    outbox = TapOutbox(max_failures=5, base_delay=1.0, clock=clock)
+    assert outbox.resend_delay(30.0) == 30.0
+
+    failed = TapBatch(b"a", 10, clock.time())
+    outbox.keep(failed)
+    assert outbox.resend_delay(30.0) == 1.0
+    outbox.keep(failed)
+    outbox.keep(failed)
+    assert outbox.resend_delay(30.0) == 4.0
+    assert outbox.resend_delay(3.0) == 3.0
+
+
+def test_an_unsettled_batch_is_kept_when_the_total_did_not_move(stub, session, clock):
+    login(stub, "token")
+    stub.add("GET", Endpoints.PROFILE_URL, (200, PROFILE))
+    stub.add("POST", Endpoints.REGISTER_TAPS_URL, (504, {}))
+    tass = Tass("data", session=session, clock=clock)
+    tass.get_profile_info()
+
+    assert tass.send_batch(tass._batch([tass._swipe()])) == 0
+    assert len(tass.outbox) == 1
+    assert stub.count("POST", Endpoints.REGISTER_TAPS_URL) == 1
+
+
+def test_an_unsettled_batch_counts_when_the_total_moved(stub, session, clock):
+    login(stub, "token")
+    moved = {**PROFILE, "totalTaps": PROFILE["totalTaps"] + 1}
+    stub.add("GET", Endpoints.PROFILE_URL, (200, PROFILE), (200, moved))
+    stub.add("POST", Endpoints.REGISTER_TAPS_URL, (504, {}))
+    tass = Tass("data", session=session, clock=clock)
+    tass.get_profile_info()
+
+    assert tass.send_batch(tass._batch([tass._swipe()])) == 1
+    assert len(tass.outbox) == 0
@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from main import TassBeeh
+from tass.endpoints import Endpoints
+from tass.models import PrayerDataModel
+from tass.planner import Planner, prayer_ready_at
+from tass.tass import Tass
+from tests.stubs import PROFILE, login
+from utils.journal import Journal
+from utils.tuning import Tuning
+
+NOON = datetime(2026, 10, 18, 12, tzinfo=timezone.utc)
+
+
+def prayer_data(next_prayer: datetime, status: str = "claimed") -> dict:
+    prayer = {"name": "dhuhr", "status": status, "date": NOON.isoformat()}
+    return {
+        "nextPrayer": next_prayer.isoformat(),
+        "streak": 3,
+        "prayerStatuses": {"dhuhr": prayer},
+    }
+
+
+@pytest.mark.parametrize(
+    "energy, batches",
+    [
+        (100, [25, 25, 25, 25]),
+        (45, [23, 22]),
+        (35, [30]),
+        (30, [30]),
+        (19, []),
+        (0, []),
+        (-5, []),
+    ],
+)
+def test_split_spends_energy_in_as_few_calls_as_possible(energy, batches):
+    assert Planner(Tuning(min_swipe=20, max_swipe=30)).split(energy) == batches
+
+
+def test_a_refill_is_due_below_one_batch():
+    planner = Planner(Tuning(min_swipe=20))
+    assert planner.refill_due(19)
+    assert not planner.refill_due(20)
+
+
+def test_booster_stop_defaults_to_the_tuned_margin():
+    planner = Planner(Tuning(booster_end_margin=5))
+    assert planner.booster_stop(100.0) == 95.0
+    assert planner.booster_stop(100.0, margin=1.5) == 98.5
+
+
+@pytest.mark.parametrize("seconds, taps", [(10.0, 30), (5.0, 25), (3.0, 0)])
+def test_booster_batch_ends_before_the_stop(seconds, taps):
+    planner = Planner(Tuning(min_swipe=20, max_swipe=30))
+    assert planner.booster_batch(1000.0, 1000.0 + seconds) == taps
+
+
+def test_a_prayer_is_ready_when_claimable_or_passed():
+    later = NOON + timedelta(hours=3)
+    waiting = PrayerDataModel.model_validate(prayer_data(later))
+    claimable = PrayerDataModel.model_validate(prayer_data(later, "ready-to-claim"))
+    passed = PrayerDataModel.model_validate(prayer_data(NOON - timedelta(minutes=1)))
+
+    assert prayer_ready_at(waiting, NOON) == later.timestamp()
+    assert prayer_ready_at(claimable, NOON) == NOON.timestamp()
+    assert prayer_ready_at(passed, NOON) == NOON.timestamp()
+
+
+@pytest.fixture
+def bot(stub, session, clock, tmp_path, monkeypatch) -> TassBeeh:
+    monkeypatch.chdir(tmp_path)
+    bot = TassBeeh(clock=clock)
+    login(stub, "token")
+    now = datetime.fromtimestamp(clock.time(), timezone.utc)
+    claimable = prayer_data(now + timedelta(hours=3), "ready-to-claim")
+    stub.add("GET", Endpoints.PRAYER_STATUS_URL, (200, claimable))
+    stub.add("POST", Endpoints.REFILL_ENERGY_URL, (200, {}))
+    bot.tass = Tass("data", session=session, server_clock=bot.server_clock, clock=clock)
+    bot.journal = Journal(str(tmp_path / "journal.jsonl"), clock=clock)
+    return bot
+
+
+def test_a_refill_that_left_energy_low_waits_instead_of_swiping(bot, stub, clock):
+    stub.add("GET", Endpoints.PROFILE_URL, (200, {**PROFILE, "energy": 5}))
+
+    retry_at = bot.refill_energy()
+    assert retry_at >= clock.time() + bot.tuning.failed_taps_delay
+    assert "swipe_task" not in bot.scheduler.pending()
+    assert stub.count("POST", Endpoints.REFILL_ENERGY_URL) == 1
+
+
+def test_a_refill_that_topped_up_energy_hands_over_to_swiping(bot, stub, clock):
+    stub.add(
+        "GET",
+        Endpoints.PROFILE_URL,
+        (200, {**PROFILE, "energy": 5}),
+        (200, {**PROFILE, "energy": 500}),
+    )
+
+    assert bot.refill_energy() is None
+    assert bot.scheduler.pending()["swipe_task"] == clock.time()
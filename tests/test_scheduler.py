@@ -0,0 +1,175 @@
+import pytest
+
+from utils.scheduler import Scheduler, Stage
+
+
+def recorder(calls: list[str], name: str, next_due=None):
+    def action():
+        calls.append(name)
+        return next_due
+
+    return action
+
+
+def test_due_jobs_run_in_deadline_order(clock):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+    scheduler.schedule("c", clock.time() + 30, recorder(calls, "c"))
+    scheduler.schedule("a", clock.time() + 10, recorder(calls, "a"))
+    scheduler.schedule("b", clock.time() + 20, recorder(calls, "b"))
+
+    assert scheduler.next_due() == clock.time() + 10
+    clock.advance(60)
+    assert scheduler.run_pending() == 3
+    assert calls == ["a", "b", "c"]
+
+
+def test_jobs_due_together_run_in_scheduling_order(clock):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+    for name in ("x", "y", "z"):
+        scheduler.schedule(name, clock.time(), recorder(calls, name))
+
+    scheduler.run_pending()
+    assert calls == ["x", "y", "z"]
+
+
+def test_jobs_not_yet_due_wait(clock):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+    scheduler.schedule("later", clock.time() + 5, recorder(calls, "later"))
+
+    assert scheduler.run_pending() == 0
+    clock.advance(5)
+    assert scheduler.run_pending() == 1
+    assert calls == ["later"]
+
+
+def test_rescheduling_replaces_the_earlier_deadline(clock):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+    scheduler.schedule("job", clock.time(), recorder(calls, "first"))
+    scheduler.schedule("job", clock.time() + 10, recorder(calls, "second"))
+
+    assert scheduler.pending() == {"job": clock.time() + 10}
+    clock.advance(10)
+    scheduler.run_pending()
+    assert calls == ["second"]
+
+
+def test_returned_deadline_reschedules_the_job(clock):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+    scheduler.schedule("job", clock.time(), recorder(calls, "job", clock.time() + 60))
+
+    scheduler.run_pending()
+    assert scheduler.pending() == {"job": clock.time() + 60}
+
+
+def test_failed_job_is_retried_after_the_retry_delay(clock):
+    scheduler = Scheduler(retry_delay=30, clock=clock)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    scheduler.schedule("job", clock.time(), fail)
+    scheduler.run_pending()
+    assert scheduler.pending() == {"job": clock.time() + 30}
+
+
+def test_failure_can_say_when_to_retry(clock):
+    scheduler = Scheduler(retry_delay=30, clock=clock)
+    error = RuntimeError("circuit open")
+    error.retry_at = clock.time() + 5
+
+    def fail():
+        raise error
+
+    scheduler.schedule("job", clock.time(), fail)
+    scheduler.run_pending()
+    assert scheduler.pending() == {"job": clock.time() + 5}
+
+
+def test_stage_waits_for_a_due_stage_it_follows(clock):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+    scheduler.declare(
+        [
+            Stage("refill", recorder(calls, "refill")),
+            Stage("swipe", recorder(calls, "swipe"), after=("refill",)),
+        ]
+    )
+    # Due first, but the stage it follows is also due.
+    scheduler.schedule("swipe", clock.time() - 10, recorder(calls, "swipe"))
+    scheduler.schedule("refill", clock.time(), recorder(calls, "refill"))
+
+    scheduler.run_pending()
+    assert calls == ["refill", "swipe"]
+
+
+def test_stage_does_not_wait_for_one_that_is_not_due(clock):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+    scheduler.declare(
+        [
+            Stage("refill", recorder(calls, "refill")),
+            Stage("swipe", recorder(calls, "swipe"), after=("refill",)),
+        ]
+    )
+    scheduler.schedule("refill", clock.time() + 60, recorder(calls, "refill"))
+    scheduler.schedule("swipe", clock.time(), recorder(calls, "swipe"))
+
+    scheduler.run_pending()
+    assert calls == ["swipe"]
+
+
+def test_dependencies_are_followed_transitively(clock):
+    scheduler = Scheduler(clock=clock)
+    calls = []
+    scheduler.declare(
+        [
+            Stage("a", recorder(calls, "a")),
+            Stage("b", recorder(calls, "b"), after=("a",)),
+            Stage("c", recorder(calls, "c"), after=("b",)),
+        ]
+    )
+    for name in ("c", "b", "a"):
+        scheduler.schedule(name, clock.time(), recorder(calls, name))
+
+    scheduler.run_pending()
+    assert calls == ["a", "b", "c"]
+
+
+def test_related_stages_never_run_side_by_side(clock):
+    scheduler = Scheduler(clock=clock)
+    scheduler.declare(
+        [
+            Stage("refill", lambda: None),
+            Stage("swipe", lambda: None, after=("refill",)),
+            Stage("quests", lambda: None),
+        ]
+    )
+    scheduler.schedule("refill", clock.time(), lambda: None)
+    scheduler.schedule("quests", clock.time(), lambda: None)
+
+    started = scheduler._take_ready()
+    assert [job.name for job in started] == ["refill", "quests"]
+    scheduler.schedule("swipe", clock.time(), lambda: None)
+    # swipe follows refill, which is still running.
+    assert scheduler._take_ready() == []
+    for job in started:
+        scheduler._run(job)
+    assert [job.name for job in scheduler._take_ready()] == ["swipe"]
+
+
+def test_declare_rejects_unknown_stages_and_cycles():
+    scheduler = Scheduler()
+    with pytest.raises(ValueError, match="unknown"):
+        scheduler.declare([Stage("a", lambda: None, after=("missing",))])
+    with pytest.raises(ValueError, match="cycle"):
+        scheduler.declare(
+            [
+                Stage("a", lambda: None, after=("b",)),
+                Stage("b", lambda: None, after=("a",)),
+            ]
+        )
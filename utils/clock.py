@@ -0,0 +1,35 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+
+# Every sleep and clock read of the bot goes through a Clock, so a simulation
+# can run the same code on virtual time (see bench.simulate).
+class Clock:
+    def time(self) -> float:
+        return time.time()
+
+    def now(self) -> datetime:
+        return datetime.fromtimestamp(self.time(), timezone.utc)
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+    # sleep for coroutines, which must not block the event loop.
+    async def asleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+    # Waits for the event or the timeout, whichever comes first.
+    def wait(self, event: threading.Event, timeout: Optional[float]) -> bool:
+        return event.wait(timeout)
+
+    # Hands a scheduler stage to a worker thread; a virtual clock counts the
+    # stage from here, so time does not move before the worker picks it up.
+    def submit(self, pool: Executor, func: Callable, *args) -> Future:
+        return pool.submit(func, *args)
+
+
+SYSTEM_CLOCK = Clock()
@@ -1,15 +1,276 @@
-from rich import print
+import ctypes
+import json
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, NoReturn, Optional
+from urllib.parse import parse_qsl
 
+from utils.clock import SYSTEM_CLOCK, Clock
+from utils.loggy import logger
 
-def load_web_app_data() -> str:
-    file_path = "webAppData.txt"
+# inotify events that can mean the file was written, replaced or removed.
+_IN_MODIFY = 0x002
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_EVENTS = (
+    _IN_MODIFY
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _fail(message: str) -> NoReturn:
+    # rich is only needed for this message, so it is not imported on start.
+    from rich import print
+
+    print(message)
+    exit(1)
+
+
+class WebAppDataError(Exception):
+    pass
+
+
+# Telegram init data as pasted from the web client: a query string with the
+# user, auth_date and hash, or the tgWebAppData parameter that wraps one.
+@dataclass(frozen=True, slots=True)
+class WebAppData:
+    raw: str
+    fields: dict[str, str] = field(compare=False)
+    auth_date: Optional[float] = None
+    user_id: Optional[int] = None
+
+    def age(
+        self, now: Optional[float] = None, clock: Clock = SYSTEM_CLOCK
+    ) -> Optional[float]:
+        if self.auth_date is None:
+            return None
+        return (clock.time() if now is None else now) - self.auth_date
+
+
+def parse_web_app_data(raw: str) -> WebAppData:
+    raw = raw.strip()
+    fields = dict(parse_qsl(raw, keep_blank_values=True))
+    if "auth_date" not in fields and "tgWebAppData" in fields:
+        raw = fields["tgWebAppData"]
+        fields = dict(parse_qsl(raw, keep_blank_values=True))
+    try:
+        auth_date = float(fields["auth_date"])
+    except (KeyError, ValueError):
+        auth_date = None
+    try:
+        user_id = int(json.loads(fields["user"])["id"])
+    except (KeyError, ValueError, TypeError):
+        user_id = None
+    return WebAppData(raw, fields, auth_date, user_id)
+
+
+def read_web_app_data(file_path: str = "webAppData.txt") -> WebAppData:
     try:
         with open(file_path, "r") as file:
             data = file.read().strip()
-            if not data:
-                print("Error: No data found in the file.")
-                exit(1)
-            return data
     except FileNotFoundError:
-        print(f"Error: {file_path} not found.")
-        exit(1)
+        raise WebAppDataError(f"{file_path} not found.")
+    if not data:
+        raise WebAppDataError(f"No data found in {file_path}.")
+    return parse_web_app_data(data)
+
+
+def load_web_app_data() -> str:
+    try:
+        return read_web_app_data().raw
+    except WebAppDataError as e:
+        _fail(f"Error: {e}")
+
+
+# The directory is watched rather than the file, so editors that save by
+# renaming a new file over the old one are seen too.
+def _inotify_watch(directory: str) -> Optional[int]:
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return None
+    if fd < 0:
+        return None
+    if libc.inotify_add_watch(fd, os.fsencode(directory), _IN_EVENTS) < 0:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _event_names(buffer: bytes) -> set[str]:
+    names = set()
+    offset = 0
+    while offset + _EVENT_HEADER.size <= len(buffer):
+        _, _, _, length = _EVENT_HEADER.unpack_from(buffer, offset)
+        offset += _EVENT_HEADER.size
+        names.add(os.fsdecode(buffer[offset : offset + length].rstrip(b"\0")))
+        offset += length
+    return names
+
+
+# webAppData.txt, re-read when it changes: through inotify where the platform
+# has it, by checking the file every poll_interval otherwise. A missing, empty
+# file keeps the last good data in force. Telegram init data is only accepted
+# for a while after its auth_date, so the source warns warn_before that point
+# and again once it has passed.
+class WebAppDataSource:
+    def __init__(
+        self,
+        path: str = "webAppData.txt",
+        max_age: float = 24 * 3600,
+        warn_before: float = 3600,
+        poll_interval: float = 5.0,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.clock = clock
+        self.path = path
+        self.max_age = max_age
+        self.warn_before = warn_before
+        self.poll_interval = poll_interval
+        self.data: Optional[WebAppData] = None
+        self.on_change: Optional[Callable[[WebAppData], None]] = None
+        self._stamp: Optional[tuple[int, int]] = None
+        self._warned: Optional[tuple[WebAppData, bool]] = None
+        self._changed = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_read, self._stop_write = -1, -1
+
+    @property
+    def expires_at(self) -> Optional[float]:
+        if self.data is None or self.data.auth_date is None:
+            return None
+        return self.data.auth_date + self.max_age
+
+    def current(self) -> WebAppData:
+        if self.data is None:
+            self.reload()
+        if self.data is None:
+            raise WebAppDataError(f"No usable data in {self.path}.")
+        return self.data
+
+    def reload(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self._stamp is not None:
+                logger.warning("{} was removed; keeping the current data.", self.path)
+                self._stamp = None
+            return False
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            data = read_web_app_data(self.path)
+        except (OSError, WebAppDataError) as e:
+            logger.warning("Ignoring {}: {}", self.path, e)
+            return False
+        if data == self.data:
+            return False
+        first, self.data = self.data is None, data
+        if not first:
+            logger.info(
+                "{} changed (auth_date {}); the next login uses it.",
+                self.path,
+                time.ctime(data.auth_date) if data.auth_date else "unknown",
+            )
+        self.check_expiry()
+        if not first and self.on_change is not None:
+            self.on_change(data)
+        self._changed.set()
+        return True
+
+    # Logs once per data when expiry is near and once more when it has passed.
+    def check_expiry(self, now: Optional[float] = None) -> None:
+        expires_at = self.expires_at
+        if expires_at is None:
+            return
+        now = self.clock.time() if now is None else now
+        if now < expires_at - self.warn_before:
+            return
+        expired = now >= expires_at
+        if self._warned is not None and self._warned[0] == self.data:
+            if self._warned[1] or not expired:
+                return
+        self._warned = (self.data, expired)
+        if expired:
+            logger.error(
+                "{} is {:.1f} hours old and may no longer be accepted; "
+                "paste fresh data from the web client.",
+                self.path,
+                self.data.age(now) / 3600,
+            )
+        else:
+            logger.warning(
+                "{} expires in {:.0f} minutes; paste fresh data from the web client.",
+                self.path,
+                (expires_at - now) / 60,
+            )
+
+    # Returns whether new data arrived after the call and within the timeout.
+    def wait_for_change(self, timeout: Optional[float] = None) -> bool:
+        self._changed.clear()
+        return self.clock.wait(self._changed, timeout)
+
+    def watch(self, on_change: Optional[Callable[[WebAppData], None]] = None) -> None:
+        if on_change is not None:
+            self.on_change = on_change
+        if self._thread is not None:
+            return
+        self._stop_read, self._stop_write = os.pipe()
+        self._thread = threading.Thread(
+            target=self._watch, name="web-app-data", daemon=True
+        )
+        self._thread.start()
+
+    def _watch(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        name = os.path.basename(self.path)
+        fd = _inotify_watch(directory)
+        if fd is None:
+            logger.debug(
+                "Checking {} every {}s for changes.", self.path, self.poll_interval
+            )
+        watched = [self._stop_read] + ([fd] if fd is not None else [])
+        # With inotify the timeout only paces the expiry check.
+        timeout = self.poll_interval if fd is None else max(self.poll_interval, 60.0)
+        try:
+            while True:
+                readable, _, _ = select.select(watched, [], [], timeout)
+                if self._stop_read in readable:
+                    return
+                if fd in readable and name not in _event_names(os.read(fd, 65536)):
+                    continue
+                try:
+                    self.reload()
+                    self.check_expiry()
+                except Exception as e:
+                    logger.error("Error watching {}: {}", self.path, e)
+        finally:
+            if fd is not None:
+                os.close(fd)
+            os.close(self._stop_read)
+
+    def close(self) -> None:
+        if self._thread is None:
+            return
+        os.write(self._stop_write, b"\0")
+        self._thread.join()
+        os.close(self._stop_write)
+        self._thread = None
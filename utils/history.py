@@ -0,0 +1,286 @@
+import argparse
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import astuple, dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, Callable, Optional, Self
+
+from utils.loggy import logger
+
+if TYPE_CHECKING:
+    from tass.models import UserModel
+
+PERIODS = {"hour": 3600, "day": 86400}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    t REAL NOT NULL,
+    experience INTEGER NOT NULL,
+    energy INTEGER NOT NULL,
+    total_taps INTEGER NOT NULL,
+    taps_today INTEGER NOT NULL,
+    referrals INTEGER NOT NULL,
+    second_tier_referrals INTEGER NOT NULL,
+    achievements INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS snapshots_t ON snapshots (t);
+CREATE TABLE IF NOT EXISTS stages (
+    t REAL NOT NULL,
+    stage TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS stages_t ON stages (t);
+CREATE TABLE IF NOT EXISTS rollups (
+    period TEXT NOT NULL,
+    start REAL NOT NULL,
+    experience INTEGER NOT NULL DEFAULT 0,
+    taps INTEGER NOT NULL DEFAULT 0,
+    requests INTEGER NOT NULL DEFAULT 0,
+    energy_wasted INTEGER NOT NULL DEFAULT 0,
+    stage_runs INTEGER NOT NULL DEFAULT 0,
+    stage_failures INTEGER NOT NULL DEFAULT 0,
+    stage_seconds REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (period, start)
+) WITHOUT ROWID;
+"""
+
+ROLLUP_UPSERT = """
+INSERT INTO rollups (period, start, experience, taps, requests, energy_wasted,
+                     stage_runs, stage_failures, stage_seconds)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (period, start) DO UPDATE SET
+    experience = experience + excluded.experience,
+    taps = taps + excluded.taps,
+    requests = requests + excluded.requests,
+    energy_wasted = energy_wasted + excluded.energy_wasted,
+    stage_runs = stage_runs + excluded.stage_runs,
+    stage_failures = stage_failures + excluded.stage_failures,
+    stage_seconds = stage_seconds + excluded.stage_seconds
+"""
+
+
+@dataclass(slots=True)
+class Rollup:
+    start: float
+    experience: int
+    taps: int
+    requests: int
+    energy_wasted: int
+    stage_runs: int
+    stage_failures: int
+    stage_seconds: float
+
+    @property
+    def taps_per_request(self) -> float:
+        return self.taps / self.requests if self.requests else 0.0
+
+
+# Profile snapshots and stage outcomes in SQLite, indexed on time, with hourly
+# and daily totals kept up to date as rows come in, so a query over months
+# reads a few hundred rollup rows rather than the raw history. Gains are the
+# difference from the previous snapshot; a counter that goes down (e.g. a new
+# account) starts over without a gain.
+class History:
+    def __init__(
+        self, path: str, request_count: Optional[Callable[[], int]] = None
+    ) -> None:
+        self.path = path
+        self.request_count = request_count
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        self._last: Optional[tuple[int, ...]] = None
+        self._requests_seen = request_count() if request_count else 0
+        row = self._db.execute(
+            "SELECT experience, energy, total_taps, taps_today, referrals,"
+            " second_tier_referrals, achievements FROM snapshots"
+            " ORDER BY t DESC LIMIT 1"
+        ).fetchone()
+        if row is not None:
+            self._last = tuple(row)
+
+    @classmethod
+    def open(
+        cls,
+        path: str = "history.sqlite3",
+        request_count: Optional[Callable[[], int]] = None,
+    ) -> Optional[Self]:
+        try:
+            return cls(path, request_count)
+        except sqlite3.Error as e:
+            # The bot runs the same without it; only the analytics are lost.
+            logger.warning("History store {} is unavailable: {}", path, e)
+            return None
+
+    def _new_requests(self) -> int:
+        if self.request_count is None:
+            return 0
+        count = self.request_count()
+        new, self._requests_seen = count - self._requests_seen, count
+        return max(new, 0)
+
+    def _add(self, t: float, **totals: Any) -> None:
+        values = (
+            totals.get("experience", 0),
+            totals.get("taps", 0),
+            totals.get("requests", 0),
+            totals.get("energy_wasted", 0),
+            totals.get("stage_runs", 0),
+            totals.get("stage_failures", 0),
+            totals.get("stage_seconds", 0.0),
+        )
+        for period, seconds in PERIODS.items():
+            self._db.execute(ROLLUP_UPSERT, (period, t - t % seconds, *values))
+
+    # Unchanged profiles, e.g. served from the read cache, are not stored again.
+    def record_profile(self, profile: "UserModel", t: Optional[float] = None) -> None:
+        t = time.time() if t is None else t
+        values = (
+            profile.experience,
+            profile.energy,
+            profile.totalTaps,
+            profile.tapsToday,
+            profile.referrals.firstTier.get("count", 0),
+            profile.referrals.secondTier.get("count", 0),
+            profile.achievementsCount,
+        )
+        with self._lock:
+            if values == self._last:
+                return
+            last, self._last = self._last, values
+            try:
+                with self._db:
+                    self._db.execute(
+                        "INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        (t, *values),
+                    )
+                    if last is not None:
+                        self._add(
+                            t,
+                            experience=max(values[0] - last[0], 0),
+                            taps=max(values[2] - last[2], 0),
+                            requests=self._new_requests(),
+                        )
+            except sqlite3.Error as e:
+                logger.warning("Could not write to {}: {}", self.path, e)
+
+    def record_stage(
+        self,
+        stage: str,
+        seconds: float,
+        ok: bool,
+        data: Optional[dict[str, Any]] = None,
+        t: Optional[float] = None,
+    ) -> None:
+        t = time.time() if t is None else t
+        data = data or {}
+        with self._lock:
+            try:
+                with self._db:
+                    self._db.execute(
+                        "INSERT INTO stages VALUES (?, ?, ?, ?, ?)",
+                        (t, stage, seconds, ok, json.dumps(data, default=str)),
+                    )
+                    self._add(
+                        t,
+                        requests=self._new_requests(),
+                        energy_wasted=data.get("energy_wasted", 0),
+                        stage_runs=1,
+                        stage_failures=not ok,
+                        stage_seconds=seconds,
+                    )
+            except sqlite3.Error as e:
+                logger.warning("Could not write to {}: {}", self.path, e)
+
+    def rollups(
+        self, period: str, since: float = 0.0, until: float = float("inf")
+    ) -> list[Rollup]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT start, experience, taps, requests, energy_wasted,"
+                " stage_runs, stage_failures, stage_seconds FROM rollups"
+                " WHERE period = ? AND start >= ? AND start < ? ORDER BY start",
+                (period, since - since % PERIODS[period], until),
+            ).fetchall()
+        return [Rollup(*row) for row in rows]
+
+    def stage_summary(
+        self, since: float = 0.0, until: float = float("inf")
+    ) -> list[tuple[str, int, int, float]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT stage, COUNT(*), SUM(ok = 0), AVG(seconds) FROM stages"
+                " WHERE t >= ? AND t < ? GROUP BY stage ORDER BY stage",
+                (since, until),
+            ).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+def _since(spec: str) -> float:
+    units = {"h": 3600, "d": 86400, "w": 7 * 86400}
+    if spec[-1:] in units:
+        return time.time() - float(spec[:-1]) * units[spec[-1]]
+    return datetime.fromisoformat(spec).replace(tzinfo=timezone.utc).timestamp()
+
+
+def print_rollups(rollups: list[Rollup], period: str) -> None:
+    fmt = "%Y-%m-%d %H:00" if period == "hour" else "%Y-%m-%d"
+    print(
+        f"{period:<18}{'experience':>12}{'taps':>9}{'requests':>10}"
+        f"{'taps/req':>10}{'wasted':>8}{'runs':>6}{'failed':>8}"
+    )
+    for rollup in rollups:
+        start = datetime.fromtimestamp(rollup.start, timezone.utc).strftime(fmt)
+        print(
+            f"{start:<18}{rollup.experience:>12}{rollup.taps:>9}"
+            f"{rollup.requests:>10}{rollup.taps_per_request:>10.1f}"
+            f"{rollup.energy_wasted:>8}{rollup.stage_runs:>6}"
+            f"{rollup.stage_failures:>8}"
+        )
+    if len(rollups) > 1:
+        total = Rollup(0.0, *map(sum, zip(*(astuple(r)[1:] for r in rollups))))
+        print(
+            f"{'total':<18}{total.experience:>12}{total.taps:>9}"
+            f"{total.requests:>10}{total.taps_per_request:>10.1f}"
+            f"{total.energy_wasted:>8}{total.stage_runs:>6}{total.stage_failures:>8}"
+        )
+
+
+def main_cli(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Query the experience, taps and stage history of the bot."
+    )
+    parser.add_argument("view", choices=["hourly", "daily", "stages"])
+    parser.add_argument("--db", default="history.sqlite3")
+    parser.add_argument(
+        "--since",
+        default="7d",
+        help="How far back, e.g. 24h, 30d, 2w, or a UTC date like 2026-01-31.",
+    )
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    history = History(args.db)
+    since = _since(args.since)
+    if args.view == "stages":
+        print(f"{'stage':<16}{'runs':>7}{'failed':>8}{'mean s':>9}")
+        for stage, runs, failed, mean in history.stage_summary(since):
+            print(f"{stage:<16}{runs:>7}{failed:>8}{mean:>9.1f}")
+    else:
+        period = "hour" if args.view == "hourly" else "day"
+        print_rollups(history.rollups(period, since), period)
+    history.close()
+    print(f"({(time.perf_counter() - start) * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main_cli()
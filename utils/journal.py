@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional, Self
+
+from utils.clock import SYSTEM_CLOCK, Clock
+from utils.loggy import logger
+
+
+@dataclass(slots=True)
+class JournalEntry:
+    stage: str
+    finished_at: float
+    next_due: Optional[float]
+    data: dict[str, Any] = field(default_factory=dict)
+
+
+# Append-only record of finished stages. Each line is written and fsynced on
+# its own, so a crash loses at most the line being written, and that torn line
+# is skipped on load.
+class Journal:
+    def __init__(
+        self, path: str, compact_after: int = 1000, clock: Clock = SYSTEM_CLOCK
+    ) -> None:
+        self.path = path
+        self.clock = clock
+        self.compact_after = compact_after
+        self.latest: dict[str, JournalEntry] = {}
+        self._notes: dict[str, dict[str, Any]] = {}
+        self._lines = 0
+        # Stages running side by side record their results concurrently.
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(
+        cls, path: str = "stage_journal.jsonl", clock: Clock = SYSTEM_CLOCK
+    ) -> Self:
+        journal = cls(path, clock=clock)
+        damaged = False
+        try:
+            with open(path, "r") as file:
+                for line in file:
+                    journal._lines += 1
+                    try:
+                        entry = JournalEntry(**json.loads(line))
+                    except (ValueError, TypeError):
+                        logger.warning("Skipping a damaged line in {}.", path)
+                        damaged = True
+                        continue
+                    journal.latest[entry.stage] = entry
+        except FileNotFoundError:
+            pass
+        if damaged:
+            # The next entry would be appended to a torn last line and lost
+            # with it, so the journal is rewritten without the damage.
+            try:
+                journal.compact()
+            except OSError as e:
+                logger.warning("Could not rewrite {}: {}", path, e)
+        return journal
+
+    def note(self, stage: str, **data: Any) -> None:
+        with self._lock:
+            self._notes.setdefault(stage, {}).update(data)
+
+    def record(self, stage: str, next_due: Optional[float]) -> JournalEntry:
+        with self._lock:
+            entry = JournalEntry(
+                stage, self.clock.time(), next_due, self._notes.pop(stage, {})
+            )
+            self.latest[stage] = entry
+            if self._lines >= self.compact_after:
+                self._compact()
+                return entry
+            try:
+                self._write(self.path, "a", [entry])
+                self._lines += 1
+            except OSError as e:
+                # Losing a line only means the stage runs again after a restart.
+                logger.warning("Could not write to {}: {}", self.path, e)
+            return entry
+
+    def resume_at(self, stage: str) -> Optional[float]:
+        entry = self.latest.get(stage)
+        if (
+            entry is None
+            or entry.next_due is None
+            or entry.next_due <= self.clock.time()
+        ):
+            return None
+        return entry.next_due
+
+    @staticmethod
+    def _write(path: str, mode: str, entries: list[JournalEntry]) -> None:
+        with open(path, mode) as file:
+            for entry in entries:
+                file.write(json.dumps(asdict(entry), default=str) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+
+    # Rewrites the journal with only the latest entry of each stage.
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def _compact(self) -> None:
+        tmp_path = f"{self.path}.tmp"
+        self._write(tmp_path, "w", list(self.latest.values()))
+        os.replace(tmp_path, self.path)
+        self._lines = len(self.latest)
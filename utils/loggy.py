@@ -1,11 +1,203 @@
+import json
+import os
 import sys
+import threading
+import time
+from collections import deque
+from typing import Optional
+
 from loguru import logger
 
-logger.remove()
-logger.add(
-    sys.stdout,
-    colorize=True,
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> - <level>{message}</level>",
-    enqueue=True,
-)
+CONSOLE_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level}</level> - <level>{message}</level>"
+
+
+# Writes one compact JSON object per record. Records are only queued by the
+# logging call; a background thread serializes and writes them in batches and
+# rotates the file by size or age. The age is counted from the file's first
+# record, which survives restarts, chmod and rename alike. At most max_pending
+# records wait; beyond that, and when a write fails, records are dropped and
+# counted, and the count is written once writing works again.
+class JsonLinesSink:
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        rotate_every: Optional[float] = 24 * 60 * 60,
+        backups: int = 5,
+        batch_size: int = 64,
+        flush_interval: float = 1.0,
+        max_pending: int = 10_000,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.rotate_every = rotate_every
+        self.backups = backups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: deque[tuple] = deque(maxlen=max_pending)
+        self.dropped = 0
+        self._reported = 0
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._size = 0
+        self._started_at = 0.0
+
+    def write(self, message) -> None:
+        record = message.record
+        exception = record["exception"]
+        if len(self._pending) == self._pending.maxlen:
+            self.dropped += 1
+        self._pending.append(
+            (
+                record["time"].timestamp(),
+                record["level"].name,
+                record["message"],
+                record["name"],
+                record["line"],
+                record["extra"],
+                None if exception is None else str(exception.value),
+            )
+        )
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stopped:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.drain()
+
+    def _open(self) -> None:
+        self._file = open(self.path, "a", encoding="utf-8")
+        self._size = self._file.tell()
+        self._started_at = self._first_timestamp() if self._size else time.time()
+
+    def _first_timestamp(self) -> float:
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                return float(json.loads(file.readline())["ts"])
+        except (OSError, ValueError, KeyError, TypeError):
+            return time.time()
+
+    def _should_rotate(self) -> bool:
+        if self._size >= self.max_bytes:
+            return True
+        return (
+            self.rotate_every is not None
+            and time.time() - self._started_at >= self.rotate_every
+        )
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        for index in range(self.backups - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backups:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    # Not named flush: loguru would call that after every record.
+    def drain(self) -> None:
+        lines = []
+        pending = self._pending
+        while pending:
+            timestamp, level, message, module, line, extra, exception = (
+                pending.popleft()
+            )
+            entry = {
+                "ts": timestamp,
+                "level": level,
+                "message": message,
+                "module": module,
+                "line": line,
+            }
+            if extra:
+                entry["extra"] = extra
+            if exception is not None:
+                entry["exception"] = exception
+            lines.append(json.dumps(entry, default=str) + "\n")
+        if not lines:
+            return
+        dropped = self.dropped - self._reported
+        if dropped:
+            entry = {
+                "ts": time.time(),
+                "level": "WARNING",
+                "message": f"{dropped} log records dropped",
+                "module": __name__,
+                "line": 0,
+            }
+            lines.insert(0, json.dumps(entry) + "\n")
+        try:
+            self._write("".join(lines))
+        except OSError as e:
+            # Not logged: the record would come straight back here.
+            print(f"Cannot write {self.path}: {e}", file=sys.stderr)
+            self.dropped += len(lines) - (1 if dropped else 0)
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            return
+        self._reported += dropped
+
+    def _write(self, chunk: str) -> None:
+        if self._file is None:
+            self._open()
+        if self._size and self._should_rotate():
+            self._rotate()
+        self._file.write(chunk)
+        self._file.flush()
+        self._size += len(chunk)
+
+    # Called by loguru when the handler is removed, including at exit.
+    def stop(self) -> None:
+        self._stopped = True
+        if self._thread is not None:
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        self.drain()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def configure(
+    level: str = "INFO",
+    json_path: Optional[str] = None,
+    json_level: Optional[str] = None,
+    console: bool = True,
+) -> Optional[JsonLinesSink]:
+    logger.remove()
+    if console:
+        logger.add(
+            sys.stdout,
+            level=level,
+            colorize=True,
+            format=CONSOLE_FORMAT,
+        )
+    sink = None
+    if json_path:
+        sink = JsonLinesSink(
+            json_path,
+            max_bytes=int(os.getenv("TASS_LOG_MAX_BYTES", "10485760")),
+            rotate_every=float(os.getenv("TASS_LOG_ROTATE_HOURS", "24")) * 3600,
+        )
+        logger.add(sink, level=json_level or level, format="{message}")
+    return sink
+
+
 logger.level("INFO", color="<blue>")
+configure(
+    level=os.getenv("TASS_LOG_LEVEL", "INFO"),
+    json_path=os.getenv("TASS_LOG_JSON"),
+)
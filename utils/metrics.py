@@ -0,0 +1,295 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Iterator, Optional
+
+from utils.loggy import logger
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+CONNECT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+STAGE_BUCKETS = (0.1, 0.5, 1.0, 5.0, 15.0, 30.0, 60.0, 300.0, 900.0, 1800.0)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[tuple[str, int]]:
+        total = 0
+        rows = []
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            rows.append((str(bound), total))
+        return rows
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": dict(self.cumulative()),
+        }
+
+
+def _labels(**labels) -> str:
+    inner = ",".join(f'{key}="{value}"' for key, value in labels.items())
+    return "{" + inner + "}"
+
+
+class Metrics:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.request_latency: dict[tuple[str, str], Histogram] = {}
+        self.responses: Counter[tuple[str, str, int]] = Counter()
+        self.retries: Counter[str] = Counter()
+        self.bytes_sent: Counter[str] = Counter()
+        self.bytes_received: Counter[str] = Counter()
+        self.stage_duration: dict[str, Histogram] = {}
+        self.stage_errors: Counter[str] = Counter()
+        self.connect_duration: dict[str, Histogram] = {}
+        self.connection_events: Counter[tuple[str, str]] = Counter()
+
+    def observe_request(
+        self,
+        endpoint: str,
+        method: str,
+        status: int,
+        seconds: float,
+        bytes_sent: int,
+        bytes_received: int,
+    ) -> None:
+        with self._lock:
+            histogram = self.request_latency.get((endpoint, method))
+            if histogram is None:
+                histogram = Histogram(LATENCY_BUCKETS)
+                self.request_latency[(endpoint, method)] = histogram
+            histogram.observe(seconds)
+            self.responses[(endpoint, method, status)] += 1
+            self.bytes_sent[endpoint] += bytes_sent
+            self.bytes_received[endpoint] += bytes_received
+
+    def observe_retry(self, endpoint: str) -> None:
+        with self._lock:
+            self.retries[endpoint] += 1
+
+    # Time to open a connection, including the TLS handshake.
+    def observe_connect(self, host: str, seconds: float, resumed: bool) -> None:
+        with self._lock:
+            histogram = self.connect_duration.get(host)
+            if histogram is None:
+                histogram = self.connect_duration[host] = Histogram(CONNECT_BUCKETS)
+            histogram.observe(seconds)
+            self.connection_events[(host, "opened")] += 1
+            if resumed:
+                self.connection_events[(host, "tls_resumed")] += 1
+
+    def observe_connection_event(self, host: str, event: str) -> None:
+        with self._lock:
+            self.connection_events[(host, event)] += 1
+
+    def observe_stage(self, stage: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            histogram = self.stage_duration.get(stage)
+            if histogram is None:
+                histogram = self.stage_duration[stage] = Histogram(STAGE_BUCKETS)
+            histogram.observe(seconds)
+            if failed:
+                self.stage_errors[stage] += 1
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            self.observe_stage(stage, time.perf_counter() - start, failed)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "uptime_seconds": time.time() - self.started_at,
+                "requests": [
+                    {"endpoint": endpoint, "method": method, **histogram.to_dict()}
+                    for (endpoint, method), histogram in self.request_latency.items()
+                ],
+                "responses": [
+                    {
+                        "endpoint": endpoint,
+                        "method": method,
+                        "status": status,
+                        "count": count,
+                    }
+                    for (endpoint, method, status), count in self.responses.items()
+                ],
+                "retries": dict(self.retries),
+                "bytes_sent": dict(self.bytes_sent),
+                "bytes_received": dict(self.bytes_received),
+                "stages": {
+                    stage: histogram.to_dict()
+                    for stage, histogram in self.stage_duration.items()
+                },
+                "stage_errors": dict(self.stage_errors),
+                "connections": {
+                    host: histogram.to_dict()
+                    for host, histogram in self.connect_duration.items()
+                },
+                "connection_events": [
+                    {"host": host, "event": event, "count": count}
+                    for (host, event), count in self.connection_events.items()
+                ],
+            }
+
+    def render_prometheus(self) -> str:
+        lines: list[str] = []
+        with self._lock:
+            lines += [
+                "# HELP tass_request_duration_seconds TassBeeh API request latency.",
+                "# TYPE tass_request_duration_seconds histogram",
+            ]
+            for (endpoint, method), histogram in self.request_latency.items():
+                self._render_histogram(
+                    lines,
+                    "tass_request_duration_seconds",
+                    histogram,
+                    endpoint=endpoint,
+                    method=method,
+                )
+            lines += [
+                "# HELP tass_responses_total TassBeeh API responses by status code.",
+                "# TYPE tass_responses_total counter",
+            ]
+            for (endpoint, method, status), count in self.responses.items():
+                labels = _labels(endpoint=endpoint, method=method, status=status)
+                lines.append(f"tass_responses_total{labels} {count}")
+            for name, help_text, counter in (
+                ("tass_request_retries_total", "Retried requests.", self.retries),
+                (
+                    "tass_request_bytes_sent_total",
+                    "Request body bytes.",
+                    self.bytes_sent,
+                ),
+                (
+                    "tass_response_bytes_received_total",
+                    "Response body bytes.",
+                    self.bytes_received,
+                ),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                for endpoint, count in counter.items():
+                    lines.append(f"{name}{_labels(endpoint=endpoint)} {count}")
+            lines += [
+                "# HELP tass_stage_duration_seconds Time spent in each bot stage.",
+                "# TYPE tass_stage_duration_seconds histogram",
+            ]
+            for stage, histogram in self.stage_duration.items():
+                self._render_histogram(
+                    lines, "tass_stage_duration_seconds", histogram, stage=stage
+                )
+            lines += [
+                "# HELP tass_stage_errors_total Bot stages that raised.",
+                "# TYPE tass_stage_errors_total counter",
+            ]
+            for stage, count in self.stage_errors.items():
+                lines.append(f"tass_stage_errors_total{_labels(stage=stage)} {count}")
+            lines += [
+                "# HELP tass_connect_duration_seconds Connection setup, TLS included.",
+                "# TYPE tass_connect_duration_seconds histogram",
+            ]
+            for host, histogram in self.connect_duration.items():
+                self._render_histogram(
+                    lines, "tass_connect_duration_seconds", histogram, host=host
+                )
+            lines += [
+                "# HELP tass_connection_events_total Connections opened, resumed, evicted.",
+                "# TYPE tass_connection_events_total counter",
+            ]
+            for (host, event), count in self.connection_events.items():
+                labels = _labels(host=host, event=event)
+                lines.append(f"tass_connection_events_total{labels} {count}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(
+        lines: list[str], name: str, histogram: Histogram, **labels
+    ) -> None:
+        for bound, count in histogram.cumulative():
+            lines.append(f"{name}_bucket{_labels(**labels, le=bound)} {count}")
+        lines.append(f"{name}_sum{_labels(**labels)} {histogram.sum}")
+        lines.append(f"{name}_count{_labels(**labels)} {histogram.count}")
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                if self.path.split("?")[0] == "/metrics":
+                    body = registry.render_prometheus().encode()
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                elif self.path.split("?")[0] == "/metrics.json":
+                    body = json.dumps(registry.snapshot()).encode()
+                    content_type = "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args) -> None:
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info("Metrics available at http://{}:{}/metrics", host, port)
+        return server
+
+    def write_snapshots(self, path: str, interval: float = 60.0) -> threading.Thread:
+        def loop() -> None:
+            while True:
+                time.sleep(interval)
+                self.write_snapshot(path)
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    def write_snapshot(self, path: str) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.snapshot(), file)
+        os.replace(tmp_path, path)
+
+    def start_from_env(self) -> None:
+        port: Optional[str] = os.getenv("TASS_METRICS_PORT")
+        if port:
+            self.serve(int(port))
+        path = os.getenv("TASS_METRICS_SNAPSHOT")
+        if path:
+            interval = float(os.getenv("TASS_METRICS_SNAPSHOT_INTERVAL", "60"))
+            self.write_snapshots(path, interval)
+
+
+metrics = Metrics()
@@ -0,0 +1,192 @@
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from utils.loggy import logger
+
+# Checked from the innermost frame outwards; the first match names the sample.
+CATEGORIES = (
+    ("swipe payload", ("__generate_swipes",)),
+    ("logging", ("loguru",)),
+    ("validation", ("pydantic",)),
+    ("json", ("json", "orjson")),
+    ("network", ("socket", "ssl", "urllib3", "http/client", "requests", "httpx")),
+    ("waiting on threads", ("concurrent/futures", "threading.py:wait")),
+)
+# The profiler's own bookkeeping is left out of the allocation report.
+OWN_ALLOCATIONS = (
+    tracemalloc.Filter(False, cProfile.__file__),
+    tracemalloc.Filter(False, pstats.__file__),
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+def _category(stack: tuple[str, ...]) -> str:
+    for frame in reversed(stack):
+        for name, markers in CATEGORIES:
+            if any(marker in frame for marker in markers):
+                return name
+    return "other"
+
+
+@dataclass
+class StageProfile:
+    runs: int = 0
+    cpu: float = 0.0
+    busy: float = 0.0
+    slept: float = 0.0
+    peak_memory: int = 0
+    stats: Optional[pstats.Stats] = None
+    samples: Counter[tuple[str, ...]] = field(default_factory=Counter)
+    allocations: list[str] = field(default_factory=list)
+
+
+# Profiles scheduler stages: cProfile for function totals, a sampling thread
+# for collapsed stacks and tracemalloc for what each run allocated. Time spent
+# in time.sleep is taken out of all three so the work stands out. Only sleeps on
+# the stage's own thread count: time.sleep is patched for the whole process,
+# and a helper thread (e.g. the tap pipeline's) sleeps while the stage waits.
+class StageProfiler:
+    def __init__(
+        self,
+        output_dir: str = "profile",
+        interval: float = 0.005,
+        top: int = 25,
+        trace_frames: int = 1,
+    ) -> None:
+        self.output_dir = output_dir
+        self.interval = interval
+        self.top = top
+        self.stages: dict[str, StageProfile] = {}
+        self._slept = 0.0
+        self._sleeping = threading.Event()
+        self._thread_id: Optional[int] = None
+        self._real_sleep = time.sleep
+        self.trace_frames = trace_frames
+        os.makedirs(output_dir, exist_ok=True)
+
+    def _sleep(self, seconds: float) -> None:
+        if threading.get_ident() != self._thread_id:
+            self._real_sleep(seconds)
+            return
+        start = time.perf_counter()
+        self._sleeping.set()
+        try:
+            self._real_sleep(seconds)
+        finally:
+            self._sleeping.clear()
+            self._slept += time.perf_counter() - start
+
+    def _busy_clock(self) -> float:
+        return time.perf_counter() - self._slept
+
+    def _sample(self, thread_id: int, samples: Counter, done: threading.Event) -> None:
+        while not done.wait(self.interval):
+            if self._sleeping.is_set():
+                continue
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_filename}:{code.co_name}")
+                frame = frame.f_back
+            samples[tuple(reversed(stack))] += 1
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        profile = self.stages.setdefault(name, StageProfile())
+        profiler = cProfile.Profile(self._busy_clock)
+        samples: Counter[tuple[str, ...]] = Counter()
+        done = threading.Event()
+        sampler = threading.Thread(
+            target=self._sample,
+            args=(threading.get_ident(), samples, done),
+            daemon=True,
+        )
+        # Only what the stage allocates ends up in the snapshot, which keeps
+        # it small. Tracing stays on: stopping it while other threads
+        # allocate is not safe on every Python version.
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.trace_frames)
+        tracemalloc.clear_traces()
+        slept_before = self._slept
+        self._thread_id = threading.get_ident()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        self._real_sleep = time.sleep
+        time.sleep = self._sleep
+        sampler.start()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            done.set()
+            sampler.join()
+            time.sleep = self._real_sleep
+            self._thread_id = None
+            slept = self._slept - slept_before
+            profile.runs += 1
+            profile.cpu += time.process_time() - cpu_start
+            profile.busy += time.perf_counter() - wall_start - slept
+            profile.slept += slept
+            profile.samples.update(samples)
+            if profile.stats is None:
+                profile.stats = pstats.Stats(profiler)
+            else:
+                profile.stats.add(profiler)
+            snapshot = tracemalloc.take_snapshot().filter_traces(OWN_ALLOCATIONS)
+            profile.peak_memory = max(
+                profile.peak_memory, tracemalloc.get_traced_memory()[1]
+            )
+            profile.allocations = [
+                str(stat) for stat in snapshot.statistics("lineno")[: self.top]
+            ]
+            self.write(name)
+
+    def breakdown(self, name: str) -> dict[str, float]:
+        samples = self.stages[name].samples
+        total = sum(samples.values())
+        shares: Counter[str] = Counter()
+        for stack, count in samples.items():
+            shares[_category(stack)] += count
+        return {category: count / total for category, count in shares.most_common()}
+
+    def write(self, name: str) -> None:
+        profile = self.stages[name]
+        base = os.path.join(self.output_dir, name)
+        profile.stats.dump_stats(f"{base}.pstats")
+        with open(f"{base}.collapsed", "w") as file:
+            for stack, count in profile.samples.items():
+                file.write(f"{';'.join(stack)} {count}\n")
+        with open(f"{base}.allocations.txt", "w") as file:
+            file.write(f"Memory still held after the last '{name}' run, by line:\n")
+            file.write("\n".join(profile.allocations) + "\n")
+        self.write_summary()
+
+    def write_summary(self) -> None:
+        with open(os.path.join(self.output_dir, "summary.txt"), "w") as file:
+            for name, profile in self.stages.items():
+                file.write(
+                    f"{name}: {profile.runs} runs, cpu {profile.cpu:.3f}s, "
+                    f"busy {profile.busy:.3f}s, slept {profile.slept:.1f}s, "
+                    f"peak traced memory {profile.peak_memory / 1024:.0f} KiB\n"
+                )
+                if profile.samples:
+                    shares = ", ".join(
+                        f"{category} {share:.0%}"
+                        for category, share in self.breakdown(name).items()
+                    )
+                    file.write(f"  busy time by sample: {shares}\n")
+                profile.stats.stream = file
+                profile.stats.sort_stats("cumulative").print_stats(self.top)
+        logger.debug("Profile written to {}", self.output_dir)
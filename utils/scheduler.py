@@ -0,0 +1,255 @@
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+from utils.clock import SYSTEM_CLOCK, Clock
+from utils.history import History
+from utils.journal import Journal
+from utils.loggy import logger
+from utils.metrics import metrics
+from utils.profiling import StageProfiler
+
+# A job returns the timestamp it wants to run again at, or None to stop.
+JobAction = Callable[[], Optional[float]]
+
+
+@dataclass(order=True, slots=True)
+class Job:
+    due: float
+    seq: int
+    name: str = field(compare=False)
+    action: JobAction = field(compare=False)
+    cancelled: bool = field(default=False, compare=False)
+
+
+# A node of the stage graph: the stage runs after the stages in `after` when
+# both are due, and never at the same time as any stage it depends on, directly
+# or through others, or that depends on it.
+@dataclass(frozen=True, slots=True)
+class Stage:
+    name: str
+    action: JobAction
+    after: tuple[str, ...] = ()
+
+
+class Scheduler:
+    def __init__(
+        self,
+        retry_delay: float = 60.0,
+        journal: Optional[Journal] = None,
+        profiler: Optional[StageProfiler] = None,
+        max_workers: int = 4,
+        history: Optional[History] = None,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.clock = clock
+        self.retry_delay = retry_delay
+        self.journal = journal
+        self.history = history
+        self.profiler = profiler
+        self.max_workers = max_workers
+        self._queue: list[Job] = []
+        self._jobs: dict[str, Job] = {}
+        self._seq = itertools.count()
+        self._cancelled = 0
+        self._ancestors: dict[str, frozenset[str]] = {}
+        self._related: dict[str, frozenset[str]] = {}
+        self._running: set[str] = set()
+        self._lock = threading.RLock()
+        self._wakeup = threading.Event()
+
+    # Records the dependency graph; stages named in `after` must be declared too.
+    def declare(self, stages: Iterable[Stage]) -> None:
+        graph = {stage.name: stage.after for stage in stages}
+        for name, after in graph.items():
+            unknown = set(after) - graph.keys()
+            if unknown:
+                raise ValueError(f"Stage '{name}' follows unknown {sorted(unknown)}")
+
+        def ancestors(name: str, path: tuple[str, ...]) -> frozenset[str]:
+            if name in path:
+                raise ValueError(f"Stage graph has a cycle: {' -> '.join(path)}")
+            found = set(graph[name])
+            for parent in graph[name]:
+                found |= ancestors(parent, path + (name,))
+            return frozenset(found)
+
+        with self._lock:
+            self._ancestors = {name: ancestors(name, ()) for name in graph}
+            self._related = {
+                name: found
+                | {other for other, up in self._ancestors.items() if name in up}
+                for name, found in self._ancestors.items()
+            }
+
+    def resume_stages(self, stages: Iterable[Stage]) -> None:
+        stages = list(stages)
+        self.declare(stages)
+        for stage in stages:
+            self.resume(stage.name, stage.action)
+
+    def schedule(self, name: str, due: float, action: JobAction) -> None:
+        with self._lock:
+            self.cancel(name)
+            job = Job(due=due, seq=next(self._seq), name=name, action=action)
+            self._jobs[name] = job
+            heapq.heappush(self._queue, job)
+        self._wakeup.set()
+
+    def schedule_now(self, name: str, action: JobAction, delay: float = 0.0) -> None:
+        self.schedule(name, self.clock.time() + delay, action)
+
+    # Schedules a job at the time the journal last asked for, or now.
+    def resume(self, name: str, action: JobAction) -> None:
+        due = self.journal.resume_at(name) if self.journal is not None else None
+        if due is None:
+            self.schedule_now(name, action)
+        else:
+            logger.info("Resuming '{}' at {} from the journal.", name, time.ctime(due))
+            self.schedule(name, due, action)
+
+    def cancel(self, name: str) -> None:
+        with self._lock:
+            job = self._jobs.pop(name, None)
+            if job is not None:
+                job.cancelled = True
+                self._cancelled += 1
+                # Jobs rescheduled long before they are due would otherwise pile
+                # up in the heap for as long as the process runs.
+                if self._cancelled > max(len(self._jobs), 32):
+                    self._queue = [job for job in self._queue if not job.cancelled]
+                    heapq.heapify(self._queue)
+                    self._cancelled = 0
+
+    def pending(self) -> dict[str, float]:
+        with self._lock:
+            return {name: job.due for name, job in self._jobs.items()}
+
+    def running(self) -> set[str]:
+        with self._lock:
+            return set(self._running)
+
+    def _next_job(self) -> Optional[Job]:
+        with self._lock:
+            while self._queue and self._queue[0].cancelled:
+                heapq.heappop(self._queue)
+                self._cancelled -= 1
+            return self._queue[0] if self._queue else None
+
+    def next_due(self) -> Optional[float]:
+        job = self._next_job()
+        return job.due if job is not None else None
+
+    # A due job waits while a related stage runs or one it follows is also due.
+    def _ready(self, job: Job, now: float) -> bool:
+        if job.name in self._running:
+            return False
+        if self._running & self._related.get(job.name, frozenset()):
+            return False
+        return not any(
+            name in self._jobs and self._jobs[name].due <= now
+            for name in self._ancestors.get(job.name, ())
+        )
+
+    def _take_ready(self, limit: Optional[int] = None) -> list[Job]:
+        with self._lock:
+            now = self.clock.time()
+            ready = []
+            for job in sorted(job for job in self._jobs.values() if job.due <= now):
+                if limit is not None and len(ready) >= limit:
+                    break
+                if self._ready(job, now):
+                    self.cancel(job.name)
+                    self._running.add(job.name)
+                    ready.append(job)
+            return ready
+
+    def run_pending(self) -> int:
+        ran = 0
+        while jobs := self._take_ready():
+            for job in jobs:
+                self._run(job)
+                ran += 1
+        return ran
+
+    def _start(self, pool: ThreadPoolExecutor, job: Job) -> None:
+        self.clock.submit(pool, self._run, job)
+
+    def _run(self, job: Job) -> None:
+        started = self.clock.time()
+        try:
+            profiled = self.profiler.stage(job.name) if self.profiler else nullcontext()
+            with metrics.stage(job.name), profiled:
+                next_due = job.action()
+            data = {}
+            if self.journal is not None:
+                data = self.journal.record(job.name, next_due).data
+            self._record(job.name, started, True, data)
+        except Exception as e:
+            self._record(job.name, started, False)
+            logger.error("Error in job '{}': {}", job.name, e)
+            logger.error("Traceback: " + traceback.format_exc())
+            # Errors may say when retrying makes sense (e.g. an open circuit).
+            next_due = (
+                getattr(e, "retry_at", None) or self.clock.time() + self.retry_delay
+            )
+            logger.info(
+                "--- Retrying '{}' in {:.0f} seconds ---",
+                job.name,
+                next_due - self.clock.time(),
+            )
+        with self._lock:
+            self._running.discard(job.name)
+            # The action may have rescheduled itself explicitly; that takes
+            # precedence.
+            if next_due is not None and job.name not in self._jobs:
+                self.schedule(job.name, next_due, job.action)
+        self._wakeup.set()
+
+    def _record(
+        self, name: str, started: float, ok: bool, data: Optional[dict] = None
+    ) -> None:
+        if self.history is not None:
+            now = self.clock.time()
+            self.history.record_stage(name, now - started, ok, data, t=now)
+
+    def _wait(self, timeout: Optional[float]) -> None:
+        self.clock.wait(self._wakeup, timeout)
+
+    # Runs due stages on a pool of threads, as many side by side as the graph
+    # allows. Past `until` no stage is started, and the stages still running
+    # are waited for.
+    def run(self, until: Optional[float] = None) -> None:
+        # The profiler samples and patches one stage at a time.
+        workers = 1 if self.profiler is not None else self.max_workers
+        announced = None
+        with ThreadPoolExecutor(workers, thread_name_prefix="stage") as pool:
+            while True:
+                self._wakeup.clear()
+                job = self._next_job()
+                if job is not None and (until is None or job.due <= until):
+                    free = workers - len(self.running())
+                    for ready in self._take_ready(free):
+                        self._start(pool, ready)
+                    job = self._next_job()
+                if job is None or (until is not None and job.due > until):
+                    if not self.running():
+                        return
+                    self._wait(None)
+                    continue
+                delay = job.due - self.clock.time()
+                if delay > 0:
+                    if announced is not job:
+                        announced = job
+                        logger.info("Next job '{}' in {:.0f} seconds.", job.name, delay)
+                    self._wait(delay)
+                elif self.running():
+                    # Due stages are held back by the ones running, or wait
+                    # for a free worker.
+                    self._wait(None)
@@ -0,0 +1,112 @@
+import os
+import tomllib
+from typing import Optional, Self
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, model_validator
+
+from utils.clock import SYSTEM_CLOCK, Clock
+from utils.loggy import logger
+
+Range = tuple[float, float]
+
+
+class Tuning(BaseModel):
+    model_config = ConfigDict(extra="forbid", frozen=True)
+
+    min_swipe: int = Field(
+        20, ge=1, description="Fewest swipes worth a register_taps call"
+    )
+    max_swipe: int = Field(30, ge=1, description="Most swipes per tap batch")
+    auth_refresh_delay: float = Field(
+        30, ge=0, description="Seconds between auth checks inside swipe loops"
+    )
+    swipe_delay: Range = Field((5, 10), description="Pause between tap batches")
+    booster_swipe_delay: Range = Field(
+        (2, 5), description="Pause between tap batches while a booster is active"
+    )
+    failed_taps_delay: float = Field(
+        10, ge=0, description="Pause after a tap batch was not registered"
+    )
+    quest_interval: Range = Field((300, 600), description="Pause between quest runs")
+    booster_start_delay: float = Field(
+        11, ge=0, description="Wait after activating an ad booster"
+    )
+    stage_pause: float = Field(
+        5, ge=0, description="Pause between the async bot's refill and swipe stages"
+    )
+    booster_end_margin: float = Field(
+        5,
+        ge=0,
+        description="Post the last booster batch this long before it ends, until "
+        "the server clock offset is measured",
+    )
+
+    @model_validator(mode="after")
+    def _check_ranges(self) -> Self:
+        if self.min_swipe > self.max_swipe:
+            raise ValueError("min_swipe must not exceed max_swipe")
+        for name in ("swipe_delay", "booster_swipe_delay", "quest_interval"):
+            low, high = getattr(self, name)
+            if not 0 <= low <= high:
+                raise ValueError(f"{name} must be [low, high] with 0 <= low <= high")
+        return self
+
+    def to_toml(self) -> str:
+        lines = []
+        for name, value in self.model_dump().items():
+            if isinstance(value, tuple):
+                value = f"[{value[0]:g}, {value[1]:g}]"
+            lines.append(f"{name} = {value}")
+        return "\n".join(lines) + "\n"
+
+
+# A TOML file of Tuning values, checked for changes at most once per interval.
+# A file that fails to parse or validate keeps the last good values in force.
+class TuningFile:
+    def __init__(
+        self,
+        path: str = "tuning.toml",
+        check_interval: float = 5.0,
+        clock: Clock = SYSTEM_CLOCK,
+    ) -> None:
+        self.clock = clock
+        self.path = path
+        self.check_interval = check_interval
+        self.tuning = Tuning()
+        self._stamp: Optional[tuple[int, int]] = None
+        self._checked_at = float("-inf")
+
+    def current(self) -> Tuning:
+        now = self.clock.time()
+        if now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            self.reload()
+        return self.tuning
+
+    def reload(self) -> bool:
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            if self._stamp is not None:
+                logger.warning("{} was removed; keeping the current tuning.", self.path)
+                self._stamp = None
+            return False
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        try:
+            with open(self.path, "rb") as file:
+                tuning = Tuning.model_validate(tomllib.load(file))
+        except (OSError, tomllib.TOMLDecodeError, ValidationError) as e:
+            logger.error("Ignoring {}: {}", self.path, e)
+            return False
+        if tuning != self.tuning:
+            changes = {
+                name: value
+                for name, value in tuning.model_dump().items()
+                if getattr(self.tuning, name) != value
+            }
+            logger.info("Tuning from {}: {}", self.path, changes)
+            self.tuning = tuning
+        return True